@@ -99,19 +99,30 @@ const AgentChat: React.FC = () => {
     return false;
   }, [addMessage, formatResults]);
 
-  const waitForResults = useCallback(async (originalPrompt: string, sessionId: string, retryCount = 0, maxRetries = 10) => {
+  const waitForResults = useCallback(async (originalPrompt: string, sessionId: string, retryCount = 0, maxRetries = 10, jobId?: string) => {
     try {
       const payload = {
         prompt: originalPrompt,
         user_id: 'pat1',
         session_id: sessionId,
         workflow: 'symptom_analysis',
-        get_status: true  // Request status update
+        get_status: true,  // Request status update
+        job_id: jobId
       };
 
       console.log(`Retry attempt ${retryCount + 1}/${maxRetries} for session ${sessionId}`);
       const resp = await callChatOrchestrate(payload);
       console.log('Status check response:', JSON.stringify(resp, null, 2));
+
+      // The background job finished: show what it produced, complete or not
+      if (resp?.status === 'error') {
+        addMessage(`Error: ${resp.error || 'Unknown error occurred'}`, 'agent');
+        return false;
+      }
+      if (resp?.status === 'success') {
+        addMessage(resp.results?.length ? formatResults(resp.results) : 'No response available from the analysis.', 'agent');
+        return true;
+      }
       
       // Check for completed results
       if (resp?.results?.length) {
@@ -157,13 +168,13 @@ const AgentChat: React.FC = () => {
       console.log(`Waiting ${delay}ms before next retry`);
       await new Promise(resolve => setTimeout(resolve, delay));
       
-      return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries);
+      return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries, jobId);
     } catch (err) {
       console.error('Retry error:', err);
       if (retryCount < maxRetries - 1) {
         const delay = Math.min(3000 + (1000 * retryCount), 8000);
         await new Promise(resolve => setTimeout(resolve, delay));
-        return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries);
+        return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries, jobId);
       }
       return false;
     }
@@ -189,7 +200,7 @@ const AgentChat: React.FC = () => {
       const resp = await callChatOrchestrate(payload);
       console.log('Initial response:', JSON.stringify(resp, null, 2));
 
-      if (resp?.results?.length) {
+      if (resp?.status !== 'processing' && resp?.results?.length) {
         // If we got immediate results, show them
         addMessage(formatResults(resp.results), 'agent');
       } else if (resp?.mcp_acl?.actions?.length) {
@@ -201,7 +212,7 @@ const AgentChat: React.FC = () => {
         
         addMessage(processingText, 'agent');
         // Start polling with original prompt and session ID
-        waitForResults(input.trim(), sessionId);
+        waitForResults(input.trim(), sessionId, 0, 10, resp.job_id);
       } else {
         addMessage('No response available from the analysis.', 'agent');
       }
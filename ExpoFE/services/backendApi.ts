@@ -116,6 +116,7 @@ export interface ChatRequest {
   workflow?: string;
   get_status?: boolean;
   is_retry?: boolean;
+  job_id?: string;  // Status checks: poll this background job instead of the session's latest
 }
 
 export interface AgentResult {
@@ -130,9 +131,12 @@ export interface AgentResult {
 }
 
 export interface ChatResponse {
-  status: string;
+  status: string;  // "processing" while a background job runs, then "success" or "error"
   results?: AgentResult[];
   error?: string;
+  job_id?: string;
+  job_status?: string;
+  status_url?: string;
   mcp_acl?: {
     agents: string[];
     workflow: string;
@@ -162,7 +166,8 @@ export async function callChatOrchestrate(payload: ChatRequest): Promise<ChatRes
       session_id: payload.session_id || `session_${Date.now()}`,
       workflow: payload.workflow || 'medical_diagnosis',
       get_status: payload.get_status || false,
-      is_retry: payload.is_retry || false
+      is_retry: payload.is_retry || false,
+      ...(payload.job_id ? { job_id: payload.job_id } : {})
     };
 
     if (payload.get_status || payload.is_retry) {
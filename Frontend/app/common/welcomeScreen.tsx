@@ -279,19 +279,34 @@ export default function WelcomeScreen() {
     setTimeout(() => chatScrollRef.current?.scrollToEnd?.({ animated: true }), 100);
   }, []);
 
-  const waitForResults = useCallback(async (originalPrompt: string, sessionId: string, retryCount = 0, maxRetries = 10) => {
+  const waitForResults = useCallback(async (originalPrompt: string, sessionId: string, retryCount = 0, maxRetries = 10, jobId?: string) => {
     try {
       const payload = {
         prompt: originalPrompt,
         user_id: userId || 'anonymous',  // Use 'anonymous' for unauthenticated users, not 'pat1'
         session_id: sessionId,
         workflow: 'symptom_analysis',
-        get_status: true  // Request status update
+        get_status: true,  // Request status update
+        job_id: jobId
       };
 
       console.log(`Retry attempt ${retryCount + 1}/${maxRetries} for session ${sessionId}`);
       const resp = await callChatOrchestrate(payload);
       console.log('Status check response:', JSON.stringify(resp, null, 2));
+
+      // The background job finished: show what it produced, complete or not
+      if (resp?.status === 'error') {
+        addChatMessage(`Error: ${resp.error || 'Unknown error occurred'}`, 'bot');
+        return false;
+      }
+      if (resp?.status === 'success') {
+        if (!userId && resp.results?.some(r => r.agent === 'patient_journey')) {
+          addChatMessage('📋 This appears to be a patient journey query.\n\nYou need to register to access your medical history and health journey.', 'bot');
+          return false;
+        }
+        addChatMessage(resp.results?.length ? formatResults(resp.results) : 'No response available from the analysis.', 'bot');
+        return true;
+      }
       
       // Check for completed results
       if (resp?.results?.length) {
@@ -337,13 +352,13 @@ export default function WelcomeScreen() {
       console.log(`Waiting ${delay}ms before next retry`);
       await new Promise(resolve => setTimeout(resolve, delay));
       
-      return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries);
+      return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries, jobId);
     } catch (err) {
       console.error('Retry error:', err);
       if (retryCount < maxRetries - 1) {
         const delay = Math.min(3000 + (1000 * retryCount), 8000);
         await new Promise(resolve => setTimeout(resolve, delay));
-        return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries);
+        return waitForResults(originalPrompt, sessionId, retryCount + 1, maxRetries, jobId);
       }
       return false;
     }
@@ -412,7 +427,7 @@ Just type your question below!`;
       console.log('Initial response:', JSON.stringify(resp, null, 2));
 
       // Check if response is a patient journey query but user is not authenticated
-      if (resp?.results?.length) {
+      if (resp?.status !== 'processing' && resp?.results?.length) {
         // Check if any result is from patient_journey agent (regardless of error)
         const hasPatientJourney = resp.results.some(r => r.agent === 'patient_journey');
         const requiresAuth = hasPatientJourney && !userId;
@@ -441,7 +456,7 @@ Just type your question below!`;
         
         addChatMessage(processingText, 'bot');
         // Start polling with original prompt and session ID
-        waitForResults(userInput, sessionId);
+        waitForResults(userInput, sessionId, 0, 10, resp.job_id);
       } else {
         addChatMessage('No response available from the analysis.', 'bot');
       }
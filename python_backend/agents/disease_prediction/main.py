@@ -1,4 +1,5 @@
 import os
+import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -19,9 +20,9 @@ if google_creds:
 print("GOOGLE_APPLICATION_CREDENTIALS:", os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
 print("GOOGLE_CLOUD_PROJECT:", os.getenv("GOOGLE_CLOUD_PROJECT"))
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # LangChain and Vertex AI imports
 try:
@@ -29,6 +30,9 @@ try:
 except ImportError:
     VertexAI = None
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Disease Prediction Agent API")
 
 
@@ -57,50 +61,95 @@ class DiseasePredictionResponse(BaseModel):
     result: Optional[DiseasePredictionResult] = None
     error: Optional[str] = None
 
+class DiseasePredictionBatchRequest(BaseModel):
+    requests: List[DiseasePredictionRequest]
+
+class DiseasePredictionBatchResponse(BaseModel):
+    results: List[DiseasePredictionResponse]
+
+class DiseaseScoringItem(BaseModel):
+    symptoms: Dict[str, float]  # symptom -> severity weight from the symptom analyzer (0 = unknown)
+    severity_level: Optional[str] = "medium"
+    patient_id: Optional[str] = None
+
+class DiseaseScoringRequest(BaseModel):
+    patients: List[DiseaseScoringItem]
+    top_k: int = 5
+
+class ConditionScore(BaseModel):
+    condition: str
+    score: float
+    confidence: float
+
+class DiseaseScoringResult(BaseModel):
+    patient_id: Optional[str] = None
+    conditions: List[ConditionScore]
+
+class DiseaseScoringResponse(BaseModel):
+    results: List[DiseaseScoringResult] = []
+    error: Optional[str] = None
+
 GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
+LLM_MODEL_NAME = "gemini-2.5-pro"
 
 # Initialize Vertex AI LLM via LangChain (if available)
 vertex_llm = None
 if VertexAI and GOOGLE_CLOUD_PROJECT:
     vertex_llm = VertexAI(
         project=GOOGLE_CLOUD_PROJECT,
-        model_name="gemini-2.5-pro"
+        model_name=LLM_MODEL_NAME
     )
 
+from common.llm_cache import LLMResponseCache
+
+llm_cache = LLMResponseCache()
+
 
 from sub_agents.domain_logic import DomainLogic
+from sub_agents.rule_engine import get_rule_engine
+from sub_agents.disease_scorer import get_disease_scorer
+from ontology.symptom_ontology import symptom_ontology
 
 domain_logic = DomainLogic()
 
+def prediction_params(request: DiseasePredictionRequest) -> dict:
+    return {
+        'patient_id': request.patient_id,
+        'symptoms': request.symptoms or [],
+        'severity_level': request.severity_level,
+        'semantic_context': request.semantic_context
+    }
+
+def prediction_response(request: DiseasePredictionRequest, result: dict) -> DiseasePredictionResponse:
+    """Converts a domain logic result to the response model"""
+    if result.get('error'):
+        return DiseasePredictionResponse(error=f"Error in disease prediction: {result['error']}")
+    if not result.get('predicted_diseases'):
+        return DiseasePredictionResponse(error="No predictions available")
+        
+    # Convert to response model
+    prediction_result = DiseasePredictionResult(
+        predicted_diseases=result['predicted_diseases'],
+        confidence=result['confidence'],
+        symptoms_used=result['symptoms_used'],
+        severity_level=result['severity_level'],
+        patient_id=request.patient_id  # Include patient ID in response
+    )
+    return DiseasePredictionResponse(result=prediction_result)
+
 @app.post("/predict_disease", response_model=DiseasePredictionResponse)
 def predict_disease(request: DiseasePredictionRequest):
     try:
         print(f"Disease prediction request: {request}")
         
         # Forward the request to domain logic
-        result = domain_logic.predict_disease({
-            'patient_id': request.patient_id,
-            'symptoms': request.symptoms or [],
-            'severity_level': request.severity_level,
-            'semantic_context': request.semantic_context
-        })
+        result = domain_logic.predict_disease(prediction_params(request))
         
         print(f"Domain logic result: {result}")
         
-        if not result.get('predicted_diseases'):
-            return DiseasePredictionResponse(error="No predictions available")
-            
-        # Convert to response model
-        prediction_result = DiseasePredictionResult(
-            predicted_diseases=result['predicted_diseases'],
-            confidence=result['confidence'],
-            symptoms_used=result['symptoms_used'],
-            severity_level=result['severity_level'],
-            patient_id=request.patient_id  # Include patient ID in response
-        )
-        
-        print(f"Returning prediction: {prediction_result}")
-        return DiseasePredictionResponse(result=prediction_result)
+        response = prediction_response(request, result)
+        print(f"Returning prediction: {response.result}")
+        return response
         
     except Exception as e:
         import traceback
@@ -108,10 +157,54 @@ def predict_disease(request: DiseasePredictionRequest):
         print(error_details)
         return DiseasePredictionResponse(error=error_details)
 
+@app.post("/predict_disease/batch", response_model=DiseasePredictionBatchResponse)
+def predict_disease_batch(request: DiseasePredictionBatchRequest):
+    """Predicts for every request in order; failures are reported per item"""
+    print(f"Disease prediction batch request: {len(request.requests)} items")
+    results = domain_logic.predict_disease_batch([prediction_params(item) for item in request.requests])
+    responses = []
+    for item, result in zip(request.requests, results):
+        try:
+            responses.append(prediction_response(item, result))
+        except Exception as e:
+            responses.append(DiseasePredictionResponse(error=f"Error in disease prediction: {str(e)}"))
+    return DiseasePredictionBatchResponse(results=responses)
+
+@app.post("/score_diseases", response_model=DiseaseScoringResponse)
+def score_diseases(request: DiseaseScoringRequest):
+    """Scores one or many patients against every condition in a single matrix product (screening runs)"""
+    try:
+        ranked = domain_logic.score_conditions_batch(
+            [item.symptoms for item in request.patients],
+            [item.severity_level for item in request.patients],
+            request.top_k
+        )
+        return DiseaseScoringResponse(results=[
+            DiseaseScoringResult(patient_id=item.patient_id, conditions=conditions)
+            for item, conditions in zip(request.patients, ranked)
+        ])
+    except ValueError as e:
+        # Invalid input, e.g. an unknown severity level
+        logger.warning(f"Rejected disease scoring request: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in disease scoring: {str(e)}")
+        return DiseaseScoringResponse(error=str(e))
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def metrics():
+    scorer = get_disease_scorer()
+    return {
+        "llm_cache": llm_cache.stats(),
+        "ontology": symptom_ontology.stats(),
+        "rule_engine": get_rule_engine().stats(),
+        "disease_scorer": scorer.stats() if scorer else None
+    }
+
 # Response format template
 RESPONSE_TEMPLATE = """{
     "predicted_diseases": ["Disease1", "Disease2"],
@@ -127,13 +220,15 @@ async def llm_predict(request: DiseasePredictionRequest):
         if not vertex_llm:
             return DiseasePredictionResponse(error="Vertex AI LLM not initialized")
 
-        # Prepare prompt with symptoms
-        prompt = f"Based on the following symptoms: {', '.join(request.symptoms or [])}\n"
+        # Prepare prompt with symptoms, in a fixed order so the same symptom set
+        # always renders the same prompt
+        symptoms_text = ', '.join(sorted(s.strip().lower() for s in request.symptoms or []))
+        prompt = f"Based on the following symptoms: {symptoms_text}\n"
         prompt += "Please provide a disease prediction in this format:\n"
         prompt += RESPONSE_TEMPLATE
 
-        # Send to Gemini-Pro LLM
-        llm_response = vertex_llm(prompt)
+        # Send to Gemini-Pro LLM, reusing the cached answer for the same rendered prompt
+        llm_response = llm_cache.call(LLM_MODEL_NAME, RESPONSE_TEMPLATE, prompt, lambda: vertex_llm(prompt))
 
         # Try to extract structured disease predictions
         import json
@@ -1,12 +1,119 @@
 import os
-from typing import Dict, Any, List
-from neo4j import GraphDatabase
+from typing import Dict, Any, List, Optional
+from neo4j import GraphDatabase, AsyncGraphDatabase
 import logging
 
+from .journey_schema import normalize_lookup_key
+
 logger = logging.getLogger(__name__)
 
+# Patient lookup on the normalized keys (see journey_schema): two index seeks, an id
+# match winning over a name match
+PATIENT_KEY_LOOKUP = """
+CALL {
+    MATCH (p:Patient {patientIdKey: $patient_key})
+    RETURN p, 0 AS priority
+    UNION ALL
+    MATCH (p:Patient {nameKey: $patient_key})
+    RETURN p, 1 AS priority
+}
+WITH p, priority ORDER BY priority LIMIT 1
+"""
+
+# Original case-insensitive scan, for patients written without lookup keys
+PATIENT_SCAN_LOOKUP = """
+MATCH (p:Patient)
+WHERE toLower(p.patientId) = toLower($patient_id) OR toLower(p.name) = toLower($patient_id)
+WITH p LIMIT 1
+"""
+
+# Every timeline event of the matched patient. Each UNION ALL branch yields typed rows
+# (kind, date, data); they are ordered newest first on the server, with ties kept in
+# diagnosis/appointment/medication/treatment/test order, and collected so a patient
+# without events still returns a row.
+JOURNEY_TIMELINE = """
+CALL {
+    WITH p
+    CALL {
+        WITH p
+        MATCH (p)-[hd:HAS_DIAGNOSIS]->(diag:Diagnosis)
+        WHERE diag.name IS NOT NULL AND hd.diagnosedDate IS NOT NULL
+        RETURN 0 AS ord, 'diagnosis' AS kind, hd.diagnosedDate AS date,
+               {name: diag.name, desc: diag.description} AS data
+        UNION ALL
+        WITH p
+        MATCH (p)-[ha:HAS_APPOINTMENT]->(appt:Appointment)
+        WHERE appt.type IS NOT NULL AND ha.appointmentDate IS NOT NULL
+        OPTIONAL MATCH (appt)-[:WITH_DOCTOR]->(doc:Doctor)
+        OPTIONAL MATCH (appt)-[:AT_HOSPITAL]->(hosp:Hospital)
+        RETURN 1 AS ord, 'appointment' AS kind, ha.appointmentDate AS date,
+               {type: appt.type, status: ha.status, doctor_name: doc.name, hospital_name: hosp.name} AS data
+        UNION ALL
+        WITH p
+        MATCH (p)-[tm:TAKES_MEDICATION]->(med:Medication)
+        WHERE med.name IS NOT NULL AND tm.prescribedDate IS NOT NULL
+        RETURN 2 AS ord, 'medication' AS kind, tm.prescribedDate AS date,
+               {name: med.name, dosage: med.dosage, freq: med.frequency} AS data
+        UNION ALL
+        WITH p
+        MATCH (p)-[rt:RECEIVES_TREATMENT]->(treat:Treatment)
+        WHERE treat.name IS NOT NULL AND rt.startDate IS NOT NULL
+        RETURN 3 AS ord, 'treatment' AS kind, rt.startDate AS date,
+               {name: treat.name, end: rt.endDate, status: treat.status} AS data
+        UNION ALL
+        WITH p
+        MATCH (p)-[ut:UNDERWENT_TEST]->(test:Test)
+        WHERE test.name IS NOT NULL AND ut.performedDate IS NOT NULL
+        RETURN 4 AS ord, 'test' AS kind, ut.performedDate AS date,
+               {name: test.name, result: test.result, status: test.status} AS data
+    }
+    WITH ord, kind, date, data
+    ORDER BY date DESC, ord
+    RETURN collect({kind: kind, date: date, data: data}) AS events
+}
+RETURN p.patientId AS id, p.name AS patient_name, events
+"""
+
+JOURNEY_QUERY = PATIENT_KEY_LOOKUP + JOURNEY_TIMELINE
+JOURNEY_SCAN_QUERY = PATIENT_SCAN_LOOKUP + JOURNEY_TIMELINE
+
+# Retry a key lookup miss with the label scan. Off by default: every miss (including
+# unknown patients) would pay a second, O(patients) round trip. Startup turns it on
+# by itself while the schema check finds patients without lookup keys.
+LOOKUP_FALLBACK_SCAN = os.getenv("PATIENT_LOOKUP_FALLBACK_SCAN", "false").lower() == "true"
+
+def _format_step(kind: str, date: Any, data: Dict[str, Any]) -> Optional[str]:
+    """Journey step text for one timeline row (None if the row is incomplete)"""
+    if kind == "diagnosis" and data.get("name"):
+        return f"Diagnosed with {data['name']} ({data.get('desc', '')}) on {date}"
+    if kind == "appointment" and data.get("type") and date:
+        doctor = data.get('doctor_name') or 'Unknown Provider'
+        hospital = data.get('hospital_name') or 'Unknown Location'
+        return f"Had a {data['type']} appointment on {date} ({data.get('status', 'Unknown')}) with {doctor} at {hospital}"
+    if kind == "medication" and data.get("name") and date:
+        return f"Prescribed {data['name']} {data.get('dosage', '')} {data.get('freq', '')} on {date}"
+    if kind == "treatment" and data.get("name") and date:
+        return f"Started treatment: {data['name']} from {date} to {data.get('end', 'Unknown End Date')} (Status: {data.get('status', 'Unknown')})"
+    if kind == "test" and data.get("name") and date:
+        return f"Had {data['name']} on {date} - Result: {data.get('result', 'Unknown')} (Status: {data.get('status', 'Unknown')})"
+    return None
+
+def _pool_config() -> Dict[str, Any]:
+    """Connection pool settings shared by the sync and async drivers"""
+    return {
+        "max_connection_pool_size": int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+        "connection_acquisition_timeout": float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60")),
+        "max_connection_lifetime": float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+    }
+
 class PatientJourneyLogic:
     def __init__(self):
+        self.driver = None
+        self.async_driver = None
+        self.scan_fallback_hits = 0
+        self.lookup_fallback_scan = False
+        if LOOKUP_FALLBACK_SCAN:
+            self.enable_scan_fallback("PATIENT_LOOKUP_FALLBACK_SCAN=true")
         # Neo4j connection setup (use environment variables for security)
         try:
             uri = os.getenv("NEO4J_URI")
@@ -34,162 +141,113 @@ class PatientJourneyLogic:
                 self.driver = None
                 return
             
+            driver_config = {
+                "auth": (user, password),
+                "encrypted": True,
+                "database": os.getenv("NEO4J_DATABASE", "neo4j"),
+                **_pool_config()
+            }
             # Create driver - bolt+s:// is secure scheme, use encrypted parameter
-            self.driver = GraphDatabase.driver(
-                uri, 
-                auth=(user, password),
-                encrypted=True,
-                database=os.getenv("NEO4J_DATABASE", "neo4j")
-            )
+            self.driver = GraphDatabase.driver(uri, **driver_config)
             logger.info("✓ Neo4j connection established successfully")
             print("[SUCCESS] Neo4j connection established")
+
+            # Async driver for the async endpoint; connects lazily on the serving event loop
+            if os.getenv("NEO4J_ASYNC_ENABLED", "true").lower() == "true":
+                self.async_driver = AsyncGraphDatabase.driver(uri, **driver_config)
+                logger.info(f"Neo4j async driver created (pool: {driver_config['max_connection_pool_size']})")
                 
         except Exception as e:
             logger.error(f"[ERROR] Failed to connect to Neo4j: {e}")
             print(f"[ERROR] Failed to connect to Neo4j: {e}")
             print("[WARNING] Neo4j connection failed. Using mock data for patient journey.")
             self.driver = None
+            self.async_driver = None
 
     def get_patient_journey(self, patient_id: str) -> Dict[str, Any]:
         if not self.driver:
-            # Return mock data for testing when Neo4j unavailable
-            print(f"[DEBUG] Returning mock data for patient: {patient_id}")
-            return {
-                "patient_name": "John Doe" if patient_id == "pat1" else patient_id,
-                "patient_id": patient_id,
-                "journey_steps": [
-                    "2024-01-15: Admitted to General Hospital with flu symptoms",
-                    "2024-01-14: Had COVID-19 test - Result: Negative",
-                    "2024-01-10: Diagnosed with Influenza A",
-                    "2024-01-08: Appointment with Dr. Smith for routine checkup",
-                    "2024-01-05: Prescribed Amoxicillin 500mg twice daily",
-                    "2024-01-03: Started treatment for upper respiratory infection",
-                    "2024-01-01: Had blood work done at Central Lab"
-                ],
-                "source": "mock_data"
-            }
+            return self._mock_journey(patient_id)
             
+        patient_key = normalize_lookup_key(patient_id)
         with self.driver.session() as session:
-            # First, get patient basic info
-            patient_result = session.run(
-                """
-                MATCH (p:Patient)
-                WHERE toLower(p.patientId) = toLower($patient_id) OR toLower(p.name) = toLower($patient_id)
-                RETURN p.patientId as id, p.name as patient_name
-                """,
-                patient_id=patient_id
-            )
-            
-            patient_record = patient_result.single()
-            if not patient_record:
-                return {"error": f"No patient found with ID/name: {patient_id}"}
-            
-            patient_name = patient_record["patient_name"]
-            patient_id_db = patient_record["id"]
-            
-            journey_steps = []
-            seen_steps = set()
-            
-            # Get diagnoses
-            diag_result = session.run(
-                """
-                MATCH (p:Patient)-[hd:HAS_DIAGNOSIS]->(diag:Diagnosis)
-                WHERE p.patientId = $patient_id AND diag.name IS NOT NULL AND hd.diagnosedDate IS NOT NULL
-                RETURN diag.name as name, diag.description as desc, hd.diagnosedDate as date
-                """,
-                patient_id=patient_id_db
-            )
-            
-            for record in diag_result:
-                if record.get("name"):
-                    step = f"Diagnosed with {record['name']} ({record.get('desc', '')}) on {record.get('date', 'Unknown Date')}"
-                    if step not in seen_steps:
-                        seen_steps.add(step)
-                        journey_steps.append((record.get('date', ''), step))
-            
-            # Get appointments
-            appt_result = session.run(
-                """
-                MATCH (p:Patient)-[ha:HAS_APPOINTMENT]->(appt:Appointment)
-                WHERE p.patientId = $patient_id AND appt.type IS NOT NULL AND ha.appointmentDate IS NOT NULL
-                OPTIONAL MATCH (appt)-[:WITH_DOCTOR]->(doc:Doctor)
-                OPTIONAL MATCH (appt)-[:AT_HOSPITAL]->(hosp:Hospital)
-                RETURN appt.type as type, ha.appointmentDate as date, ha.status as status, 
-                       doc.name as doctor_name, hosp.name as hospital_name
-                """,
-                patient_id=patient_id_db
-            )
-            
-            for record in appt_result:
-                if record.get("type") and record.get("date"):
-                    doctor = record.get('doctor_name') or 'Unknown Provider'
-                    hospital = record.get('hospital_name') or 'Unknown Location'
-                    step = f"Had a {record.get('type', 'Unknown')} appointment on {record.get('date', 'Unknown Date')} ({record.get('status', 'Unknown')}) with {doctor} at {hospital}"
-                    if step not in seen_steps:
-                        seen_steps.add(step)
-                        journey_steps.append((record.get('date', ''), step))
-            
-            # Get medications
-            med_result = session.run(
-                """
-                MATCH (p:Patient)-[tm:TAKES_MEDICATION]->(med:Medication)
-                WHERE p.patientId = $patient_id AND med.name IS NOT NULL AND tm.prescribedDate IS NOT NULL
-                RETURN med.name as name, med.dosage as dosage, med.frequency as freq, tm.prescribedDate as date
-                """,
-                patient_id=patient_id_db
-            )
-            
-            for record in med_result:
-                if record.get("name") and record.get("date"):
-                    step = f"Prescribed {record['name']} {record.get('dosage', '')} {record.get('freq', '')} on {record.get('date', 'Unknown Date')}"
-                    if step not in seen_steps:
-                        seen_steps.add(step)
-                        journey_steps.append((record.get('date', ''), step))
-            
-            # Get treatments
-            treat_result = session.run(
-                """
-                MATCH (p:Patient)-[rt:RECEIVES_TREATMENT]->(treat:Treatment)
-                WHERE p.patientId = $patient_id AND treat.name IS NOT NULL AND rt.startDate IS NOT NULL
-                RETURN treat.name as name, rt.startDate as start, rt.endDate as end, treat.status as status
-                """,
-                patient_id=patient_id_db
-            )
-            
-            for record in treat_result:
-                if record.get("name") and record.get("start"):
-                    step = f"Started treatment: {record['name']} from {record.get('start', 'Unknown Date')} to {record.get('end', 'Unknown End Date')} (Status: {record.get('status', 'Unknown')})"
-                    if step not in seen_steps:
-                        seen_steps.add(step)
-                        journey_steps.append((record.get('start', ''), step))
-            
-            # Get tests
-            test_result = session.run(
-                """
-                MATCH (p:Patient)-[ut:UNDERWENT_TEST]->(test:Test)
-                WHERE p.patientId = $patient_id AND test.name IS NOT NULL AND ut.performedDate IS NOT NULL
-                RETURN test.name as name, ut.performedDate as date, test.result as result, test.status as status
-                """,
-                patient_id=patient_id_db
-            )
-            
-            for record in test_result:
-                if record.get("name") and record.get("date"):
-                    step = f"Had {record['name']} on {record.get('date', 'Unknown Date')} - Result: {record.get('result', 'Unknown')} (Status: {record.get('status', 'Unknown')})"
-                    if step not in seen_steps:
-                        seen_steps.add(step)
-                        journey_steps.append((record.get('date', ''), step))
-            
-            # Sort by date (descending)
-            journey_steps.sort(key=lambda x: (x[0] or ''), reverse=True)
-            
-            # Extract just the steps
-            final_steps = [step for _, step in journey_steps]
+            # One round trip: patient lookup and the whole timeline, sorted on the server
+            record = session.run(JOURNEY_QUERY, patient_key=patient_key).single()
+            if not record and self.lookup_fallback_scan:
+                record = session.run(JOURNEY_SCAN_QUERY, patient_id=patient_id).single()
+                self._note_scan_hit(patient_id, record)
+        return self._build_journey(patient_id, record)
 
-            return {
-                "patient_name": patient_name,
-                "journey_steps": final_steps
-            }
+    async def get_patient_journey_async(self, patient_id: str) -> Dict[str, Any]:
+        """Same as get_patient_journey, on the async driver: a pending query holds no thread"""
+        if not self.async_driver:
+            return self._mock_journey(patient_id)
+
+        patient_key = normalize_lookup_key(patient_id)
+        async with self.async_driver.session() as session:
+            result = await session.run(JOURNEY_QUERY, patient_key=patient_key)
+            record = await result.single()
+            if not record and self.lookup_fallback_scan:
+                result = await session.run(JOURNEY_SCAN_QUERY, patient_id=patient_id)
+                record = await result.single()
+                self._note_scan_hit(patient_id, record)
+        return self._build_journey(patient_id, record)
+
+    def enable_scan_fallback(self, reason: str) -> None:
+        """Retries key lookup misses with the label scan, at O(patients) per miss"""
+        self.lookup_fallback_scan = True
+        logger.warning(f"Patient lookup scan fallback enabled ({reason}): lookups that miss "
+                       f"the lookup keys scan every :Patient node")
+
+    def _note_scan_hit(self, patient_id: str, record) -> None:
+        """Counts patients only the scan could find: their lookup keys need a backfill"""
+        if record:
+            self.scan_fallback_hits += 1
+            logger.warning(f"Patient {patient_id} has no lookup keys; run the journey schema backfill "
+                           f"(python -m agents.patient_journey.journey_schema)")
+
+    @staticmethod
+    def _mock_journey(patient_id: str) -> Dict[str, Any]:
+        # Return mock data for testing when Neo4j unavailable
+        print(f"[DEBUG] Returning mock data for patient: {patient_id}")
+        return {
+            "patient_name": "John Doe" if patient_id == "pat1" else patient_id,
+            "patient_id": patient_id,
+            "journey_steps": [
+                "2024-01-15: Admitted to General Hospital with flu symptoms",
+                "2024-01-14: Had COVID-19 test - Result: Negative",
+                "2024-01-10: Diagnosed with Influenza A",
+                "2024-01-08: Appointment with Dr. Smith for routine checkup",
+                "2024-01-05: Prescribed Amoxicillin 500mg twice daily",
+                "2024-01-03: Started treatment for upper respiratory infection",
+                "2024-01-01: Had blood work done at Central Lab"
+            ],
+            "source": "mock_data"
+        }
+
+    @staticmethod
+    def _build_journey(patient_id: str, record) -> Dict[str, Any]:
+        """Formats the typed, date-sorted timeline rows of a journey query record"""
+        if not record:
+            return {"error": f"No patient found with ID/name: {patient_id}"}
+
+        journey_steps = []
+        seen_steps = set()
+        for event in record["events"]:
+            step = _format_step(event["kind"], event["date"], event["data"])
+            if step and step not in seen_steps:
+                seen_steps.add(step)
+                journey_steps.append(step)
+
+        return {
+            "patient_name": record["patient_name"],
+            "patient_id": record["id"],
+            "journey_steps": journey_steps
+        }
 
     def close(self):
-        self.driver.close()
\ No newline at end of file
+        if self.driver:
+            self.driver.close()
+
+    async def close_async(self):
+        if self.async_driver:
+            await self.async_driver.close()
\ No newline at end of file
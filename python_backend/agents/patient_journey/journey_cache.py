@@ -0,0 +1,179 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import logging
+
+from common.ttl_cache import TTLCache
+from .journey_schema import normalize_lookup_key
+
+logger = logging.getLogger(__name__)
+
+JourneyLoader = Callable[[str], Awaitable[Dict[str, Any]]]
+
+class JourneyCache:
+    """
+    Per-patient journey results, keyed by the normalized id/name they were requested with.
+    A journey is served as-is for `ttl` seconds. For the following `stale_ttl` seconds it
+    is still served at once while a single background load refreshes it; after that it is
+    reloaded on the request. Concurrent loads of one key share a single query.
+
+    Ingest paths call invalidate() when a patient's diagnoses, appointments, medications,
+    treatments or tests change. Invalidation marks the patient rather than scanning the
+    cache: entries for that patient loaded before the mark (whether requested by id or
+    by name) are ignored from then on. A request never joins a load that started before
+    an invalidation of its patient, and a load that turns out to belong to a patient
+    invalidated while it ran (say, requested by name, invalidated by id) is redone.
+    """
+    def __init__(self, ttl: Optional[float] = None,
+                 stale_ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.enabled = os.getenv("JOURNEY_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = ttl if ttl is not None else float(os.getenv("JOURNEY_CACHE_TTL", "300"))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("JOURNEY_CACHE_STALE_TTL", "3600"))
+        self.cache = TTLCache(
+            max_entries=max_entries or int(os.getenv("JOURNEY_CACHE_MAX_ENTRIES", "2048")),
+            default_ttl=self.ttl + self.stale_ttl,
+            max_bytes=max_bytes or int(os.getenv("JOURNEY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        )
+        # Patient key -> monotonic time of its last invalidation ("*" for all patients)
+        self._invalidated_at: Dict[str, float] = {}
+        self._marks_lock = threading.Lock()
+        # Request key -> (load task, entry metadata with the load's start time)
+        self._inflight: Dict[str, Tuple[asyncio.Task, Dict[str, Any]]] = {}
+        self._stats_lock = threading.Lock()
+        self.counters = {"fresh_hits": 0, "stale_served": 0, "loads": 0, "coalesced": 0,
+                         "refreshes": 0, "refresh_errors": 0, "invalidations": 0, "invalidated_hits": 0}
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.counters[counter] += amount
+
+    def _is_current(self, entry: Dict[str, Any]) -> bool:
+        invalidated_at = max(self._invalidated_at.get(entry["patient_key"], float("-inf")),
+                             self._invalidated_at.get(entry["request_key"], float("-inf")),
+                             self._invalidated_at.get("*", float("-inf")))
+        return entry["loaded_at"] > invalidated_at
+
+    async def get(self, patient_id: str, loader: JourneyLoader) -> Dict[str, Any]:
+        """Journey for patient_id from the cache, loading it with loader(patient_id) as needed"""
+        if not self.enabled:
+            return await loader(patient_id)
+
+        key = normalize_lookup_key(patient_id)
+        cached = self.cache.get_entry(key)
+        if cached is not None:
+            entry, age = cached
+            if not self._is_current(entry):
+                self._count("invalidated_hits")
+                self.cache.delete(key)
+            elif age < self.ttl:
+                self._count("fresh_hits")
+                return entry["journey"]
+            else:
+                self._count("stale_served")
+                if self._current_load(key) is None:
+                    self._count("refreshes")
+                    self._start_load(key, patient_id, loader, entry["patient_key"]).add_done_callback(
+                        self._log_refresh_error)
+                return entry["journey"]
+
+        patient_key = cached[0]["patient_key"] if cached is not None else key
+        # A cancelled request must not cancel the load other requests are waiting on
+        entry = await asyncio.shield(self._join_or_start_load(key, patient_id, loader, patient_key))
+        if not self._is_current(entry):
+            # Its patient was invalidated while the load ran; reuse a journey another
+            # request loaded since then before querying again
+            self._count("invalidated_hits")
+            reloaded = self.cache.get_entry(key, count=False)
+            if reloaded is not None and self._is_current(reloaded[0]):
+                return reloaded[0]["journey"]
+            entry = await asyncio.shield(self._join_or_start_load(key, patient_id, loader, entry["patient_key"]))
+        return entry["journey"]
+
+    def _current_load(self, key: str) -> Optional[asyncio.Task]:
+        """The in-flight load for key, unless an invalidation happened after it started"""
+        flight = self._inflight.get(key)
+        return flight[0] if flight is not None and self._is_current(flight[1]) else None
+
+    def _join_or_start_load(self, key: str, patient_id: str, loader: JourneyLoader,
+                            patient_key: str) -> asyncio.Task:
+        task = self._current_load(key)
+        if task is not None:
+            self._count("coalesced")
+            return task
+        return self._start_load(key, patient_id, loader, patient_key)
+
+    def _start_load(self, key: str, patient_id: str, loader: JourneyLoader, patient_key: str) -> asyncio.Task:
+        # patient_key is a best guess (a previous entry's, or the request key) until the load returns
+        entry = {"request_key": key, "patient_key": patient_key, "loaded_at": time.monotonic()}
+        task = asyncio.ensure_future(self._load(entry, patient_id, loader))
+        self._inflight[key] = (task, entry)
+
+        def finished(_):
+            # A newer load may have replaced this one after an invalidation
+            if self._inflight.get(key, (None,))[0] is task:
+                del self._inflight[key]
+        task.add_done_callback(finished)
+        return task
+
+    async def _load(self, entry: Dict[str, Any], patient_id: str, loader: JourneyLoader) -> Dict[str, Any]:
+        """Runs the loader and returns the entry for its result, cached unless invalidated meanwhile"""
+        self._count("loads")
+        journey = await loader(patient_id)
+        entry = {**entry, "journey": journey}
+        # Lookup misses are not cached, so a newly ingested patient shows up at once
+        if "error" in journey:
+            self.cache.delete(entry["request_key"])
+        else:
+            entry["patient_key"] = normalize_lookup_key(journey.get("patient_id") or patient_id)
+            if self._is_current(entry):
+                self.cache.set(entry["request_key"], entry)
+        return entry
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self._count("refresh_errors")
+            logger.warning(f"Background journey refresh failed, keeping the stale entry: {task.exception()}")
+
+    def invalidate(self, patient_ids: Iterable[str]) -> int:
+        """Drops the cached journeys of the given patients (ids or names); safe from any thread"""
+        now = time.monotonic()
+        count = 0
+        with self._marks_lock:
+            for patient_id in patient_ids:
+                key = normalize_lookup_key(patient_id)
+                self._invalidated_at[key] = now
+                self.cache.delete(key)
+                count += 1
+            # Marks well past the retention period can no longer match a live entry
+            if len(self._invalidated_at) > self.cache.max_entries:
+                horizon = now - 2 * (self.ttl + self.stale_ttl)
+                self._invalidated_at = {k: t for k, t in self._invalidated_at.items() if t > horizon}
+        self._count("invalidations", count)
+        return count
+
+    def invalidate_all(self) -> int:
+        """Drops every cached journey; returns how many were cached"""
+        with self._marks_lock:
+            count = len(self.cache)
+            self._invalidated_at = {"*": time.monotonic()}
+            self.cache.clear()
+        self._count("invalidations")
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counters = dict(self.counters)
+        served = counters["fresh_hits"] + counters["stale_served"]
+        lookups = served + counters["loads"] - counters["refreshes"] + counters["coalesced"]
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            **counters,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "cache": self.cache.stats()
+        }
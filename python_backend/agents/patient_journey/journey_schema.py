@@ -0,0 +1,121 @@
+import os
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Normalized lookup keys on :Patient, kept next to patientId/name so the journey
+# lookup is an index seek instead of a toLower() scan over every patient.
+# Writers that create or rename patients set them with the same expression, through
+# upsert_patient / PATIENT_UPSERT_QUERY here or the Patient entity in the Spring service.
+PATIENT_KEYS_SET_CLAUSE = "p.patientIdKey = toLower(trim(p.patientId)), p.nameKey = toLower(trim(p.name))"
+
+# Creates or updates a patient and its lookup keys in one statement
+PATIENT_UPSERT_QUERY = f"""
+MERGE (p:Patient {{patientId: $patient_id}})
+SET p += $properties
+SET {PATIENT_KEYS_SET_CLAUSE}
+RETURN p.patientId AS patient_id
+"""
+
+SCHEMA_STATEMENTS = [
+    ("patient_id_key_unique",
+     "CREATE CONSTRAINT patient_id_key_unique IF NOT EXISTS FOR (p:Patient) REQUIRE p.patientIdKey IS UNIQUE"),
+    ("patient_name_key",
+     "CREATE INDEX patient_name_key IF NOT EXISTS FOR (p:Patient) ON (p.nameKey)"),
+]
+# Used when existing ids collide case-insensitively and the constraint cannot be created
+PATIENT_ID_KEY_INDEX = "CREATE INDEX patient_id_key IF NOT EXISTS FOR (p:Patient) ON (p.patientIdKey)"
+
+STALE_KEYS_PREDICATE = """
+(p.patientId IS NOT NULL AND (p.patientIdKey IS NULL OR p.patientIdKey <> toLower(trim(p.patientId))))
+OR (p.name IS NOT NULL AND (p.nameKey IS NULL OR p.nameKey <> toLower(trim(p.name))))
+"""
+
+def normalize_lookup_key(value: str) -> str:
+    """Python side of toLower(trim(...)), applied to the requested patient id/name"""
+    return (value or "").strip().lower()
+
+def upsert_patient(session, patient_id: str, properties: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Writes a patient (session or transaction) with its lookup keys set, so it is found
+    by the indexed journey lookup without a backfill
+    """
+    properties = {k: v for k, v in (properties or {}).items() if k not in ("patientId", "patientIdKey", "nameKey")}
+    session.run(PATIENT_UPSERT_QUERY, patient_id=patient_id, properties=properties).consume()
+
+def count_stale_keys(driver) -> int:
+    """Patients whose lookup keys are missing or outdated (found only by a scan)"""
+    with driver.session() as session:
+        return session.run(f"MATCH (p:Patient) WHERE {STALE_KEYS_PREDICATE} RETURN count(p) AS stale").single()["stale"]
+
+def backfill_patient_keys(driver, batch_size: int = 10000) -> int:
+    """Sets missing or outdated lookup keys in batches; returns how many patients were updated"""
+    stale = count_stale_keys(driver)
+    with driver.session() as session:
+        if stale:
+            # CALL ... IN TRANSACTIONS needs an auto-commit transaction, which session.run is
+            session.run(
+                f"""
+                MATCH (p:Patient) WHERE {STALE_KEYS_PREDICATE}
+                CALL {{ WITH p SET {PATIENT_KEYS_SET_CLAUSE} }} IN TRANSACTIONS OF $batch_size ROWS
+                """,
+                batch_size=batch_size
+            ).consume()
+    logger.info(f"Backfilled lookup keys on {stale} patients")
+    return stale
+
+def ensure_schema(driver, backfill: bool = True, batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Migration/bootstrap for the journey queries: backfills the lookup keys, then creates
+    the constraint and index they need. Safe to run repeatedly.
+    """
+    report: Dict[str, Any] = {"backfilled": backfill_patient_keys(driver, batch_size) if backfill else None,
+                              "created": [], "failed": {}}
+    with driver.session() as session:
+        for name, statement in SCHEMA_STATEMENTS:
+            try:
+                session.run(statement).consume()
+                report["created"].append(name)
+            except Exception as e:
+                report["failed"][name] = str(e)
+                logger.error(f"Could not create {name}: {e}")
+        if "patient_id_key_unique" in report["failed"]:
+            # Duplicate ids (ignoring case): still index the key so lookups stay seeks
+            session.run(PATIENT_ID_KEY_INDEX).consume()
+            report["created"].append("patient_id_key")
+    logger.info(f"Journey schema ensured: {report}")
+    return report
+
+def check_schema(driver) -> List[str]:
+    """Problems that would turn journey lookups into label scans (empty when all is in place)"""
+    with driver.session() as session:
+        indexes = [
+            (record["properties"] or [], record["state"])
+            for record in session.run(
+                "SHOW INDEXES YIELD labelsOrTypes, properties, state "
+                "WHERE 'Patient' IN labelsOrTypes RETURN properties, state"
+            )
+        ]
+    problems = []
+    for key in ("patientIdKey", "nameKey"):
+        states = [state for properties, state in indexes if properties == [key]]
+        if not states:
+            problems.append(f"No index on :Patient({key})")
+        elif "ONLINE" not in states:
+            problems.append(f"Index on :Patient({key}) is not online: {states}")
+    return problems
+
+if __name__ == "__main__":
+    # python -m agents.patient_journey.journey_schema  (from python_backend)
+    from .domain_logic import PatientJourneyLogic
+
+    logging.basicConfig(level=logging.INFO)
+    logic = PatientJourneyLogic()
+    if not logic.driver:
+        raise SystemExit("Neo4j is not configured (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD)")
+    try:
+        print(ensure_schema(logic.driver, batch_size=int(os.getenv("NEO4J_BACKFILL_BATCH_SIZE", "10000"))))
+        print(check_schema(logic.driver) or "Journey schema OK")
+    finally:
+        logic.close()
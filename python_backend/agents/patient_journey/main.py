@@ -39,6 +39,7 @@ if google_creds:
 print("NEO4J_DATABASE:", os.getenv("NEO4J_DATABASE"))
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -72,6 +73,13 @@ class PatientJourneyResponse(BaseModel):
     result: Optional[PatientJourneyResult] = None
     error: Optional[str] = None
 
+class JourneyInvalidationRequest(BaseModel):
+    patient_ids: List[str] = []
+    invalidate_all: bool = False
+
+class JourneyInvalidationResponse(BaseModel):
+    invalidated: int
+
 GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 
 # Initialize Vertex AI LLM via LangChain (if available)
@@ -83,18 +91,59 @@ if VertexAI and GOOGLE_CLOUD_PROJECT:
     )
 
 from .domain_logic import PatientJourneyLogic
+from .journey_schema import check_schema, count_stale_keys, ensure_schema
+from .journey_cache import JourneyCache
 
 # Initialize domain logic
 patient_journey_logic = PatientJourneyLogic()
+journey_cache = JourneyCache()
+
+def verify_journey_schema():
+    """
+    Creates (NEO4J_SCHEMA_BOOTSTRAP=true) or just checks the patient lookup indexes.
+    Patients still missing their lookup keys turn on the scan fallback until a backfill.
+    """
+    driver = patient_journey_logic.driver
+    if not driver:
+        return
+    try:
+        if os.getenv("NEO4J_SCHEMA_BOOTSTRAP", "false").lower() == "true":
+            ensure_schema(driver)
+        for problem in check_schema(driver):
+            print(f"[WARNING] {problem}: patient journey lookups will scan every patient. "
+                  f"Run python -m agents.patient_journey.journey_schema or set NEO4J_SCHEMA_BOOTSTRAP=true")
+        stale = count_stale_keys(driver)
+        if stale:
+            patient_journey_logic.enable_scan_fallback(f"{stale} patients need a lookup key backfill")
+    except Exception as e:
+        print(f"[WARNING] Could not verify the patient journey schema: {e}")
+
+@app.on_event("startup")
+async def startup():
+    await run_in_threadpool(verify_journey_schema)
+
+async def load_patient_journey(patient_id: str) -> dict:
+    if patient_journey_logic.async_driver:
+        return await patient_journey_logic.get_patient_journey_async(patient_id)
+    # Sync driver (or mock data): keep the blocking call off the event loop
+    return await run_in_threadpool(patient_journey_logic.get_patient_journey, patient_id)
+
+async def fetch_patient_journey(patient_id: str) -> dict:
+    return await journey_cache.get(patient_id, load_patient_journey)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await patient_journey_logic.close_async()
+    patient_journey_logic.close()
 
 @app.post("/patient_journey", response_model=PatientJourneyResponse)
-def handle_patient_journey(request: PatientJourneyRequest):
+async def handle_patient_journey(request: PatientJourneyRequest):
     try:
         if not request.patient_id:
             return PatientJourneyResponse(error="patient_id is required")
 
         # Query patient journey from Neo4j
-        journey_data = patient_journey_logic.get_patient_journey(request.patient_id)
+        journey_data = await fetch_patient_journey(request.patient_id)
         
         if "error" in journey_data:
             return PatientJourneyResponse(error=journey_data["error"])
@@ -113,3 +162,18 @@ def handle_patient_journey(request: PatientJourneyRequest):
         return PatientJourneyResponse(error=str(e))
     except Exception as e:
         return PatientJourneyResponse(error=str(e))
+
+@app.post("/patient_journey/invalidate", response_model=JourneyInvalidationResponse)
+def invalidate_patient_journeys(request: JourneyInvalidationRequest):
+    """Called by ingest paths after a patient's journey data changed in Neo4j"""
+    if request.invalidate_all:
+        return JourneyInvalidationResponse(invalidated=journey_cache.invalidate_all())
+    return JourneyInvalidationResponse(invalidated=journey_cache.invalidate(request.patient_ids))
+
+@app.get("/metrics")
+def metrics():
+    return {
+        "journey_cache": journey_cache.stats(),
+        "scan_fallback": patient_journey_logic.lookup_fallback_scan,
+        "scan_fallback_hits": patient_journey_logic.scan_fallback_hits
+    }
@@ -0,0 +1,104 @@
+import json
+import codecs
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class BundleStreamReader:
+    """
+    Incremental reader for a FHIR Bundle delivered as a stream of chunks.
+    entries() yields the items of the top-level "entry" array one at a time;
+    the other top-level fields (resourceType, meta, total, link, ...) are kept in
+    self.fields. Only the entry being decoded is held in memory, plus the
+    unconsumed part of the current chunk.
+    """
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.fields: Dict[str, Any] = {}
+        self.entry_count = 0
+
+    def _fill(self) -> bool:
+        """Appends the next chunk to the buffer, dropping what was consumed; False at end of stream"""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            text = self._utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return not self._eof or bool(text)
+
+    def _peek(self) -> str:
+        """Next non-whitespace character (not consumed)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of FHIR bundle stream")
+
+    def _expect(self, allowed: str) -> str:
+        char = self._peek()
+        if char not in allowed:
+            raise ValueError(f"Malformed FHIR bundle: expected one of {allowed!r}, got {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self) -> Any:
+        """Decodes the next JSON value, reading more chunks until it is complete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A value touching the end of the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Grow the pending text geometrically so large values are not re-parsed per chunk
+            pending = len(self._buffer) - self._pos
+            while len(self._buffer) - self._pos < 2 * pending and self._fill():
+                pass
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "entry":
+                self._expect("[")
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        self.entry_count += 1
+                        yield self._value()
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                self.fields[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+
+    def next_link(self) -> Optional[str]:
+        """URL of the next page, once the stream has been read to the end"""
+        for link in self.fields.get("link", []):
+            if link.get("relation") == "next":
+                return link.get("url")
+        return None
@@ -1,68 +1,441 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin
+import os
+import json
+import time
+import hashlib
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 
+from common.ttl_cache import TTLCache, approximate_size
+from ontology.symptom_ontology import symptom_ontology
+from .fhir_bundle_stream import BundleStreamReader
+from .history_index import SymptomHistoryIndex
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def _parse_instant(value: str) -> datetime:
+    """FHIR instant (e.g. 2025-11-08T10:00:00Z) as an aware datetime"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+class FHIRLookupError(Exception):
+    """The FHIR server could not be read and there was no cached history to fall back on"""
+
+def _resource_key(resource: Dict[str, Any]) -> str:
+    """
+    Local-copy key of a resource: its type and id, or a content hash for resources
+    without an id so a delta that returns them again does not add a duplicate
+    """
+    if resource.get("id"):
+        return f"{resource.get('resourceType')}/{resource['id']}"
+    digest = hashlib.sha1(json.dumps(resource, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"#{digest}"
+
 class FHIRConnector:
     """
-    Handles FHIR database interactions for symptom analysis
+    Handles FHIR database interactions for symptom analysis.
+    Patient histories are cached per patient: within the TTL they are served without
+    a request, after it they are revalidated with If-None-Match / If-Modified-Since so
+    an unchanged history costs a 304 instead of a full bundle.
+    Bundles are read as a stream, entry by entry and page by page, never as one document.
+    Each cached history carries a SymptomHistoryIndex that is rebuilt only when the
+    history changes.
     """
-    def __init__(self, fhir_server_url: Optional[str] = None):
+    def __init__(self, fhir_server_url: Optional[str] = None,
+                 cache_ttl: Optional[float] = None,
+                 cache_max_entries: Optional[int] = None,
+                 cache_max_bytes: Optional[int] = None):
         self.fhir_server_url = fhir_server_url or "http://localhost:8004"  # Default FHIR server port
+        self.timeout = float(os.getenv("FHIR_HTTP_TIMEOUT", "10"))
+        # Optional server page size (_count); bundle pages are followed through their next links
+        self.page_size = os.getenv("FHIR_HISTORY_PAGE_SIZE")
+        self.stream_chunk_size = int(os.getenv("FHIR_STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+        # Keep-alive connection pool shared by every history fetch
+        self.session = requests.Session()
+        pool_size = int(os.getenv("FHIR_HTTP_POOL_SIZE", "16"))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Entries are served as-is for cache_ttl seconds, then kept (up to the retention
+        # period) only as validators for conditional requests
+        self.cache_enabled = os.getenv("FHIR_HISTORY_CACHE_ENABLED", "true").lower() == "true"
+        self.cache_ttl = cache_ttl if cache_ttl is not None else float(os.getenv("FHIR_HISTORY_CACHE_TTL", "60"))
+        self.history_cache = TTLCache(
+            max_entries=cache_max_entries or int(os.getenv("FHIR_HISTORY_CACHE_MAX_ENTRIES", "1024")),
+            default_ttl=float(os.getenv("FHIR_HISTORY_CACHE_RETENTION", "3600")),
+            max_bytes=cache_max_bytes or int(os.getenv("FHIR_HISTORY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            sizeof=self._history_size
+        )
+        self._stats_lock = threading.Lock()
+        # Delta syncs between full fetches; a full fetch also drops deleted resources
+        self.full_sync_interval = float(os.getenv("FHIR_HISTORY_FULL_SYNC_INTERVAL", "86400"))
+        self.counters = {"fresh_hits": 0, "revalidated": 0, "delta_synced": 0, "delta_resources": 0,
+                         "fetched": 0, "not_found": 0, "errors": 0, "stale_served": 0}
+        self.fetch_latency = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        # Previous-occurrence and co-occurrence analysis, answered from the history index
+        self.historical_context_enabled = os.getenv("FHIR_HISTORICAL_CONTEXT_ENABLED", "true").lower() == "true"
         logger.info(f"FHIR Connector initialized with server URL: {self.fhir_server_url}")
-        self.snomed_symptom_map = {
-            'headache': '25064002',
-            'fever': '386661006',
-            'cough': '49727002',
-            'nausea': '422587007',
-            'fatigue': '84229001',
-            'sore throat': '267102003'
-        }
+
+    @property
+    def snomed_symptom_map(self) -> Dict[str, str]:
+        """Symptom -> SNOMED CT code, from the shared symptom ontology"""
+        return symptom_ontology.snapshot().symptom_codes
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            self.counters[counter] += 1
+
+    def _record_latency(self, elapsed_ms: float) -> None:
+        with self._stats_lock:
+            self.fetch_latency["count"] += 1
+            self.fetch_latency["total_ms"] += elapsed_ms
+            self.fetch_latency["max_ms"] = max(self.fetch_latency["max_ms"], elapsed_ms)
+            self.fetch_latency["last_ms"] = elapsed_ms
 
     def get_patient_history(self, patient_id: str) -> Dict[str, Any]:
         """
-        Retrieve patient's symptom history from FHIR server
+        Retrieve patient's symptom history from FHIR server as a searchset bundle
+        (empty if there is none or it could not be read)
         """
         try:
-            endpoint = f"{self.fhir_server_url}/Patient/{patient_id}/Observation"
-            logger.info(f"Requesting patient history from FHIR endpoint: {endpoint}")
-            
-            response = requests.get(endpoint)
-            logger.info(f"FHIR response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Successfully retrieved history for patient {patient_id}")
-                # Log the actual response data
-                logger.info(f"FHIR response data: {data}")
-                return data
-            elif response.status_code == 404:
-                logger.warning(f"Patient {patient_id} not found in FHIR server")
-            else:
-                logger.error(f"FHIR server error: {response.status_code} - {response.text}")
-            return {}
-            
-        except requests.RequestException as e:
-            logger.error(f"Network error accessing FHIR server: {str(e)}")
+            local = self._load_history(patient_id)
+        except FHIRLookupError:
             return {}
+        return self._as_bundle(local) if local else {}
+
+    def get_history_index(self, patient_id: str) -> Optional[SymptomHistoryIndex]:
+        """
+        Indexed patient history, or None if there is none. Cached histories reuse the
+        index stored with them; uncached ones are indexed while streaming.
+        Raises FHIRLookupError when the server could not be read.
+        """
+        if self.cache_enabled:
+            local = self._load_history(patient_id)
+            return self._local_index(local, patient_id) if local else None
+        resources = self.iter_patient_history(patient_id)
+        return self._build_index(resources, patient_id) if resources is not None else None
+
+    def _load_history(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Local copy of the patient's history, refreshed as needed.
+        A stale local copy is brought up to date with a _lastUpdated delta query and
+        merged by resource id; full (conditional) fetches are only made for patients
+        without a local copy and every full_sync_interval seconds, which also picks up
+        deletions that _lastUpdated searches cannot report.
+        Returns None when the patient has no history and raises FHIRLookupError when
+        the server failed and no cached copy could be served instead.
+        """
+        cached_entry = self.history_cache.get_entry(patient_id, count=False) if self.cache_enabled else None
+        cached = cached_entry[0] if cached_entry else None
+        if cached_entry and cached_entry[1] < self.cache_ttl:
+            self._count("fresh_hits")
+            logger.info(f"Serving cached history for patient {patient_id}")
+            return cached
+
+        endpoint = f"{self.fhir_server_url}/Patient/{patient_id}/Observation"
+        try:
+            if cached and cached.get("cursor") and time.time() - cached["full_synced_at"] < self.full_sync_interval:
+                return self._sync_history_delta(patient_id, endpoint, cached)
+            return self._fetch_full_history(patient_id, endpoint, cached)
+        except FHIRLookupError:
+            raise
+        except (requests.RequestException, ValueError) as e:
+            # Network failures and unreadable bundles (ValueError from the stream parser)
+            self._count("errors")
+            if cached:
+                self._count("stale_served")
+                logger.warning(f"Error reading history from FHIR server, serving cached history: {str(e)}")
+                return cached
+            logger.error(f"Error reading history from FHIR server: {str(e)}")
+            raise FHIRLookupError(str(e)) from e
         except Exception as e:
+            self._count("errors")
             logger.error(f"Unexpected error fetching patient history: {str(e)}")
+            raise FHIRLookupError(str(e)) from e
+
+    def iter_patient_history(self, patient_id: str) -> Optional[Iterator[Dict[str, Any]]]:
+        """
+        Patient history as a generator of FHIR resources, or None if there is none;
+        FHIRLookupError when the server could not be read.
+        With the cache enabled this walks the cached local copy; without it the bundle
+        is streamed straight from the server, so memory stays flat however long the
+        history is.
+        """
+        if self.cache_enabled:
+            local = self._load_history(patient_id)
+            return iter(list(local["resources"].values())) if local else None
+
+        endpoint = f"{self.fhir_server_url}/Patient/{patient_id}/Observation"
+        try:
+            response = self._get(endpoint, params=self._page_params(), stream=True)
+            if response.status_code == 200:
+                self._count("fetched")
+                return self._stream_resources(response)
+            return self._handle_error_status(patient_id, response)
+        except requests.RequestException as e:
+            self._count("errors")
+            logger.error(f"Network error accessing FHIR server: {str(e)}")
+            raise FHIRLookupError(str(e)) from e
+
+    def _page_params(self, params: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        params = dict(params or {})
+        if self.page_size:
+            params["_count"] = self.page_size
+        return params
+
+    def _get(self, endpoint: str, **kwargs) -> requests.Response:
+        logger.info(f"Requesting patient history from FHIR endpoint: {endpoint} {kwargs.get('params') or ''}")
+        started = time.perf_counter()
+        response = self.session.get(endpoint, timeout=self.timeout, **kwargs)
+        self._record_latency((time.perf_counter() - started) * 1000)
+        logger.info(f"FHIR response status: {response.status_code}")
+        return response
+
+    def _fetch_full_history(self, patient_id: str, endpoint: str,
+                            cached: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = self._get(endpoint, headers=headers, params=self._page_params(), stream=True)
+        if response.status_code == 304 and cached:
+            response.close()
+            # Unchanged: restart the freshness window without transferring the bundle
+            cached = {**cached, "full_synced_at": time.time()}
+            self.history_cache.set(patient_id, cached)
+            self._count("revalidated")
+            logger.info(f"History for patient {patient_id} not modified")
+            return cached
+        if response.status_code == 200:
+            local = {
+                "resources": {},
+                "cursor": None,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "full_synced_at": time.time()
+            }
+            count = self._merge_resources(local, self._stream_resources(response))
+            self._count("fetched")
+            logger.info(f"Successfully retrieved history for patient {patient_id}: {count} resources")
+            if self.cache_enabled:
+                self._local_index(local)
+                self.history_cache.set(patient_id, local)
+            return local
+        return self._handle_error_status(patient_id, response, cached)
+
+    def _sync_history_delta(self, patient_id: str, endpoint: str, cached: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Fetch only resources changed since the local copy's cursor and merge them in"""
+        # ge, not gt: a resource written later with the same lastUpdated instant as the
+        # cursor would otherwise be missed until the next full sync. Resources already
+        # held unchanged are ignored by the merge.
+        response = self._get(endpoint, params=self._page_params({"_lastUpdated": f"ge{cached['cursor']}"}), stream=True)
+        if response.status_code == 200:
+            local = {**cached, "resources": dict(cached["resources"])}
+            changed = self._merge_resources(local, self._stream_resources(response))
+            if changed:
+                # The index and size describe the previous version of the history
+                local.pop("index", None)
+                local.pop("size", None)
+                self._local_index(local)
+            self.history_cache.set(patient_id, local)
+            if changed:
+                self._count("delta_synced")
+                with self._stats_lock:
+                    self.counters["delta_resources"] += changed
+                logger.info(f"Merged {changed} changed resources into history for patient {patient_id}")
+            else:
+                self._count("revalidated")
+                logger.info(f"History for patient {patient_id} not modified")
+            return local
+        return self._handle_error_status(patient_id, response, cached)
+
+    def _handle_error_status(self, patient_id: str, response: requests.Response,
+                             cached: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Only a 404 drops the local copy; on any other error status (e.g. a 5xx outage)
+        the cached history is served as stale, as for network errors.
+        """
+        if response.status_code == 404:
+            self._count("not_found")
+            self.history_cache.delete(patient_id)
+            logger.warning(f"Patient {patient_id} not found in FHIR server")
+            return None
+        self._count("errors")
+        if cached:
+            self._count("stale_served")
+            logger.warning(f"FHIR server error {response.status_code}, serving cached history for patient {patient_id}")
+            return cached
+        logger.error(f"FHIR server error: {response.status_code} - {response.text}")
+        raise FHIRLookupError(f"FHIR server error: {response.status_code}")
+
+    def _local_index(self, local: Dict[str, Any], patient_id: Optional[str] = None) -> SymptomHistoryIndex:
+        """
+        Index stored with a local copy, (re)built if missing or built on an older ontology.
+        With patient_id the cached entry is re-sized after a rebuild, so the byte budget
+        counts the new index.
+        """
+        index = local.get("index")
+        if index is None or index.ontology is not symptom_ontology.snapshot():
+            index = SymptomHistoryIndex.build(local["resources"].values())
+            local["index"] = index
+            local.pop("size", None)
+            if patient_id is not None:
+                self.history_cache.resize(patient_id)
+        return index
+
+    @staticmethod
+    def _history_size(local: Dict[str, Any]) -> int:
+        """
+        Cache footprint of a local copy: its resources plus the index, which holds a
+        second copy of every record. Computed once per version of the history, so
+        304 and no-change delta refreshes do not re-serialize it.
+        """
+        size = local.get("size")
+        if size is None:
+            index = local.get("index")
+            size = approximate_size(local["resources"]) + (index.approximate_size() if index is not None else 0)
+            local["size"] = size
+        return size
+
+    def _build_index(self, resources: Iterable[Dict[str, Any]], patient_id: str) -> SymptomHistoryIndex:
+        """Indexes a resource stream, keeping what was read if the stream breaks off"""
+        index = SymptomHistoryIndex()
+        try:
+            for resource in resources:
+                index.add(resource)
+        except (requests.RequestException, ValueError) as e:
+            self._count("errors")
+            logger.error(f"FHIR history stream for patient {patient_id} ended early: {str(e)}")
+        return index.finalize()
+
+    def _stream_resources(self, response: requests.Response) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the resources of a streamed searchset bundle one at a time, following
+        the bundle's next links until the last page
+        """
+        while response is not None:
+            try:
+                reader = BundleStreamReader(response.iter_content(chunk_size=self.stream_chunk_size))
+                for entry in reader.entries():
+                    resource = entry.get("resource")
+                    if resource:
+                        yield resource
+                next_url = reader.next_link()
+            finally:
+                response.close()
+            response = None
+            if next_url:
+                response = self._get(urljoin(self.fhir_server_url + "/", next_url), stream=True)
+                if response.status_code != 200:
+                    response.close()
+                    raise requests.HTTPError(f"FHIR bundle page request failed: {response.status_code}", response=response)
+
+    @staticmethod
+    def _iter_bundle_resources(bundle: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for entry in bundle.get("entry", []):
+            resource = entry.get("resource")
+            if resource:
+                yield resource
+
+    @staticmethod
+    def _merge_resources(local: Dict[str, Any], resources_in: Iterable[Dict[str, Any]]) -> int:
+        """
+        Upserts resources into the local copy by resource id and advances the
+        _lastUpdated cursor. Returns how many resources were added or changed.
+        """
+        resources = local["resources"]
+        changed = 0
+        for resource in resources_in:
+            key = _resource_key(resource)
+            if resources.get(key) != resource:
+                resources[key] = resource
+                changed += 1
+            last_updated = resource.get("meta", {}).get("lastUpdated")
+            if last_updated and (not local["cursor"] or _parse_instant(last_updated) > _parse_instant(local["cursor"])):
+                local["cursor"] = last_updated
+        return changed
+
+    @staticmethod
+    def _as_bundle(local: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "meta": {"lastUpdated": local["cursor"]},
+            "total": len(local["resources"]),
+            "entry": [{"resource": resource} for resource in local["resources"].values()]
+        }
+
+    def invalidate_patient_history(self, patient_id: str) -> bool:
+        return self.history_cache.delete(patient_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """History cache hit ratio and fetch latency"""
+        with self._stats_lock:
+            counters = dict(self.counters)
+            latency = dict(self.fetch_latency)
+        served_from_cache = counters["fresh_hits"] + counters["revalidated"] + counters["delta_synced"]
+        lookups = served_from_cache + counters["fetched"] + counters["not_found"]
+        return {
+            "cache_enabled": self.cache_enabled,
+            "cache_ttl": self.cache_ttl,
+            **counters,
+            "hit_ratio": round(served_from_cache / lookups, 4) if lookups else 0.0,
+            "fetch_latency_ms": {
+                "count": latency["count"],
+                "avg": round(latency["total_ms"] / latency["count"], 2) if latency["count"] else 0.0,
+                "max": round(latency["max_ms"], 2),
+                "last": round(latency["last_ms"], 2)
+            },
+            "cache": self.history_cache.stats()
+        }
+
+    def get_history_indexes(self, patient_ids: Iterable[str], max_workers: int = 8) -> Dict[str, Any]:
+        """
+        Indexed history once per distinct patient, several patients concurrently.
+        A patient maps to its index, to {} when it has no history, or to None when the
+        lookup failed (enrich_symptoms then retries it and reports the failure).
+        """
+        unique_ids = list(dict.fromkeys(pid for pid in patient_ids if pid))
+        if not unique_ids:
             return {}
 
+        def lookup(patient_id: str) -> Any:
+            try:
+                index = self.get_history_index(patient_id)
+            except FHIRLookupError:
+                return None
+            return index if index is not None else {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_ids)))) as executor:
+            return dict(zip(unique_ids, executor.map(lookup, unique_ids)))
+
     def get_standard_symptom_codes(self, symptoms: List[str]) -> Dict[str, str]:
         """
         Convert symptom names to SNOMED CT codes
         """
+        ontology = symptom_ontology.snapshot()
         return {
-            symptom: self.snomed_symptom_map.get(symptom.lower(), '')
+            symptom: ontology.snomed_code(symptom)
             for symptom in symptoms
         }
 
-    def enrich_symptoms(self, symptoms: List[str], patient_id: Optional[str] = None) -> Dict[str, Any]:
+    def enrich_symptoms(self, symptoms: List[str], patient_id: Optional[str] = None,
+                        patient_history: Optional[Any] = None) -> Dict[str, Any]:
         """
-        Enrich symptom data with FHIR data if available
+        Enrich symptom data with FHIR data if available.
+        patient_history may be passed in when it was already fetched (e.g. for a batch),
+        either as a SymptomHistoryIndex or as a bundle ({} for none); with None it is
+        fetched here and a failed lookup raises FHIRLookupError.
         """
         logger.info(f"Enriching symptoms for patient {patient_id}: {symptoms}")
         
@@ -79,135 +452,39 @@ class FHIRConnector:
             logger.info("No patient ID provided for FHIR enrichment")
             return enriched_data
 
-        patient_history = self.get_patient_history(patient_id)
-        if not patient_history:
+        if isinstance(patient_history, SymptomHistoryIndex):
+            index = patient_history
+        elif patient_history is None:
+            index = self.get_history_index(patient_id)
+        else:
+            index = SymptomHistoryIndex.build(self._iter_bundle_resources(patient_history)) if patient_history else None
+        if index is None:
             logger.info("No patient history found in FHIR")
             return enriched_data
 
         # Process patient history
         enriched_data['has_patient_history'] = True
-        entries = patient_history.get('entry', [])
-        logger.info(f"Processing {len(entries)} FHIR entries for patient {patient_id}")
+        logger.info(f"Processing {index.resource_count} FHIR resources for patient {patient_id}")
 
         # Add current symptoms to enriched data
         enriched_data['current_symptoms'] = symptoms
         logger.info(f"Current symptoms being analyzed: {symptoms}")
-        
-        for entry in entries:
-            resource = entry.get('resource', {})
-            if resource.get('resourceType') == 'Observation':
-                # Extract symptom from coding array
-                coding = resource.get('code', {}).get('coding', [])
-                symptom = coding[0].get('display') if coding else resource.get('code', {}).get('text', '')
-                
-                # Extract interpretation/severity
-                interpretation = resource.get('interpretation', [{}])[0].get('text', '').lower()
-                severity = self._extract_severity(resource)
-                
-                symptom_record = {
-                    'symptom': symptom,
-                    'date': resource.get('effectiveDateTime', ''),
-                    'severity': severity,
-                    'interpretation': interpretation,
-                    'value': resource.get('valueQuantity', {}).get('value'),
-                    'unit': resource.get('valueQuantity', {}).get('unit')
-                }
-                
-                if symptom_record['symptom']:
-                    logger.info(f"Found historical symptom record: {symptom_record}")
-                    enriched_data['symptom_history'].append(symptom_record)
-                    if not enriched_data['last_recorded_date'] or symptom_record['date'] > enriched_data['last_recorded_date']:
-                        enriched_data['last_recorded_date'] = symptom_record['date']
-                    
-                    # Check if this is one of the current symptoms and track severity
-                    if symptom.lower() in [s.lower() for s in symptoms]:
-                        logger.info(f"Matched historical symptom {symptom} with current symptoms (severity: {severity})")
-                        # Track severity for matching symptoms
-                        enriched_data.setdefault('matching_symptoms', []).append({
-                            'symptom': symptom,
-                            'severity': severity,
-                            'date': symptom_record['date']
-                        })
-
-        # Extract related conditions
-        enriched_data['related_conditions'] = self._extract_related_conditions(patient_history)
-        
-        return enriched_data
 
-    def _extract_severity(self, resource: Dict[str, Any]) -> str:
-        """
-        Extract severity from a FHIR resource
-        """
-        severity = 'unknown'
-        interpretation = resource.get('interpretation', [{}])[0].get('text', '').lower()
-        if interpretation:
-            if interpretation in ['severe', 'critical', 'extreme']:
-                severity = 'severe'
-            elif interpretation in ['moderate', 'medium']:
-                severity = 'moderate'
-            elif interpretation in ['mild', 'low']:
-                severity = 'mild'
-        return severity
-
-    def _extract_related_conditions(self, patient_history: Dict[str, Any]) -> List[str]:
-        """
-        Extract related conditions from patient history
-        """
-        conditions = set()
-        for entry in patient_history.get('entry', []):
-            resource = entry.get('resource', {})
-            if resource.get('resourceType') == 'Condition':
-                condition = resource.get('code', {}).get('text')
-                if condition:
-                    conditions.add(condition)
-        return list(conditions)
-
-        if patient_id:
-            patient_history = self.get_patient_history(patient_id)
-            if patient_history:
-                # Add historical context
-                enriched_data['historical_context'] = {
-                    'previous_occurrences': self._extract_previous_occurrences(patient_history, symptoms),
-                    'related_symptoms': self._extract_related_symptoms(patient_history, symptoms)
-                }
+        enriched_data['symptom_history'] = list(index.records)
+        enriched_data['last_recorded_date'] = index.last_recorded_date
 
-        return enriched_data
+        # Matching is on canonical ontology names so synonyms and coded entries match too
+        matching = index.matching_symptoms(symptoms)
+        if matching:
+            logger.info(f"Matched {len(matching)} historical records with current symptoms")
+            enriched_data['matching_symptoms'] = matching
+
+        if self.historical_context_enabled:
+            enriched_data['historical_context'] = {
+                'previous_occurrences': index.previous_occurrences(symptoms),
+                'related_symptoms': index.related_symptoms(symptoms)
+            }
 
-    def _extract_previous_occurrences(self, history: Dict[str, Any], current_symptoms: List[str]) -> Dict[str, List[Dict[str, Any]]]:
-        """
-        Extract previous occurrences of current symptoms from patient history
-        """
-        occurrences = {}
-        for symptom in current_symptoms:
-            occurrences[symptom] = []
-            if 'entry' in history:
-                for entry in history['entry']:
-                    if entry.get('resource', {}).get('code', {}).get('coding', [{}])[0].get('display', '').lower() == symptom.lower():
-                        occurrences[symptom].append({
-                            'date': entry['resource'].get('effectiveDateTime', ''),
-                            'severity': entry['resource'].get('interpretation', [{}])[0].get('text', 'unknown')
-                        })
-        return occurrences
-
-    def _extract_related_symptoms(self, history: Dict[str, Any], current_symptoms: List[str]) -> List[str]:
-        """
-        Find symptoms that commonly occur together based on patient history
-        """
-        related_symptoms = set()
-        if 'entry' in history:
-            # Get dates when current symptoms occurred
-            symptom_dates = set()
-            for entry in history['entry']:
-                symptom = entry.get('resource', {}).get('code', {}).get('coding', [{}])[0].get('display', '').lower()
-                if symptom in [s.lower() for s in current_symptoms]:
-                    symptom_dates.add(entry['resource'].get('effectiveDateTime', '')[:10])  # Get just the date part
-
-            # Find other symptoms that occurred on the same dates
-            for entry in history['entry']:
-                entry_date = entry['resource'].get('effectiveDateTime', '')[:10]
-                if entry_date in symptom_dates:
-                    symptom = entry.get('resource', {}).get('code', {}).get('coding', [{}])[0].get('display', '')
-                    if symptom.lower() not in [s.lower() for s in current_symptoms]:
-                        related_symptoms.add(symptom)
-
-        return list(related_symptoms)
\ No newline at end of file
+        enriched_data['related_conditions'] = list(index.conditions)
+        
+        return enriched_data
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Any, Iterable
+import logging
+
+from common.ttl_cache import approximate_size
+from ontology.symptom_ontology import OntologySnapshot, symptom_ontology
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def extract_severity(resource: Dict[str, Any]) -> str:
+    """
+    Extract severity from a FHIR resource
+    """
+    severity = 'unknown'
+    interpretation = resource.get('interpretation', [{}])[0].get('text', '').lower()
+    if interpretation:
+        if interpretation in ['severe', 'critical', 'extreme']:
+            severity = 'severe'
+        elif interpretation in ['moderate', 'medium']:
+            severity = 'moderate'
+        elif interpretation in ['mild', 'low']:
+            severity = 'mild'
+    return severity
+
+class SymptomHistoryIndex:
+    """
+    Index over one patient's FHIR history, built in a single pass over its resources:
+    canonical symptom -> records ordered by date, and date -> symptoms recorded that day.
+    Matching, previous-occurrence and co-occurrence queries are answered from the index
+    instead of re-scanning the entries for every query symptom.
+    """
+    def __init__(self, ontology: Optional[OntologySnapshot] = None):
+        self.ontology = ontology or symptom_ontology.snapshot()
+        self.records: List[Dict[str, Any]] = []
+        self.conditions: List[str] = []
+        self.last_recorded_date: Optional[str] = None
+        self.resource_count = 0
+        self._canonical: List[str] = []
+        self._by_symptom: Dict[str, List[int]] = {}
+        self._by_date: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def build(cls, resources: Iterable[Dict[str, Any]], ontology: Optional[OntologySnapshot] = None) -> "SymptomHistoryIndex":
+        index = cls(ontology)
+        for resource in resources:
+            index.add(resource)
+        return index.finalize()
+
+    def approximate_size(self) -> int:
+        """Rough in-memory footprint of the index, counted like a cache entry"""
+        return approximate_size([self.records, self.conditions, self._canonical, self._by_symptom, self._by_date])
+
+    def canonical(self, symptom: str) -> str:
+        return self.ontology.canonical(symptom) or symptom.lower()
+
+    def add(self, resource: Dict[str, Any]) -> None:
+        self.resource_count += 1
+        resource_type = resource.get('resourceType')
+        if resource_type == 'Condition':
+            condition = resource.get('code', {}).get('text')
+            if condition and condition not in self.conditions:
+                self.conditions.append(condition)
+            return
+        if resource_type != 'Observation':
+            return
+
+        # Extract symptom from coding array
+        coding = resource.get('code', {}).get('coding', [])
+        symptom = coding[0].get('display') if coding else resource.get('code', {}).get('text', '')
+        if not symptom:
+            return
+
+        record = {
+            'symptom': symptom,
+            'date': resource.get('effectiveDateTime', ''),
+            'severity': extract_severity(resource),
+            'interpretation': resource.get('interpretation', [{}])[0].get('text', '').lower(),
+            'value': resource.get('valueQuantity', {}).get('value'),
+            'unit': resource.get('valueQuantity', {}).get('unit')
+        }
+        # Coded entries match on SNOMED code, free-text ones on name or synonym
+        code = coding[0].get('code') if coding else None
+        canonical = self.ontology.symptom_for_code(code) or self.canonical(symptom)
+
+        position = len(self.records)
+        self.records.append(record)
+        self._canonical.append(canonical)
+        self._by_symptom.setdefault(canonical, []).append(position)
+        self._by_date.setdefault(record['date'][:10], {}).setdefault(canonical, symptom)
+        if not self.last_recorded_date or record['date'] > self.last_recorded_date:
+            self.last_recorded_date = record['date']
+
+    def finalize(self) -> "SymptomHistoryIndex":
+        for positions in self._by_symptom.values():
+            positions.sort(key=lambda p: (self.records[p]['date'], p))
+        return self
+
+    def matching_symptoms(self, symptoms: List[str]) -> List[Dict[str, Any]]:
+        """Historical records of any of the given symptoms, in history order"""
+        current = {self.canonical(s) for s in symptoms}
+        positions = sorted(p for c in current for p in self._by_symptom.get(c, []))
+        return [
+            {'symptom': self.records[p]['symptom'], 'severity': self.records[p]['severity'], 'date': self.records[p]['date']}
+            for p in positions
+        ]
+
+    def previous_occurrences(self, symptoms: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Earlier occurrences of each given symptom, oldest first"""
+        return {
+            symptom: [
+                {'date': self.records[p]['date'], 'severity': self.records[p]['severity']}
+                for p in self._by_symptom.get(self.canonical(symptom), [])
+            ]
+            for symptom in symptoms
+        }
+
+    def related_symptoms(self, symptoms: List[str]) -> List[str]:
+        """Other symptoms recorded on the same days as any of the given symptoms"""
+        current = {self.canonical(s) for s in symptoms}
+        dates = {self.records[p]['date'][:10] for c in current for p in self._by_symptom.get(c, [])}
+        related = {
+            display
+            for date in dates
+            for canonical, display in self._by_date.get(date, {}).items()
+            if canonical not in current
+        }
+        return sorted(related)
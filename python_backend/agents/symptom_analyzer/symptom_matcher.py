@@ -0,0 +1,180 @@
+import threading
+from collections import deque
+from itertools import accumulate
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+from ontology.symptom_ontology import OntologySnapshot, symptom_ontology
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Phrase groups of a symptom entry that the matcher indexes
+PHRASE_ROLES = ("keywords", "severity_indicators", "temporal_patterns")
+# Joins batch texts for a single scan; vocabulary phrases never contain it
+TEXT_SEPARATOR = "\x00"
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. Every occurrence of every pattern
+    (overlapping ones included) is found in one left-to-right pass over the text,
+    so matching cost depends on the text length, not on the vocabulary size.
+    """
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        self._built = False
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern: str) -> None:
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        if pattern not in self._out[state]:
+            self._out[state].append(pattern)
+        self._built = False
+
+    def build(self) -> "AhoCorasick":
+        """Computes failure links breadth-first and merges suffix outputs into each state"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yields (start, end, pattern) for every occurrence, ordered by end offset"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in out[state]:
+                yield index - len(pattern) + 1, index + 1, pattern
+
+    @property
+    def state_count(self) -> int:
+        return len(self._goto)
+
+class SymptomMatcher:
+    """
+    Compiled symptom vocabulary: one automaton over every keyword, severity
+    indicator and temporal pattern, plus a reverse index keyword -> symptoms.
+    Built once; match() is a single linear pass per text.
+    """
+    def __init__(self, symptom_map: Dict[str, Dict[str, Any]]):
+        self.symptom_map = symptom_map
+        self._order = {symptom: rank for rank, symptom in enumerate(symptom_map)}
+        self._keyword_index: Dict[str, List[str]] = {}
+        automaton = AhoCorasick()
+        for symptom, info in symptom_map.items():
+            for keyword in info.get("keywords", []):
+                self._keyword_index.setdefault(keyword, []).append(symptom)
+            for role in PHRASE_ROLES:
+                for phrase in info.get(role, []):
+                    automaton.add(phrase)
+        self.automaton = automaton.build()
+        logger.info(f"Symptom matcher compiled: {len(symptom_map)} symptoms, "
+                    f"{automaton.state_count} automaton states")
+
+    def find_phrases(self, text: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Every vocabulary phrase occurring in text with its (start, end) offsets"""
+        found: Dict[str, List[Tuple[int, int]]] = {}
+        for start, end, phrase in self.automaton.iter_matches(text):
+            found.setdefault(phrase, []).append((start, end))
+        return found
+
+    def find_phrases_many(self, texts: List[str]) -> List[Dict[str, List[Tuple[int, int]]]]:
+        """
+        find_phrases for many texts in one automaton pass. The texts are joined with
+        a separator no phrase contains, so matches never span two texts; offsets are
+        relative to each text.
+        """
+        joined = TEXT_SEPARATOR.join(texts)
+        starts = list(accumulate((len(text) + len(TEXT_SEPARATOR) for text in texts[:-1]), initial=0))
+        found: List[Dict[str, List[Tuple[int, int]]]] = [{} for _ in texts]
+        position = 0
+        for start, end, phrase in self.automaton.iter_matches(joined):
+            # Matches arrive ordered by end offset, so the owning text only moves forward
+            while position + 1 < len(starts) and start >= starts[position + 1]:
+                position += 1
+            offset = starts[position]
+            found[position].setdefault(phrase, []).append((start - offset, end - offset))
+        return found
+
+    def match(self, text: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns {symptom: {"keywords", "severity_indicators", "temporal_patterns", "offsets"}}
+        for every symptom whose keywords occur in text. Severity and temporal phrases are
+        only reported for symptoms that matched. Symptoms and phrases keep their vocabulary
+        order, as the per-keyword substring scans did.
+        """
+        return self._resolve(self.find_phrases(text))
+
+    def match_many(self, texts: List[str]) -> List[Dict[str, Dict[str, Any]]]:
+        """match() for each text, scanning all of them in a single pass"""
+        return [self._resolve(found) for found in self.find_phrases_many(texts)]
+
+    def _resolve(self, found: Dict[str, List[Tuple[int, int]]]) -> Dict[str, Dict[str, Any]]:
+        matched = {symptom for phrase in found for symptom in self._keyword_index.get(phrase, ())}
+
+        result: Dict[str, Dict[str, Any]] = {}
+        for symptom in sorted(matched, key=self._order.__getitem__):
+            info = self.symptom_map[symptom]
+            entry: Dict[str, Any] = {
+                role: [phrase for phrase in info.get(role, []) if phrase in found]
+                for role in PHRASE_ROLES
+            }
+            entry["offsets"] = sorted(
+                (start, end, phrase, role)
+                for role in PHRASE_ROLES for phrase in entry[role] for start, end in found[phrase]
+            )
+            result[symptom] = entry
+        return result
+
+    def severity_score(self, symptom: str, indicators: List[str]) -> float:
+        """Strongest weight among the severity indicators found for a symptom (0 if none)"""
+        weights = self.symptom_map[symptom].get("severity_weights", {})
+        return max((weights.get(indicator, 0.5) for indicator in indicators), default=0)
+
+_compiled: Tuple[Optional[OntologySnapshot], Optional[SymptomMatcher]] = (None, None)
+_compile_lock = threading.Lock()
+
+def get_symptom_matcher() -> SymptomMatcher:
+    """
+    Matcher for the current ontology snapshot. Compiled once per ontology version
+    and shared by every request; recompiled after a hot reload of the ontology.
+    """
+    global _compiled
+    snapshot = symptom_ontology.snapshot()
+    compiled_for, matcher = _compiled
+    if compiled_for is snapshot:
+        return matcher
+    with _compile_lock:
+        if _compiled[0] is not snapshot:
+            _compiled = (snapshot, SymptomMatcher(snapshot.symptoms))
+        return _compiled[1]
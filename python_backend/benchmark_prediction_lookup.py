@@ -0,0 +1,71 @@
+"""
+Per-request cost of rule-based disease prediction with and without the precomputed
+lookup table (RULE_LOOKUP_TABLE_ENABLED).
+
+    python benchmark_prediction_lookup.py --requests 20000
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from ontology.symptom_ontology import symptom_ontology
+from sub_agents.domain_logic import DomainLogic
+from sub_agents.rule_engine import RuleEngine
+
+def make_requests(engine, count, seed):
+    rng = random.Random(seed)
+    vocabulary = sorted(engine.ontology.synonyms) + ["fatigue", "back pain", "insomnia"]
+    return [
+        {
+            'symptoms': rng.sample(vocabulary, rng.randint(1, 4)),
+            'severity_level': rng.choice(['low', 'medium', 'high'])
+        }
+        for _ in range(count)
+    ]
+
+def time_per_request(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--max-symptoms", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    snapshot = symptom_ontology.snapshot()
+    live = RuleEngine(snapshot)
+    table = RuleEngine(snapshot)
+    entries = table.build_lookup_table(max_symptoms=args.max_symptoms)
+    items = make_requests(live, args.requests, args.seed)
+
+    # Both engines must agree before their timings mean anything
+    for item in items:
+        expected = live.evaluate(item['symptoms'], item['severity_level'])
+        assert table.evaluate(item['symptoms'], item['severity_level']) == expected, item
+
+    table.lookup_hits = table.lookup_misses = 0
+
+    print(f"Ontology v{snapshot.version}: {len(live.combinations)} combinations, {len(live.groups)} groups, "
+          f"{len(live.symptom_bits)} rule symptoms")
+    print(f"Lookup table: {entries} keys built in {table.lookup_build_ms:.1f} ms")
+
+    live_us = time_per_request(lambda item: live.evaluate(item['symptoms'], item['severity_level']), items)
+    table_us = time_per_request(lambda item: table.evaluate(item['symptoms'], item['severity_level']), items)
+    print(f"determine_conditions  live: {live_us:8.2f} us/request   table: {table_us:8.2f} us/request")
+
+    # End to end through DomainLogic.predict_disease (its console logging is silenced)
+    domain_logic = DomainLogic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        live_e2e = time_per_request(lambda item: domain_logic.predict_disease(item, live), items)
+        table_e2e = time_per_request(lambda item: domain_logic.predict_disease(item, table), items)
+    print(f"predict_disease       live: {live_e2e:8.2f} us/request   table: {table_e2e:8.2f} us/request")
+    print(f"Table hits: {table.lookup_hits}, misses (live fallback): {table.lookup_misses}")
+
+if __name__ == "__main__":
+    main()
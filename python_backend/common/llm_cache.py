@@ -0,0 +1,106 @@
+import os
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from common.ttl_cache import TTLCache
+from common.sqlite_store import SQLiteKVStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def normalize_llm_input(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of an LLM input"""
+    return " ".join((text or "").lower().split()).rstrip(" .!?")
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM completions keyed on model + prompt template + normalized input.
+    The in-memory LRU tier is always on; the SQLite tier is enabled by a path and
+    survives restarts (and can be shared by several services on one host).
+    Only successful completions are stored, so failures are retried on the next call.
+    """
+    def __init__(self,
+                 max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 path: Optional[str] = None,
+                 enabled: Optional[bool] = None):
+        self.enabled = enabled if enabled is not None else os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "86400"))
+        max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+        path = path or os.getenv("LLM_CACHE_PATH")
+        self.memory = TTLCache(max_entries=max_entries, default_ttl=self.ttl)
+        self.disk = SQLiteKVStore(path, table="llm_cache", max_entries=max_entries * 10) if path and self.enabled else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk:
+            logger.info(f"LLM response cache persisted to {path}")
+
+    @staticmethod
+    def make_key(model: str, template: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, template, normalize_llm_input(text)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, model: str, template: str, text: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = self.make_key(model, template, text)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.disk:
+            value = self.disk.get(key)
+            if value is not None:
+                # Promote to the memory tier for the following lookups
+                self.memory.set(key, value)
+                self._count("hits")
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, model: str, template: str, text: str, value: Any) -> None:
+        if not self.enabled or value is None:
+            return
+        key = self.make_key(model, template, text)
+        self.memory.set(key, value)
+        if self.disk:
+            self.disk.set(key, value, self.ttl)
+
+    def call(self, model: str, template: str, text: str, fn: Callable[[], Any]) -> Any:
+        """Returns the cached completion, or runs fn() and caches what it returns"""
+        cached = self.get(model, template, text)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        value = fn()
+        self.set(model, template, text, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk else None
+        }
+
+    def close(self) -> None:
+        if self.disk:
+            self.disk.close()
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONTOLOGY_PATH = Path(__file__).resolve().parent / "symptom_ontology.json"
+SEVERITY_LEVELS = ("low", "medium", "high")
+
+class OntologySnapshot:
+    """
+    Immutable view of one version of the symptom ontology with its lookup indexes:
+    synonym -> canonical symptom, SNOMED code -> symptom, symptom -> code,
+    symptom -> rule groups and symptom -> associated conditions per severity.
+    """
+    def __init__(self, data: Dict[str, Any], source: Optional[str] = None, mtime: Optional[float] = None):
+        self.version = data.get("version")
+        self.source = source
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.symptoms: Dict[str, Dict[str, Any]] = data.get("symptoms", {})
+        self.combinations: List[Tuple[Tuple[str, ...], Dict[str, List[str]]]] = [
+            (tuple(rule["symptoms"]), rule["conditions"]) for rule in data.get("combinations", [])
+        ]
+        self.groups: Dict[str, Dict[str, Any]] = data.get("groups", {})
+        self._validate()
+
+        self.synonyms: Dict[str, str] = {}
+        self.symptom_codes: Dict[str, str] = {}
+        self.codes: Dict[str, str] = {}
+        for symptom, info in self.symptoms.items():
+            self.synonyms[symptom] = symptom
+            for keyword in info.get("keywords", []):
+                self.synonyms.setdefault(keyword, symptom)
+            code = info.get("snomed")
+            if code:
+                self.symptom_codes[symptom] = code
+                self.codes[code] = symptom
+
+        self.symptom_groups: Dict[str, List[str]] = {}
+        self.symptom_conditions: Dict[str, Dict[str, List[str]]] = {}
+        for name, group in self.groups.items():
+            for symptom in group["symptoms"]:
+                self.symptom_groups.setdefault(symptom, []).append(name)
+                self._add_conditions(symptom, group["conditions"])
+        for combo, conditions in self.combinations:
+            for symptom in combo:
+                self._add_conditions(symptom, conditions)
+
+    def _validate(self) -> None:
+        for symptom, info in self.symptoms.items():
+            if not info.get("keywords"):
+                raise ValueError(f"Ontology symptom '{symptom}' has no keywords")
+        rules = [conditions for _, conditions in self.combinations]
+        rules += [group["conditions"] for group in self.groups.values()]
+        for conditions in rules:
+            missing = [level for level in SEVERITY_LEVELS if level not in conditions]
+            if missing:
+                raise ValueError(f"Ontology rule is missing severity levels: {missing}")
+
+    def _add_conditions(self, symptom: str, conditions: Dict[str, List[str]]) -> None:
+        per_severity = self.symptom_conditions.setdefault(symptom, {level: [] for level in SEVERITY_LEVELS})
+        for level in SEVERITY_LEVELS:
+            for condition in conditions.get(level, []):
+                if condition not in per_severity[level]:
+                    per_severity[level].append(condition)
+
+    def canonical(self, term: str) -> Optional[str]:
+        """Canonical symptom name for a symptom name or synonym, if known"""
+        return self.synonyms.get((term or "").strip().lower())
+
+    def snomed_code(self, symptom: str) -> str:
+        return self.symptom_codes.get(self.canonical(symptom) or "", "")
+
+    def symptom_for_code(self, code: str) -> Optional[str]:
+        return self.codes.get(code)
+
+    def conditions_for(self, symptom: str, severity: Optional[str] = None) -> Any:
+        """Conditions associated with a symptom, for one severity or all of them"""
+        per_severity = self.symptom_conditions.get(self.canonical(symptom) or symptom, {})
+        return per_severity.get(severity, []) if severity else per_severity
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "symptoms": len(self.symptoms),
+            "synonyms": len(self.synonyms),
+            "codes": len(self.codes),
+            "combinations": len(self.combinations),
+            "groups": len(self.groups)
+        }
+
+class SymptomOntology:
+    """
+    Loads the ontology data file and hot-reloads it when the file changes.
+    Readers call snapshot() and keep using what they got for the whole request;
+    a reload builds a complete new snapshot before swapping the reference, so a
+    reader never sees a half-loaded ontology. A file that fails to load is logged
+    and the previous snapshot stays active.
+    """
+    def __init__(self, path: Optional[str] = None, check_interval: Optional[float] = None):
+        self.path = Path(path or os.getenv("SYMPTOM_ONTOLOGY_PATH", str(DEFAULT_ONTOLOGY_PATH)))
+        self.check_interval = check_interval if check_interval is not None else float(
+            os.getenv("SYMPTOM_ONTOLOGY_RELOAD_INTERVAL", "5"))
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self.reloads = 0
+        self.reload_errors = 0
+        self._snapshot = self._load()
+
+    def _load(self) -> OntologySnapshot:
+        mtime = self.path.stat().st_mtime
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        snapshot = OntologySnapshot(data, source=str(self.path), mtime=mtime)
+        logger.info(f"Loaded symptom ontology v{snapshot.version} from {self.path}: "
+                    f"{len(snapshot.symptoms)} symptoms, {len(snapshot.synonyms)} synonyms")
+        return snapshot
+
+    def snapshot(self) -> OntologySnapshot:
+        """Current snapshot; checks the data file for changes at most every check_interval seconds"""
+        if self.check_interval >= 0 and time.monotonic() - self._last_check >= self.check_interval:
+            self._last_check = time.monotonic()
+            try:
+                changed = self.path.stat().st_mtime != self._snapshot.mtime
+            except OSError:
+                changed = False
+            if changed:
+                self.reload()
+        return self._snapshot
+
+    def reload(self) -> bool:
+        """Reloads the data file now; returns False (keeping the old snapshot) if it is invalid"""
+        with self._lock:
+            try:
+                snapshot = self._load()
+            except Exception as e:
+                self.reload_errors += 1
+                logger.error(f"Symptom ontology reload failed, keeping v{self._snapshot.version}: {str(e)}")
+                return False
+            self._snapshot = snapshot
+            self.reloads += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._snapshot.stats(), "reloads": self.reloads, "reload_errors": self.reload_errors}
+
+# Shared instance used by the agents
+symptom_ontology = SymptomOntology()
@@ -0,0 +1,65 @@
+import os
+from typing import Dict, Any, Iterable, Optional
+from urllib.parse import urlsplit
+import logging
+
+import httpx
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class AgentClientPool:
+    """
+    Holds one long-lived keep-alive httpx.AsyncClient per downstream service.
+    Clients are opened at application startup and closed at shutdown so every
+    request to an agent reuses pooled connections instead of a fresh socket.
+    """
+    def __init__(self,
+                 timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None):
+        self.timeout = timeout or float(os.getenv("AGENT_HTTP_TIMEOUT", "120"))
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=max_keepalive_connections or int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=30.0
+        )
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    @staticmethod
+    def _service_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _create_client(self, service: str) -> httpx.AsyncClient:
+        logger.info(f"Opening HTTP client pool for {service}")
+        return httpx.AsyncClient(
+            base_url=service,
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+            limits=self.limits
+        )
+
+    async def start(self, urls: Iterable[str]) -> None:
+        """Opens a client for every service the given URLs point at"""
+        for url in urls:
+            service = self._service_key(url)
+            if service not in self._clients:
+                self._clients[service] = self._create_client(service)
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Returns the pooled client for the service hosting url, opening one if needed"""
+        service = self._service_key(url)
+        client = self._clients.get(service)
+        if client is None or client.is_closed:
+            client = self._clients[service] = self._create_client(service)
+        return client
+
+    async def post(self, url: str, json: Dict[str, Any]) -> httpx.Response:
+        return await self.client_for(url).post(url, json=json)
+
+    async def aclose(self) -> None:
+        """Closes every client; called once at application shutdown"""
+        for service, client in list(self._clients.items()):
+            logger.info(f"Closing HTTP client pool for {service}")
+            await client.aclose()
+        self._clients.clear()
@@ -1,218 +1,473 @@
-
+import os
+import asyncio
+import heapq
 import requests
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import logging
 
+from orchestration.agent_clients import AgentClientPool
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Dispatch modes: "sequential" walks the sequenced task list one agent at a time,
+# "graph" runs the plan as a dependency graph built from the tasks' data flow.
+DISPATCH_MODES = ("sequential", "graph")
+
 class AgentDispatcher:
     """
     Dispatches tasks to sub-agents with semantic context awareness.
     Handles MCP/ACL messages and maintains semantic understanding throughout the flow.
     """
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None,
+                 client_pool: Optional[AgentClientPool] = None):
         # Agent endpoints
         # Use the same IP as the frontend configuration
         host = "10.251.177.156"  # Your machine's IP address
         self.disease_prediction_url = f"http://{host}:8002/predict_disease"
         self.symptom_analyzer_url = f"http://{host}:8003/analyze_symptoms"
         self.patient_journey_url = f"http://{host}:8005/patient_journey"
-        
+
+        self.mode = (mode or os.getenv("AGENT_DISPATCH_MODE", "sequential")).lower()
+        if self.mode not in DISPATCH_MODES:
+            logger.warning(f"Unknown dispatch mode '{self.mode}', falling back to sequential")
+            self.mode = "sequential"
+        self.max_workers = max_workers
+        # Pooled async clients used by dispatch_async
+        self.client_pool = client_pool or AgentClientPool()
+
+        # Request builders and response handlers per agent
+        self._handlers = {
+            'patient_journey': (self._build_patient_journey_request, self._handle_patient_journey_response),
+            'symptom_analyzer': (self._build_symptom_analyzer_request, self._handle_symptom_analyzer_response),
+            'disease_prediction': (self._build_disease_prediction_request, self._handle_disease_prediction_response),
+        }
+
+    def service_urls(self) -> List[str]:
+        """Endpoints of every sub-agent this dispatcher talks to"""
+        return [self.disease_prediction_url, self.symptom_analyzer_url, self.patient_journey_url]
+
     def enrich_request_with_semantics(self, params: Dict[str, Any], task: Dict[str, Any]) -> Dict[str, Any]:
         """Enriches the request parameters with semantic understanding"""
         enriched_params = params.copy()
-        
+
         # Add semantic context if available
         if "semantic_understanding" in task.get("params", {}):
             enriched_params["semantic_context"] = task["params"]["semantic_understanding"]
-            
+
         # Add task priority if available
         if "priority" in task:
             enriched_params["priority"] = task["priority"]
-            
+
         return enriched_params
 
-    def dispatch(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _build_patient_journey_request(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                                       semantic_context: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        agent = task.get('agent')
+        action = task.get('action')
+        params = task.get('params', {})
+
+        if action in ['get_journey', 'update_journey']:
+            # First, preserve patient_id from params
+            patient_id = params.get('patient_id', 'pat1')
+
+            # Enrich request with semantic context
+            enriched_params = self.enrich_request_with_semantics(params, task)
+
+            # Ensure patient_id is always set
+            enriched_params['patient_id'] = patient_id
+
+            # Add default context
+            enriched_params['context'] = {
+                'hospital': 'City General Hospital',
+                'primary_doctor': 'Dr. Jane Smith'
+            }
+
+            logger.info(f"Dispatching to patient_journey with params: {enriched_params}")
+            return self.patient_journey_url, enriched_params, None
+
+        if action == 'track_journey':
+            # Format request for patient journey agent
+            journey_request = {
+                'prompt': params.get('prompt', ''),
+                'patient_id': params.get('patient_id', ''),
+                'symptoms': params.get('symptoms', [])  # Default to empty list if no symptoms
+            }
+            return self.patient_journey_url, journey_request, None
+
+        return None, None, {
+            'agent': agent,
+            'error': f'Unknown action for patient_journey: {action}'
+        }
+
+    def _handle_patient_journey_response(self, task: Dict[str, Any], request_params: Dict[str, Any], response,
+                                         intermediate_results: Dict[str, Any], semantic_context: Dict[str, Any]) -> Dict[str, Any]:
+        agent = task.get('agent')
+
+        if task.get('action') == 'track_journey':
+            response.raise_for_status()
+            result = response.json()
+            return {
+                'agent': agent,
+                'result': result.get('result'),
+                'error': result.get('error')
+            }
+
+        if response.status_code == 200:
+            response_data = response.json()
+            # Extract the actual result from the response
+            # The agent returns {"result": {...}, "error": null}
+            actual_result = response_data.get('result', {})
+
+            # If there's an error, wrap it in result so frontend can display it
+            if response_data.get('error'):
+                actual_result = {'error': response_data.get('error')}
+
+            # Store journey info in semantic context for other agents
+            semantic_context['patient_journey'] = actual_result
+            return {
+                'agent': agent,
+                'result': actual_result,
+                'error': response_data.get('error')
+            }
+
+        logger.error(f"Patient Journey agent error: {response.text}")
+        return {
+            'agent': agent,
+            'error': f"Patient Journey agent error: {response.text}"
+        }
+
+    def _build_symptom_analyzer_request(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                                        semantic_context: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        agent = task.get('agent')
+        action = task.get('action')
+        params = task.get('params', {})
+
+        if action != 'analyze_symptoms':
+            return None, None, {
+                'agent': agent,
+                'error': f'Unknown action for symptom_analyzer: {action}'
+            }
+
+        # Enrich request with semantic context
+        enriched_params = self.enrich_request_with_semantics(
+            {'symptoms_text': params.get('symptoms_text', '')},
+            task
+        )
+
+        logger.info(f"Dispatching to symptom analyzer with semantic context")
+        logger.debug(f"Enriched params: {enriched_params}")
+        return self.symptom_analyzer_url, enriched_params, None
+
+    def _handle_symptom_analyzer_response(self, task: Dict[str, Any], request_params: Dict[str, Any], response,
+                                          intermediate_results: Dict[str, Any], semantic_context: Dict[str, Any]) -> Dict[str, Any]:
+        response.raise_for_status()
+        result = response.json()
+
+        # Store the identified symptoms and semantic context
+        result_data = result.get('result') or {}
+        if result_data.get('identified_symptoms'):
+            intermediate_results['structured_symptoms'] = result_data['identified_symptoms']
+            intermediate_results['severity_level'] = result_data.get('severity_level', 'medium')
+            # Store patient ID if available (either from result or top-level response)
+            intermediate_results['patient_id'] = result_data.get('patient_id') or result.get('patient_id')
+            # Preserve semantic understanding for next agent
+            semantic_context['symptom_analysis'] = result_data.get('semantic_analysis', {})
+
+        return {
+            'agent': task.get('agent'),
+            'result': result.get('result'),
+            'error': result.get('error'),
+            'semantic_context': semantic_context.get('symptom_analysis', {}),
+            'patient_id': intermediate_results.get('patient_id')  # Include patient ID
+        }
+
+    def _build_disease_prediction_request(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                                          semantic_context: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        agent = task.get('agent')
+        action = task.get('action')
+        params = task.get('params', {})
+
+        if action != 'predict_disease':
+            return None, None, {
+                'agent': agent,
+                'error': f'Unknown action for disease_prediction: {action}'
+            }
+
+        request_params = {}
+
+        # Get patient ID from intermediate results or params
+        if 'patient_id' in intermediate_results:
+            request_params['patient_id'] = intermediate_results['patient_id']
+        elif 'patient_id' in params:
+            request_params['patient_id'] = params['patient_id']
+
+        # Log patient ID handling
+        logger.info(f"Using patient ID for disease prediction: {request_params.get('patient_id')}")
+
+        # If we have symptoms from analyzer or params, use them
+        if 'structured_symptoms' in intermediate_results:
+            request_params['symptoms'] = intermediate_results['structured_symptoms']
+            request_params['severity_level'] = intermediate_results.get('severity_level', 'medium')
+        elif 'symptoms' in params:
+            request_params['symptoms'] = params['symptoms']
+
+        # Add any semantic context
+        if semantic_context.get('symptom_analysis'):
+            request_params['semantic_context'] = semantic_context['symptom_analysis']
+
+        logger.info(f"Dispatching to disease prediction with params: {request_params}")
+        return self.disease_prediction_url, request_params, None
+
+    def _handle_disease_prediction_response(self, task: Dict[str, Any], request_params: Dict[str, Any], response,
+                                            intermediate_results: Dict[str, Any], semantic_context: Dict[str, Any]) -> Dict[str, Any]:
+        response.raise_for_status()
+        result = response.json()
+
+        # Include patient_id in the result structure
+        prediction_result = result.get('result') or {}
+        if request_params.get('patient_id'):
+            prediction_result['patient_id'] = request_params['patient_id']
+
+        return {
+            'agent': task.get('agent'),
+            'result': prediction_result,
+            'error': result.get('error'),
+            'patient_id': request_params.get('patient_id')  # Add at top level too
+        }
+
+    def _prepare_task(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                      semantic_context: Dict[str, Any]):
+        """
+        Resolves the handler for a task and builds its request.
+        Returns (handle_response, url, payload, immediate_result).
+        """
+        agent = task.get('agent')
+        handlers = self._handlers.get((agent or '').lower())
+        if not handlers:
+            return None, None, None, {
+                'agent': agent,
+                'result': None,
+                'error': f'No handler implemented for agent: {agent}'
+            }
+        build_request, handle_response = handlers
+        url, payload, immediate_result = build_request(task, intermediate_results, semantic_context)
+        return handle_response, url, payload, immediate_result
+
+    def _run_task(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                  semantic_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs a single task against its agent and returns the result entry"""
+        agent = task.get('agent')
+        try:
+            handle_response, url, payload, immediate_result = self._prepare_task(
+                task, intermediate_results, semantic_context
+            )
+            if immediate_result is not None:
+                return immediate_result
+            response = requests.post(url, json=payload)
+            return handle_response(task, payload, response, intermediate_results, semantic_context)
+        except Exception as e:
+            return {
+                'agent': agent,
+                'result': None,
+                'error': f'Error dispatching to {agent}: {str(e)}'
+            }
+
+    async def _run_task_async(self, task: Dict[str, Any], intermediate_results: Dict[str, Any],
+                              semantic_context: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of _run_task using the pooled httpx clients"""
+        agent = task.get('agent')
+        try:
+            handle_response, url, payload, immediate_result = self._prepare_task(
+                task, intermediate_results, semantic_context
+            )
+            if immediate_result is not None:
+                return immediate_result
+            response = await self.client_pool.post(url, json=payload)
+            return handle_response(task, payload, response, intermediate_results, semantic_context)
+        except Exception as e:
+            return {
+                'agent': agent,
+                'result': None,
+                'error': f'Error dispatching to {agent}: {str(e)}'
+            }
+
+    def build_dependency_graph(self, tasks: List[Dict[str, Any]]) -> Tuple[List[List[int]], List[int], List[int]]:
+        """
+        Builds the task dependency graph from the data flow recorded on each task.
+        A task depends on every other task that outputs one of its inputs.
+        Returns (dependents, pending_count, topological_order) indexed by task position;
+        raises ValueError if the data flow is cyclic.
+        """
+        providers = {}
+        for index, task in enumerate(tasks):
+            for output in task.get('outputs', []):
+                providers.setdefault(output, []).append(index)
+
+        dependents = [[] for _ in tasks]
+        pending = [0] * len(tasks)
+        for index, task in enumerate(tasks):
+            upstream = set()
+            for input_data in task.get('inputs', []):
+                upstream.update(p for p in providers.get(input_data, []) if p != index)
+            for provider in upstream:
+                dependents[provider].append(index)
+            pending[index] = len(upstream)
+
+        # Kahn's algorithm to reject cycles before anything is sent; ties keep task order
+        remaining = list(pending)
+        ready = [i for i, count in enumerate(remaining) if count == 0]
+        order = []
+        while ready:
+            current = heapq.heappop(ready)
+            order.append(current)
+            for dependent in dependents[current]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        if len(order) != len(tasks):
+            cyclic = [tasks[i].get('agent') for i, count in enumerate(remaining) if count > 0]
+            raise ValueError(f"Circular dependency detected between tasks: {', '.join(map(str, cyclic))}")
+
+        return dependents, pending, order
+
+    def _dependency_graph_or_none(self, tasks: List[Dict[str, Any]]) -> Optional[Tuple[List[List[int]], List[int], List[int]]]:
+        """Dependency graph for graph mode, or None (logged) when the data flow is cyclic"""
+        try:
+            return self.build_dependency_graph(tasks)
+        except ValueError as e:
+            logger.warning(f"{e}; dispatching the tasks sequentially instead")
+            return None
+
+    @staticmethod
+    def _upstream_context(index: int, upstream: List[List[int]], rank: Dict[int, int],
+                          contexts: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Gives a task its own intermediate results and semantic context, merged from the
+        tasks it depends on in topological order, so concurrent tasks never share state.
+        """
+        intermediate_results, semantic_context = {}, {}
+        for provider in sorted(upstream[index], key=rank.__getitem__):
+            provider_results, provider_context = contexts[provider]
+            intermediate_results.update(provider_results)
+            semantic_context.update(provider_context)
+        contexts[index] = (intermediate_results, semantic_context)
+        return intermediate_results, semantic_context
+
+    @staticmethod
+    def _upstream_of(dependents: List[List[int]]) -> List[List[int]]:
+        upstream = [[] for _ in dependents]
+        for provider, downstream in enumerate(dependents):
+            for dependent in downstream:
+                upstream[dependent].append(provider)
+        return upstream
+
+    def dispatch(self, tasks: List[Dict[str, Any]], mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Dispatches the sequenced tasks and returns one result per task, in task order.
+        In "graph" mode independent tasks run concurrently and each task starts as soon
+        as the tasks producing its inputs have finished; a cyclic data flow falls back
+        to sequential dispatch.
+        """
+        mode = (mode or self.mode).lower()
+        graph = self._dependency_graph_or_none(tasks) if mode == "graph" and len(tasks) > 1 else None
+        if graph:
+            return self._dispatch_graph(tasks, graph)
+
         results = []
         intermediate_results = {}  # Store results for data flow between agents
         semantic_context = {}  # Store semantic context for cross-agent sharing
-        
+
         for task in tasks:
-            agent = task.get('agent')
-            action = task.get('action')
-            params = task.get('params', {})
-            
-            try:
-                if agent.lower() == 'patient_journey':
-                    if action in ['get_journey', 'update_journey']:
-                        # First, preserve patient_id from params
-                        patient_id = params.get('patient_id', 'pat1')
-                        
-                        # Enrich request with semantic context
-                        enriched_params = self.enrich_request_with_semantics(params, task)
-                        
-                        # Ensure patient_id is always set
-                        enriched_params['patient_id'] = patient_id
-                        
-                        # Add default context
-                        enriched_params['context'] = {
-                            'hospital': 'City General Hospital',
-                            'primary_doctor': 'Dr. Jane Smith'
-                        }
-                        
-                        logger.info(f"Dispatching to patient_journey with params: {enriched_params}")
-                        response = requests.post(self.patient_journey_url, json=enriched_params)
-                        if response.status_code == 200:
-                            response_data = response.json()
-                            # Extract the actual result from the response
-                            # The agent returns {"result": {...}, "error": null}
-                            actual_result = response_data.get('result', {})
-                            
-                            # If there's an error, wrap it in result so frontend can display it
-                            if response_data.get('error'):
-                                actual_result = {'error': response_data.get('error')}
-                            
-                            results.append({
-                                'agent': agent,
-                                'result': actual_result,
-                                'error': response_data.get('error')
-                            })
-                            # Store journey info in semantic context for other agents
-                            semantic_context['patient_journey'] = actual_result
-                        else:
-                            logger.error(f"Patient Journey agent error: {response.text}")
-                            results.append({
-                                'agent': agent,
-                                'error': f"Patient Journey agent error: {response.text}"
-                            })
-
-                elif agent.lower() == 'symptom_analyzer':
-                    if action == 'analyze_symptoms':
-                        # Enrich request with semantic context
-                        enriched_params = self.enrich_request_with_semantics(
-                            {'symptoms_text': params.get('symptoms_text', '')},
-                            task
-                        )
-                        
-                        logger.info(f"Dispatching to symptom analyzer with semantic context")
-                        logger.debug(f"Enriched params: {enriched_params}")
-                        
-                        response = requests.post(
-                            self.symptom_analyzer_url,
-                            json=enriched_params
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-                        
-                        # Store the identified symptoms and semantic context
-                        result_data = result.get('result', {})
-                        if result_data.get('identified_symptoms'):
-                            intermediate_results['structured_symptoms'] = result_data['identified_symptoms']
-                            intermediate_results['severity_level'] = result_data.get('severity_level', 'medium')
-                            # Store patient ID if available (either from result or top-level response)
-                            intermediate_results['patient_id'] = result_data.get('patient_id') or result.get('patient_id')
-                            # Preserve semantic understanding for next agent
-                            semantic_context['symptom_analysis'] = result_data.get('semantic_analysis', {})
-                        
-                        results.append({
-                            'agent': agent,
-                            'result': result.get('result'),
-                            'error': result.get('error'),
-                            'semantic_context': semantic_context.get('symptom_analysis', {}),
-                            'patient_id': intermediate_results.get('patient_id')  # Include patient ID
-                        })
-                    else:
-                        results.append({
-                            'agent': agent,
-                            'error': f'Unknown action for symptom_analyzer: {action}'
-                        })
-                
-                elif agent.lower() == 'disease_prediction':
-                    if action == 'predict_disease':
-                        request_params = {}
-                        
-                        # Get patient ID from intermediate results or params
-                        if 'patient_id' in intermediate_results:
-                            request_params['patient_id'] = intermediate_results['patient_id']
-                        elif 'patient_id' in params:
-                            request_params['patient_id'] = params['patient_id']
-                            
-                        # Log patient ID handling
-                        logger.info(f"Using patient ID for disease prediction: {request_params.get('patient_id')}")
-                        
-                        # If we have symptoms from analyzer or params, use them
-                        if 'structured_symptoms' in intermediate_results:
-                            request_params['symptoms'] = intermediate_results['structured_symptoms']
-                            request_params['severity_level'] = intermediate_results.get('severity_level', 'medium')
-                        elif 'symptoms' in params:
-                            request_params['symptoms'] = params['symptoms']
-                        
-                        # Add any semantic context
-                        if semantic_context.get('symptom_analysis'):
-                            request_params['semantic_context'] = semantic_context['symptom_analysis']
-                            
-                        logger.info(f"Dispatching to disease prediction with params: {request_params}")
-                        
-                        response = requests.post(
-                            self.disease_prediction_url,
-                            json=request_params
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-
-                        # Include patient_id in the result structure
-                        prediction_result = result.get('result', {})
-                        if request_params.get('patient_id'):
-                            prediction_result['patient_id'] = request_params['patient_id']
-                            
-                        results.append({
-                            'agent': agent,
-                            'result': prediction_result,
-                            'error': result.get('error'),
-                            'patient_id': request_params.get('patient_id')  # Add at top level too
-                        })
-                    else:
-                        results.append({
-                            'agent': agent,
-                            'error': f'Unknown action for disease_prediction: {action}'
-                        })
-                
-                elif agent.lower() == 'patient_journey':
-                    if action == 'track_journey':
-                        # Format request for patient journey agent
-                        journey_request = {
-                            'prompt': params.get('prompt', ''),
-                            'patient_id': params.get('patient_id', ''),
-                            'symptoms': params.get('symptoms', [])  # Default to empty list if no symptoms
-                        }
-                        response = requests.post(
-                            self.patient_journey_url,
-                            json=journey_request
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-                        results.append({
-                            'agent': agent,
-                            'result': result.get('result'),
-                            'error': result.get('error')
-                        })
-                    else:
-                        results.append({
-                            'agent': agent,
-                            'error': f'Unknown action for patient_journey: {action}'
-                        })
-                
-                else:
-                    results.append({
-                        'agent': agent,
-                        'result': None,
-                        'error': f'No handler implemented for agent: {agent}'
-                    })
-            except Exception as e:
-                results.append({
-                    'agent': agent,
-                    'result': None,
-                    'error': f'Error dispatching to {agent}: {str(e)}'
-                })
+            results.append(self._run_task(task, intermediate_results, semantic_context))
+        return results
+
+    def _dispatch_graph(self, tasks: List[Dict[str, Any]],
+                        graph: Tuple[List[List[int]], List[int], List[int]]) -> List[Dict[str, Any]]:
+        dependents, pending, order = graph
+        upstream = self._upstream_of(dependents)
+        rank = {index: position for position, index in enumerate(order)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        # Per-task (intermediate_results, semantic_context), read by dependents once the task is done
+        contexts: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]] = [None] * len(tasks)
+
+        def submit(executor, index):
+            return executor.submit(self._run_task, tasks[index],
+                                   *self._upstream_context(index, upstream, rank, contexts))
+
+        logger.info(f"Dispatching {len(tasks)} tasks as a dependency graph")
+        max_workers = self.max_workers or len(tasks)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-dispatch") as executor:
+            in_flight = {submit(executor, i): i for i, count in enumerate(pending) if count == 0}
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    results[index] = future.result()
+                    logger.debug(f"Task {tasks[index].get('agent')} finished")
+                    for dependent in dependents[index]:
+                        pending[dependent] -= 1
+                        if pending[dependent] == 0:
+                            in_flight[submit(executor, dependent)] = dependent
+
+        return results
+
+    async def dispatch_async(self, tasks: List[Dict[str, Any]], mode: Optional[str] = None,
+                             on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Non-blocking version of dispatch for use inside async endpoints.
+        Agent calls go through the pooled httpx clients so the event loop stays free.
+        on_result(task, result) is called as soon as each task finishes.
+        """
+        mode = (mode or self.mode).lower()
+        graph = self._dependency_graph_or_none(tasks) if mode == "graph" and len(tasks) > 1 else None
+        if graph:
+            return await self._dispatch_graph_async(tasks, graph, on_result)
+
+        results = []
+        intermediate_results = {}
+        semantic_context = {}
+
+        for task in tasks:
+            result = await self._run_task_async(task, intermediate_results, semantic_context)
+            results.append(result)
+            if on_result:
+                on_result(task, result)
+        return results
+
+    async def _dispatch_graph_async(self, tasks: List[Dict[str, Any]],
+                                    graph: Tuple[List[List[int]], List[int], List[int]],
+                                    on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        dependents, pending, order = graph
+        upstream = self._upstream_of(dependents)
+        rank = {index: position for position, index in enumerate(order)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+        contexts: List[Optional[Tuple[Dict[str, Any], Dict[str, Any]]]] = [None] * len(tasks)
+
+        def start(index):
+            return asyncio.create_task(self._run_task_async(
+                tasks[index], *self._upstream_context(index, upstream, rank, contexts)
+            ))
+
+        logger.info(f"Dispatching {len(tasks)} tasks as a dependency graph (async)")
+        in_flight = {start(i): i for i, count in enumerate(pending) if count == 0}
+        try:
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    results[index] = future.result()
+                    logger.debug(f"Task {tasks[index].get('agent')} finished")
+                    if on_result:
+                        on_result(tasks[index], results[index])
+                    for dependent in dependents[index]:
+                        pending[dependent] -= 1
+                        if pending[dependent] == 0:
+                            in_flight[start(dependent)] = dependent
+        finally:
+            # Do not leave agent calls running if the caller was cancelled
+            for future in in_flight:
+                future.cancel()
+
         return results
@@ -0,0 +1,143 @@
+import os
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Hashable
+import logging
+
+from orchestration.session_store import SessionStore, MemorySessionStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+class JobQueueFullError(Exception):
+    """Raised when no more background jobs can be accepted"""
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class JobManager:
+    """
+    Runs orchestration workflows as background jobs on the event loop.
+    At most max_running jobs execute at once; up to max_queued more wait for a slot.
+    Progress (MCP/ACL, per-agent results) is recorded on the job as it happens so
+    status polls can return partial results before the workflow finishes.
+    Job records live in the session store, so any worker sharing it can answer a poll.
+    The worker running a job also holds its record until the job finishes and writes
+    it back on every update, so store eviction cannot drop a job's progress.
+    """
+    def __init__(self, max_running: Optional[int] = None, max_queued: Optional[int] = None,
+                 store: Optional[SessionStore] = None):
+        self.max_running = max_running or int(os.getenv("ORCHESTRATOR_MAX_RUNNING_JOBS", "16"))
+        self.max_queued = max_queued or int(os.getenv("ORCHESTRATOR_MAX_QUEUED_JOBS", "256"))
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = set()  # Keep references so running jobs are not garbage collected
+        self._active_keys: Dict[Hashable, str] = {}  # coalescing key -> job_id of the running job
+        self._active_jobs: Dict[str, Dict[str, Any]] = {}  # job_id -> record of jobs not finished yet
+        self.coalesced = 0
+        self.store = store or MemorySessionStore()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, session_id: str,
+               runner: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+               key: Optional[Hashable] = None) -> Dict[str, Any]:
+        """
+        Registers a job and schedules runner(job_id) in the background.
+        Returns the job record immediately. If key matches a job that is still
+        queued or running, that job is returned instead of starting a duplicate.
+        """
+        if key is not None and key in self._active_keys:
+            existing = self.get(self._active_keys[key])
+            if existing:
+                self.coalesced += 1
+                logger.info(f"Coalescing duplicate submission onto job {existing['job_id']}")
+                return existing
+
+        if self.active_count >= self.max_running + self.max_queued:
+            raise JobQueueFullError("Too many orchestration jobs in progress, try again shortly")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "status": JOB_QUEUED,
+            "mcp_acl": None,
+            "results": [],
+            "error": None,
+            "created_at": _now(),
+            "updated_at": _now()
+        }
+        self._active_jobs[job_id] = job
+        self.store.set(f"job:{job_id}", job)
+        self.store.set(f"session_job:{session_id}", job_id)
+
+        task = asyncio.create_task(self._run(job_id, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _, j=job_id: self._active_jobs.pop(j, None))
+        if key is not None:
+            self._active_keys[key] = job_id
+            task.add_done_callback(lambda _, k=key: self._active_keys.pop(k, None))
+        logger.info(f"Queued orchestration job {job_id} for session {session_id}")
+        return job
+
+    async def _run(self, job_id: str, runner: Callable[[str], Awaitable[List[Dict[str, Any]]]]) -> None:
+        async with self._slots:
+            self._update(job_id, status=JOB_RUNNING)
+            try:
+                results = await runner(job_id)
+                self._update(job_id, status=JOB_COMPLETED, results=results)
+                logger.info(f"Orchestration job {job_id} completed")
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                logger.error(f"Orchestration job {job_id} failed: {detail}")
+                self._update(job_id, status=JOB_FAILED, error=detail)
+
+    def _update(self, job_id: str, **fields) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        job = {**job, **fields, "updated_at": _now()}
+        if job["status"] in (JOB_COMPLETED, JOB_FAILED):
+            self._active_jobs.pop(job_id, None)
+        elif job_id in self._active_jobs:
+            self._active_jobs[job_id] = job
+        # Re-inserts the record if the store evicted it in the meantime
+        self.store.set(f"job:{job_id}", job)
+
+    def record_mcp_acl(self, job_id: str, mcp_acl: Dict[str, Any]) -> None:
+        self._update(job_id, mcp_acl=mcp_acl)
+
+    def record_result(self, job_id: str, result: Dict[str, Any]) -> None:
+        """Appends a finished agent result to the job's partial results"""
+        job = self.get(job_id)
+        if job is None:
+            return
+        self._update(job_id, results=job["results"] + [result])
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._active_jobs.get(job_id) or self.store.get(f"job:{job_id}")
+
+    def latest_for_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        job_id = self.store.get(f"session_job:{session_id}")
+        return self.get(job_id) if job_id else None
+
+    def release_session(self, session_id: str) -> None:
+        """
+        Called when newer session results were stored outside a job: a finished job
+        must no longer answer the session's status checks. A job still queued or
+        running keeps them, since its results will be the newest.
+        """
+        job = self.latest_for_session(session_id)
+        if job and job["status"] in (JOB_COMPLETED, JOB_FAILED):
+            self.store.delete(f"session_job:{session_id}")
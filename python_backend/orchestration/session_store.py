@@ -0,0 +1,166 @@
+import os
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+import logging
+
+from common.ttl_cache import TTLCache
+from common.sqlite_store import SQLiteKVStore
+
+# Optional Redis support
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class SessionStore(ABC):
+    """
+    Stores per-session orchestration state (agent results, job records) with
+    size limits and per-entry TTL. Backends share this interface so several
+    uvicorn workers can point at the same SQLite file or Redis instance.
+    """
+    backend = "base"
+
+    def __init__(self, default_ttl: Optional[float] = None):
+        self.default_ttl = default_ttl
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    def close(self) -> None:
+        pass
+
+class MemorySessionStore(SessionStore):
+    """In-process backend: LRU + TTL with memory accounting, private to one worker"""
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 10000, default_ttl: Optional[float] = 3600,
+                 max_bytes: Optional[int] = 64 * 1024 * 1024):
+        super().__init__(default_ttl)
+        self.cache = TTLCache(max_entries=max_entries, default_ttl=default_ttl, max_bytes=max_bytes)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.cache.set(key, value, ttl)
+
+    def delete(self, key: str) -> bool:
+        return self.cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, **self.cache.stats()}
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite backend shared by every worker on the same host"""
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 10000, default_ttl: Optional[float] = 3600):
+        super().__init__(default_ttl)
+        self.store = SQLiteKVStore(path, table="session_store", max_entries=max_entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.store.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.store.set(key, value, self.default_ttl if ttl is None else ttl)
+
+    def delete(self, key: str) -> bool:
+        return self.store.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        self.store.purge_expired()
+        return {"backend": self.backend, **self.store.stats()}
+
+    def close(self) -> None:
+        self.store.close()
+
+class RedisSessionStore(SessionStore):
+    """
+    Redis (or Redis-compatible) backend shared across hosts.
+    Size limits and LRU eviction are delegated to the server's maxmemory policy.
+    """
+    backend = "redis"
+
+    def __init__(self, url: str, default_ttl: Optional[float] = 3600, prefix: str = "orchestrator:"):
+        if redis is None:
+            raise ImportError("The redis package is required for the redis session store backend")
+        super().__init__(default_ttl)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        # Millisecond expiry: a sub-second TTL must not round down to the invalid ex=0
+        self.client.set(self.prefix + key, json.dumps(value, default=str),
+                        px=max(1, int(ttl * 1000)) if ttl is not None else None)
+
+    def delete(self, key: str) -> bool:
+        return bool(self.client.delete(self.prefix + key))
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.client.info("memory")
+        lookups = self.hits + self.misses
+        return {
+            # No entry count: DBSIZE would count every key in the database, not just this prefix
+            "backend": self.backend,
+            "bytes": memory.get("used_memory"),
+            "max_bytes": memory.get("maxmemory") or None,
+            "eviction_policy": memory.get("maxmemory_policy"),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        self.client.close()
+
+def create_session_store() -> SessionStore:
+    """
+    Builds the session store configured through the environment:
+    SESSION_STORE_BACKEND (memory | sqlite | redis), SESSION_STORE_TTL,
+    SESSION_STORE_MAX_ENTRIES, SESSION_STORE_MAX_BYTES, SESSION_STORE_PATH, SESSION_STORE_URL.
+    """
+    backend = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SESSION_STORE_TTL", "3600"))
+    max_entries = int(os.getenv("SESSION_STORE_MAX_ENTRIES", "10000"))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_STORE_PATH", "session_store.db")
+        logger.info(f"Using SQLite session store at {path}")
+        return SQLiteSessionStore(path, max_entries=max_entries, default_ttl=ttl)
+    if backend == "redis":
+        url = os.getenv("SESSION_STORE_URL", "redis://localhost:6379/0")
+        logger.info(f"Using Redis session store at {url}")
+        return RedisSessionStore(url, default_ttl=ttl)
+    if backend != "memory":
+        logger.warning(f"Unknown session store backend '{backend}', using memory")
+
+    max_bytes = int(os.getenv("SESSION_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+    return MemorySessionStore(max_entries=max_entries, default_ttl=ttl, max_bytes=max_bytes)
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Receives the progress events of a shared call: listener(event, *args)
+Listener = Callable[..., None]
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt used for coalescing"""
+    return " ".join((prompt or "").lower().split())
+
+class _Flight:
+    """One shared call with the progress it reported and the callers waiting on it"""
+    __slots__ = ("task", "events", "listeners", "waiters")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.events: List[Tuple[Any, ...]] = []
+        self.listeners: List[Listener] = []
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while a call for a key is running,
+    later callers with the same key await its result instead of starting a new one.
+    The shared call gets an emit(event, *args) function; every event goes to the
+    listener of each caller waiting on it, and callers that join late first get the
+    events emitted before they arrived. The call runs as its own task, so a caller
+    that goes away (e.g. a disconnected client) does not cancel the work other
+    callers are waiting on; it is cancelled once no caller is left.
+    """
+    def __init__(self):
+        self._in_flight: Dict[Hashable, _Flight] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[Listener], Awaitable[Any]],
+                 listener: Optional[Listener] = None) -> Any:
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            logger.info(f"Coalescing duplicate request onto in-flight call for {key}")
+            if listener:
+                for event in flight.events:
+                    self._notify(listener, event)
+        else:
+            self.executed += 1
+            flight = _Flight()
+            self._in_flight[key] = flight
+            flight.task = asyncio.ensure_future(fn(lambda *event: self._emit(flight, event)))
+            flight.task.add_done_callback(lambda t, k=key, f=flight: self._finish(k, f))
+
+        if listener:
+            flight.listeners.append(listener)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            # The last caller left: nobody needs the result any more
+            if flight.waiters == 1 and not flight.task.done():
+                logger.info(f"Cancelling in-flight call for {key}: no callers left")
+                # Forget the flight first so a new caller starts afresh instead of
+                # joining a task that is already being cancelled
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+            if listener:
+                flight.listeners.remove(listener)
+
+    def _emit(self, flight: _Flight, event: Tuple[Any, ...]) -> None:
+        flight.events.append(event)
+        for listener in list(flight.listeners):
+            self._notify(listener, event)
+
+    @staticmethod
+    def _notify(listener: Listener, event: Tuple[Any, ...]) -> None:
+        # One caller's failing listener must not fail the call shared with the others
+        try:
+            listener(*event)
+        except Exception as e:
+            logger.error(f"Single-flight listener failed on {event[0]}: {e}")
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        # Retrieve the exception so it is not reported as unhandled when every caller left
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
@@ -1,16 +1,23 @@
 import os
-import requests
+import json
+import asyncio
+import httpx
 from fastapi import FastAPI, HTTPException, Request
-from pydantic import BaseModel
-from typing import Dict, Any
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, Optional, Callable
 import traceback
 import logging
 
 from orchestration.input_handler import InputHandler
 from orchestration.task_planner import TaskPlanner
 from orchestration.agent_dispatcher import AgentDispatcher
+from orchestration.agent_clients import AgentClientPool
+from orchestration.job_manager import JobManager, JobQueueFullError, JOB_COMPLETED, JOB_FAILED
+from orchestration.session_store import create_session_store
+from orchestration.single_flight import SingleFlight, normalize_prompt
 from services.enrichment_service import EnrichmentService
 from services.llm_service import LLMService
+from services.prompt_pipeline import PromptPipeline, PromptProcessingError
 
 # Initialize logger
 logging.basicConfig(
@@ -64,7 +71,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
 app.add_middleware(LoggingMiddleware)
 
 # Add specific headers to health endpoint
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 @app.options("/health")
 async def health_options():
     headers = {
@@ -79,11 +86,40 @@ async def health_options():
     )
 
 # Initialize services and handlers
+PROMPT_PROCESSOR_URL = os.getenv("PROMPT_PROCESSOR_URL", "http://127.0.0.1:8000/process_prompt")
+# "http" calls the prompt processor service; "inprocess" runs the same pipeline here
+PROMPT_PROCESSOR_MODE = os.getenv("PROMPT_PROCESSOR_MODE", "http").lower()
+
 enrichment_service = EnrichmentService()
 llm_service = LLMService()
+prompt_pipeline = PromptPipeline(enrichment_service, llm_service)
 input_handler = InputHandler()
 task_planner = TaskPlanner()
-agent_dispatcher = AgentDispatcher()
+# Keep-alive client pools shared by the prompt processor call and every agent call
+agent_clients = AgentClientPool()
+agent_dispatcher = AgentDispatcher(client_pool=agent_clients)
+# Bounded, TTL-evicting store for session results and job records
+session_store = create_session_store()
+# Bounded background executor for /orchestrate jobs
+job_manager = JobManager(store=session_store)
+# Duplicate prompts (double taps, retries) wait on the in-flight workflow
+single_flight = SingleFlight()
+# New /orchestrate requests return a job id at once and run in the background, unless
+# the request (background=false) or ORCHESTRATE_BACKGROUND=false asks to block
+ORCHESTRATE_BACKGROUND = os.getenv("ORCHESTRATE_BACKGROUND", "true").lower() == "true"
+
+@app.on_event("startup")
+async def open_client_pools():
+    urls = agent_dispatcher.service_urls()
+    if PROMPT_PROCESSOR_MODE != "inprocess":
+        urls.append(PROMPT_PROCESSOR_URL)
+    await agent_clients.start(urls)
+
+@app.on_event("shutdown")
+async def close_client_pools():
+    await agent_clients.aclose()
+    session_store.close()
+    llm_service.llm_cache.close()
 
 class MCPACLInput(BaseModel):
     mcp_acl: Dict[str, Any]
@@ -95,9 +131,154 @@ class ChatRequest(BaseModel):
     workflow: str
     get_status: bool = False
     is_retry: bool = False
+    background: Optional[bool] = None  # Defaults to ORCHESTRATE_BACKGROUND
+    job_id: Optional[str] = None  # Poll a specific background job
+
+# Placeholder plan returned while a workflow is still running
+PENDING_MCP_ACL = {
+    "agents": ["symptom_analyzer", "disease_prediction"],
+    "actions": [
+        {"agent": "symptom_analyzer", "action": "analyze_symptoms"},
+        {"agent": "disease_prediction", "action": "predict_disease"}
+    ]
+}
+
+async def fetch_mcp_acl(request: ChatRequest) -> Dict[str, Any]:
+    """Returns the MCP/ACL structure for the prompt, in-process or via the prompt processor"""
+    if PROMPT_PROCESSOR_MODE == "inprocess":
+        return await generate_mcp_acl_inprocess(request)
+    return await fetch_mcp_acl_http(request)
+
+async def generate_mcp_acl_inprocess(request: ChatRequest) -> Dict[str, Any]:
+    """Runs enrichment, MCP/ACL generation and validation without the HTTP hop"""
+    logger.info(f"🎯 [Orchestrate] Processing prompt in-process...")
+    try:
+        # LLM calls run in worker threads, independent ones concurrently
+        mcp_acl = await prompt_pipeline.process_async(
+            prompt=request.prompt,
+            user_id=request.user_id,
+            session_id=request.session_id,
+            workflow=request.workflow
+        )
+    except PromptProcessingError as e:
+        logger.error(f"🎯 [Orchestrate] Prompt processing failed: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=f"Prompt Processor Error: {e.detail}")
+    logger.info(f"🎯 [Orchestrate] ✅ Generated MCP/ACL in-process")
+    return mcp_acl
+
+async def fetch_mcp_acl_http(request: ChatRequest) -> Dict[str, Any]:
+    """Calls the prompt processor service and returns the MCP/ACL structure for the prompt"""
+    logger.info(f"🎯 [Orchestrate] Calling Prompt Processor (8000) to enrich...")
+    prompt_payload = {
+        "prompt": request.prompt,
+        "user_id": request.user_id,
+        "session_id": request.session_id,
+        "workflow": request.workflow
+    }
+
+    try:
+        prompt_response = await agent_clients.post(PROMPT_PROCESSOR_URL, json=prompt_payload)
+    except httpx.HTTPError as e:
+        logger.error(f"🎯 [Orchestrate] Error calling Prompt Processor: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=f"Error communicating with prompt processor: {str(e)}"
+        )
+
+    if prompt_response.status_code != 200:
+        logger.error(f"🎯 [Orchestrate] Prompt Processor returned {prompt_response.status_code}")
+        raise HTTPException(
+            status_code=prompt_response.status_code,
+            detail=f"Prompt Processor Error: {prompt_response.text}"
+        )
+
+    logger.info(f"🎯 [Orchestrate] ✅ Prompt Processor returned MCP/ACL successfully")
+    mcp_acl = prompt_response.json().get("mcp_acl")
+    if not mcp_acl:
+        logger.error(f"🎯 [Orchestrate] Prompt Processor response missing MCP/ACL")
+        raise HTTPException(
+            status_code=400,
+            detail="No MCP/ACL structure returned from prompt processor"
+        )
+    return mcp_acl
+
+def plan_tasks(mcp_acl: Dict[str, Any]) -> list:
+    """Validates the MCP/ACL structure and turns it into a sequenced task list"""
+    if not input_handler.validate(mcp_acl):
+        logger.error(f"🎯 [Orchestrate] Invalid MCP/ACL structure")
+        raise HTTPException(status_code=400, detail="Invalid MCP/ACL structure")
 
-# Store results in memory (replace with proper storage in production)
-session_results = {}
+    logger.info(f"🎯 [Orchestrate] Extracting plan from MCP/ACL...")
+    plan = input_handler.extract_plan(mcp_acl)
+    logger.info(f"🎯 [Orchestrate] Sequencing tasks...")
+    return task_planner.sequence_tasks(plan)
+
+async def run_workflow(request: ChatRequest,
+                       on_mcp_acl: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       on_result: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None) -> list:
+    """Runs prompt processing and agent dispatch for a chat request, reporting progress through the callbacks"""
+    mcp_acl = await fetch_mcp_acl(request)
+    if on_mcp_acl:
+        on_mcp_acl(mcp_acl)
+    sequenced_tasks = plan_tasks(mcp_acl)
+    logger.info(f"🎯 [Orchestrate] Dispatching tasks to agents...")
+    results = await agent_dispatcher.dispatch_async(sequenced_tasks, on_result=on_result)
+    logger.info(f"🎯 [Orchestrate] ✅ Agent dispatch complete! Got {len(results) if results else 0} results")
+
+    # Store results for this session; they supersede an earlier, finished background job
+    session_store.set(f"results:{request.session_id}", results)
+    job_manager.release_session(request.session_id)
+    return results
+
+def coalescing_key(request: ChatRequest) -> tuple:
+    """Requests sharing this key are served by a single workflow run"""
+    return (request.session_id, normalize_prompt(request.prompt), request.workflow)
+
+async def run_shared_workflow(request: ChatRequest,
+                              listener: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> list:
+    """
+    Runs the workflow, or joins an identical one already in flight. listener(event, data)
+    receives every "mcp_acl" and "agent_result" event of the shared run, including the
+    ones emitted before this caller joined.
+    """
+    return await single_flight.do(
+        coalescing_key(request),
+        lambda emit: run_workflow(
+            request,
+            on_mcp_acl=lambda mcp_acl: emit("mcp_acl", mcp_acl),
+            on_result=lambda task, result: emit("agent_result", result)
+        ),
+        listener
+    )
+
+def submit_workflow_job(request: ChatRequest) -> Dict[str, Any]:
+    """Starts the workflow as a background job and returns the job record"""
+    async def runner(job_id: str) -> list:
+        def record_progress(event: str, data: Dict[str, Any]) -> None:
+            if event == "mcp_acl":
+                job_manager.record_mcp_acl(job_id, data)
+            else:
+                job_manager.record_result(job_id, data)
+        return await run_shared_workflow(request, record_progress)
+    return job_manager.submit(request.session_id, runner, key=coalescing_key(request))
+
+def job_status_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Formats a job record the way /orchestrate status checks are answered"""
+    response = {
+        "job_id": job["job_id"],
+        "status_url": f"/orchestrate/jobs/{job['job_id']}",
+        "job_status": job["status"],
+        "results": job["results"]
+    }
+    if job["status"] == JOB_COMPLETED:
+        response["status"] = "success"
+    elif job["status"] == JOB_FAILED:
+        response["status"] = "error"
+        response["error"] = job["error"]
+    else:
+        response["status"] = "processing"
+        response["mcp_acl"] = job["mcp_acl"] or PENDING_MCP_ACL
+    return response
 
 @app.post("/orchestrate")
 async def orchestrate(request: ChatRequest):
@@ -112,8 +293,13 @@ async def orchestrate(request: ChatRequest):
         # Check if this is a status request
         if request.get_status or request.is_retry:
             logger.info(f"🎯 [Orchestrate] Status check for session {request.session_id}")
-            if request.session_id in session_results:
-                results = session_results[request.session_id]
+            job = (job_manager.get(request.job_id) if request.job_id
+                   else job_manager.latest_for_session(request.session_id))
+            if job:
+                logger.info(f"🎯 [Orchestrate] Job {job['job_id']} is {job['status']} with {len(job['results'])} results")
+                return job_status_response(job)
+            results = session_store.get(f"results:{request.session_id}")
+            if results is not None:
                 logger.info(f"🎯 [Orchestrate] Found results for session {request.session_id}: {results}")
                 return {
                     "status": "success",
@@ -123,71 +309,27 @@ async def orchestrate(request: ChatRequest):
                 logger.info(f"No results yet for session {request.session_id}")
                 return {
                     "status": "processing",
-                    "mcp_acl": {
-                        "agents": ["symptom_analyzer", "disease_prediction"],
-                        "actions": [
-                            {"agent": "symptom_analyzer", "action": "analyze_symptoms"},
-                            {"agent": "disease_prediction", "action": "predict_disease"}
-                        ]
-                    }
+                    "mcp_acl": PENDING_MCP_ACL
                 }
 
-        # Call prompt processor to get MCP/ACL structure
-        logger.info(f"🎯 [Orchestrate] Calling Prompt Processor (8000) to enrich...")
-        prompt_payload = {
-            "prompt": request.prompt,
-            "user_id": request.user_id,
-            "session_id": request.session_id,
-            "workflow": request.workflow
-        }
-        
-        try:
-            prompt_response = requests.post(
-                "http://127.0.0.1:8000/process_prompt",
-                json=prompt_payload
-            )
-            if prompt_response.status_code != 200:
-                logger.error(f"🎯 [Orchestrate] Prompt Processor returned {prompt_response.status_code}")
-                raise HTTPException(
-                    status_code=prompt_response.status_code,
-                    detail=f"Prompt Processor Error: {prompt_response.text}"
-                )
-            
-            logger.info(f"🎯 [Orchestrate] ✅ Prompt Processor returned MCP/ACL successfully")
-            mcp_acl = prompt_response.json().get("mcp_acl")
-            if not mcp_acl:
-                logger.error(f"🎯 [Orchestrate] Prompt Processor response missing MCP/ACL")
-                raise HTTPException(
-                    status_code=400,
-                    detail="No MCP/ACL structure returned from prompt processor"
-                )
-        except requests.RequestException as e:
-            logger.error(f"🎯 [Orchestrate] Error calling Prompt Processor: {str(e)}")
-            raise HTTPException(
-                status_code=503,
-                detail=f"Error communicating with prompt processor: {str(e)}"
-            )
+        background = ORCHESTRATE_BACKGROUND if request.background is None else request.background
+        if background:
+            try:
+                job = submit_workflow_job(request)
+            except JobQueueFullError as e:
+                raise HTTPException(status_code=429, detail=str(e))
+            logger.info(f"🎯 [Orchestrate] Started background job {job['job_id']}")
+            return job_status_response(job)
 
-        if not input_handler.validate(mcp_acl):
-            logger.error(f"🎯 [Orchestrate] Invalid MCP/ACL structure")
-            raise HTTPException(status_code=400, detail="Invalid MCP/ACL structure")
-
-        logger.info(f"🎯 [Orchestrate] Extracting plan from MCP/ACL...")
-        plan = input_handler.extract_plan(mcp_acl)
-        logger.info(f"🎯 [Orchestrate] Sequencing tasks...")
-        sequenced_tasks = task_planner.sequence_tasks(plan)
-        logger.info(f"🎯 [Orchestrate] Dispatching tasks to agents...")
-        results = agent_dispatcher.dispatch(sequenced_tasks)
-        logger.info(f"🎯 [Orchestrate] ✅ Agent dispatch complete! Got {len(results) if results else 0} results")
-        
-        # Store results for this session
-        session_results[request.session_id] = results
+        results = await run_shared_workflow(request)
         logger.info(f"🎯 [Orchestrate] ✅ Returning results to client")
         
         return {
             "status": "success",
             "results": results
         }
+    except HTTPException:
+        raise
     except ValueError as ve:
         logger.error(f"🎯 [Orchestrate] ValueError: {str(ve)}")
         raise HTTPException(status_code=400, detail=str(ve))
@@ -196,6 +338,73 @@ async def orchestrate(request: ChatRequest):
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Orchestration error: {str(e)}")
 
+def format_sse(event: str, data: Any) -> str:
+    """Encodes one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/orchestrate/stream")
+async def orchestrate_stream(request: ChatRequest):
+    """
+    Runs the workflow and streams each stage as a Server-Sent Event:
+    "mcp_acl" once the plan is generated, "agent_result" as each agent finishes
+    (same structure as the /orchestrate results), then "complete" or "error".
+    """
+    logger.info(f"🎯 [Orchestrate/stream] Received request for session {request.session_id}")
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            results = await run_shared_workflow(request, lambda event, data: events.put_nowait((event, data)))
+            events.put_nowait(("complete", {"status": "success", "results": results}))
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"🎯 [Orchestrate/stream] Workflow failed: {detail}")
+            events.put_nowait(("error", {"status": "error", "error": detail}))
+
+    async def event_stream():
+        worker = asyncio.create_task(produce())
+        try:
+            while True:
+                event, data = await events.get()
+                yield format_sse(event, data)
+                if event in ("complete", "error"):
+                    break
+        finally:
+            # The client disconnected early: stop waiting. The shared workflow is cancelled
+            # too unless another request is still waiting on it.
+            if not worker.done():
+                worker.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Operational metrics for the orchestrator"""
+    return {
+        "session_store": session_store.stats(),
+        "single_flight": single_flight.stats(),
+        "jobs": {
+            "active": job_manager.active_count,
+            "coalesced": job_manager.coalesced,
+            "max_running": job_manager.max_running,
+            "max_queued": job_manager.max_queued
+        },
+        "intent_router": llm_service.intent_router.stats() if llm_service.intent_router else None,
+        "llm_cache": llm_service.llm_cache.stats()
+    }
+
+@app.get("/orchestrate/jobs/{job_id}")
+async def get_orchestration_job(job_id: str):
+    """Polls a background orchestration job for its status and partial results"""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job_status_response(job)
+
 class DiseasePredictionRequest(BaseModel):
     symptoms: list[str]
 
@@ -241,21 +450,18 @@ async def orchestrate_with_prompt(request: Request):
     try:
         # Step 1: Receive raw prompt from the request
         input_data = await request.json()
-        prompt_payload = {
-            "prompt": input_data.get("prompt"),
-            "user_id": input_data.get("user_id"),
-            "session_id": input_data.get("session_id"),
-            "workflow": input_data.get("workflow")
-        }
-
-        # Step 2: Call the prompt_processor service
-        import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.post("http://127.0.0.1:8000/process_prompt", json=prompt_payload)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail=f"Prompt Processor Error: {response.text}")
+        try:
+            chat_request = ChatRequest(
+                prompt=input_data.get("prompt"),
+                user_id=input_data.get("user_id"),
+                session_id=input_data.get("session_id"),
+                workflow=input_data.get("workflow")
+            )
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
 
-            mcp_acl = response.json().get("mcp_acl")
+        # Step 2: Generate the MCP/ACL, in-process or via the prompt_processor service
+        mcp_acl = await fetch_mcp_acl(chat_request)
 
         # Step 3: Validate MCP/ACL structure
         if not input_handler.validate(mcp_acl):
@@ -268,7 +474,7 @@ async def orchestrate_with_prompt(request: Request):
         sequenced_tasks = task_planner.sequence_tasks(plan)
 
         # Step 6: Dispatch tasks to sub-agents
-        dispatch_results = agent_dispatcher.dispatch(sequenced_tasks)
+        dispatch_results = await agent_dispatcher.dispatch_async(sequenced_tasks)
 
         # Step 7: Return results
         return {
@@ -1,6 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, Query, Body
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import json
+import uuid
 
 app = FastAPI(title="FHIR Demo Server")
 
@@ -11,6 +17,10 @@ mock_patient_data = {
             {
                 "resource": {
                     "resourceType": "Observation",
+                    "id": "obs-p123-1",
+                    "meta": {
+                        "lastUpdated": "2025-11-08T10:00:00Z"
+                    },
                     "code": {
                         "coding": [
                             {
@@ -29,6 +39,10 @@ mock_patient_data = {
             {
                 "resource": {
                     "resourceType": "Observation",
+                    "id": "obs-p123-2",
+                    "meta": {
+                        "lastUpdated": "2025-11-08T10:00:00Z"
+                    },
                     "code": {
                         "coding": [
                             {
@@ -51,6 +65,10 @@ mock_patient_data = {
             {
                 "resource": {
                     "resourceType": "Observation",
+                    "id": "obs-p456-1",
+                    "meta": {
+                        "lastUpdated": "2025-11-08T09:00:00Z"
+                    },
                     "code": {
                         "coding": [
                             {
@@ -70,12 +88,109 @@ mock_patient_data = {
     }
 }
 
+def _parse_instant(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+def _matches_last_updated(resource: Dict[str, Any], last_updated: str) -> bool:
+    """Evaluates a _lastUpdated search parameter with an optional gt/ge/lt/le/eq prefix"""
+    prefix, value = (last_updated[:2], last_updated[2:]) if last_updated[:2] in _DATE_PREFIXES else ("eq", last_updated)
+    return _DATE_PREFIXES[prefix](_parse_instant(resource["meta"]["lastUpdated"]), _parse_instant(value))
+
+_DATE_PREFIXES = {
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+    "eq": lambda a, b: a == b
+}
+
+def _build_bundle(patient_id: str, last_updated: Optional[str] = None) -> Dict[str, Any]:
+    entries = mock_patient_data[patient_id]["entry"]
+    if last_updated:
+        entries = [e for e in entries if _matches_last_updated(e["resource"], last_updated)]
+    last_updated = max((e["resource"]["meta"]["lastUpdated"] for e in entries), default=None)
+    return {
+        "resourceType": "Bundle",
+        "type": "searchset",
+        "meta": {"lastUpdated": last_updated},
+        "total": len(entries),
+        "entry": entries
+    }
+
+def _page(bundle: Dict[str, Any], request: Request, count: Optional[int], offset: int) -> Dict[str, Any]:
+    """One page of a searchset bundle, with a next link while more entries remain"""
+    if count is None:
+        return bundle
+    page = {**bundle, "entry": bundle["entry"][offset:offset + count]}
+    page["link"] = [{"relation": "self", "url": str(request.url)}]
+    if offset + count < len(bundle["entry"]):
+        page["link"].append({"relation": "next",
+                             "url": str(request.url.include_query_params(_offset=offset + count))})
+    return page
+
+def _validators(bundle: Dict[str, Any]) -> Dict[str, str]:
+    """ETag and Last-Modified headers for a bundle"""
+    digest = hashlib.sha1(json.dumps(bundle, sort_keys=True).encode("utf-8")).hexdigest()
+    headers = {"ETag": f'W/"{digest}"'}
+    if bundle["meta"]["lastUpdated"]:
+        headers["Last-Modified"] = format_datetime(_parse_instant(bundle["meta"]["lastUpdated"]), usegmt=True)
+    return headers
+
+def _not_modified(request: Request, bundle: Dict[str, Any], headers: Dict[str, str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and bundle["meta"]["lastUpdated"]:
+        try:
+            return _parse_instant(bundle["meta"]["lastUpdated"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
 @app.get("/Patient/{patient_id}/Observation")
-async def get_patient_observations(patient_id: str):
-    """Get patient observations from FHIR database"""
+async def get_patient_observations(patient_id: str, request: Request,
+                                   last_updated: Optional[str] = Query(None, alias="_lastUpdated"),
+                                   count: Optional[int] = Query(None, alias="_count", ge=1),
+                                   offset: int = Query(0, alias="_offset", ge=0)):
+    """Get patient observations from FHIR database, paged when _count is given"""
     if patient_id not in mock_patient_data:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return mock_patient_data[patient_id]
+    try:
+        bundle = _build_bundle(patient_id, last_updated)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid _lastUpdated value: {last_updated}")
+    # Validators cover the whole result set, so a change on any page invalidates the first
+    headers = _validators(bundle)
+    if _not_modified(request, bundle, headers):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(_page(bundle, request, count, offset), headers=headers)
+
+@app.post("/Patient/{patient_id}/Observation", status_code=201)
+async def create_patient_observation(patient_id: str, resource: Dict[str, Any] = Body(...)):
+    """Create an observation; the server assigns id and meta.lastUpdated"""
+    if patient_id not in mock_patient_data:
+        mock_patient_data[patient_id] = {"entry": []}
+    entries = mock_patient_data[patient_id]["entry"]
+    resource = {**resource, "resourceType": "Observation", "id": f"obs-{patient_id.lower()}-{uuid.uuid4().hex[:8]}"}
+    resource["meta"] = {"lastUpdated": _now()}
+    entries.append({"resource": resource})
+    return resource
+
+@app.put("/Patient/{patient_id}/Observation/{observation_id}")
+async def update_patient_observation(patient_id: str, observation_id: str, resource: Dict[str, Any] = Body(...)):
+    """Update an existing observation, bumping its meta.lastUpdated"""
+    entries = mock_patient_data.get(patient_id, {}).get("entry", [])
+    for entry in entries:
+        if entry["resource"].get("id") == observation_id:
+            entry["resource"] = {**resource, "resourceType": "Observation", "id": observation_id,
+                                 "meta": {"lastUpdated": _now()}}
+            return entry["resource"]
+    raise HTTPException(status_code=404, detail="Observation not found")
 
 @app.get("/health")
 async def health_check():
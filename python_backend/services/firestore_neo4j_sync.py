@@ -0,0 +1,25 @@
+import os
+from typing import Iterable, Optional
+import logging
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PATIENT_JOURNEY_URL = os.getenv("PATIENT_JOURNEY_URL", "http://localhost:8005")
+
+def notify_patient_journey_changes(patient_ids: Optional[Iterable[str]] = None) -> bool:
+    """
+    Tells the patient journey agent to drop its cached journeys after a sync wrote
+    diagnoses, appointments, medications, treatments or tests for these patients
+    (None: every patient, e.g. after a full resync). Returns False if the agent could
+    not be reached; its cache then catches up within JOURNEY_CACHE_TTL.
+    """
+    payload = {"invalidate_all": True} if patient_ids is None else {"patient_ids": list(patient_ids)}
+    try:
+        response = requests.post(f"{PATIENT_JOURNEY_URL}/patient_journey/invalidate", json=payload, timeout=5)
+        response.raise_for_status()
+        return True
+    except requests.RequestException as e:
+        logger.warning(f"Could not invalidate cached patient journeys: {e}")
+        return False
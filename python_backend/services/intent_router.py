@@ -0,0 +1,164 @@
+import re
+import threading
+from typing import Dict, Any, List, Iterable, Optional
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+INTENT_PATIENT_JOURNEY = "patient_journey"
+INTENT_MEDICAL_DIAGNOSIS = "medical_diagnosis"
+INTENT_OUT_OF_SCOPE = "out_of_scope"
+
+TIER_LOCAL = "local"
+TIER_LLM = "llm"
+
+# Phrases describing current symptoms. Only health-specific words: generic phrasing
+# such as "i have" or "i feel" says nothing about the topic of a prompt.
+SYMPTOM_TERMS = [
+    "symptom", "fever", "temperature", "cough", "headache", "head pain", "migraine",
+    "nausea", "nauseous", "vomit", "dizzy", "dizziness", "sore throat", "throat pain",
+    "fatigue", "tired", "exhausted", "weakness", "pain", "ache", "hurt", "hurts",
+    "rash", "itch", "itchy", "swelling", "swollen", "diarrhea", "stomach", "chills",
+    "sweating", "runny nose", "congestion", "short of breath", "breathing", "chest pain",
+    "chest tightness", "bleeding", "feeling sick"
+]
+
+# Symptom terms that are just as common in everyday speech ("tired of my job",
+# "my heart hurts"). On their own they are not enough to route locally.
+WEAK_SYMPTOM_TERMS = [
+    "tired", "pain", "ache", "hurt", "hurts", "stomach", "breathing", "weakness",
+    "temperature", "exhausted"
+]
+
+# Words that place a query in the health domain without pointing at an intent
+HEALTH_TERMS = [
+    "health", "medical", "doctor", "disease", "illness", "sick", "medicine",
+    "hospital", "patient", "diagnosis", "diagnose", "clinic", "nurse", "infection",
+    "symptom", "medication", "prescription"
+]
+
+# Common off-topic requests the assistant cannot serve
+OFF_TOPIC_TERMS = [
+    "weather", "recipe", "cook", "football", "cricket", "movie", "song", "music",
+    "stock", "bitcoin", "crypto", "joke", "poem", "capital of", "translate",
+    "code", "programming", "python", "javascript", "homework", "travel", "flight",
+    "hotel", "restaurant", "game", "news", "election", "president", "who are you"
+]
+
+# Confidence of keyword evidence that should still be confirmed by the LLM
+UNCONFIRMED_CONFIDENCE = 0.5
+
+def _compile_terms(terms: Iterable[str], whole_words: bool = True) -> Optional[re.Pattern]:
+    """
+    One alternation regex per vocabulary, anchored at word starts. With whole_words
+    a term must also end a word, allowing a plural or -ing/-ed ending, so "pain"
+    matches "pains" but not "painting".
+    """
+    unique = sorted({t.lower() for t in terms if t}, key=len, reverse=True)
+    if not unique:
+        return None
+    suffix = r"(?:s|es|ing|ed)?\b" if whole_words else ""
+    return re.compile(r"\b(?:" + "|".join(re.escape(t) for t in unique) + r")" + suffix)
+
+class IntentRouter:
+    """
+    Local, CPU-only first tier for intent routing.
+    Settles clear symptom descriptions, journey/history requests and off-topic
+    queries from keyword evidence; anything below the confidence threshold is
+    left for the LLM tier. A prompt is only routed to an agent locally when it
+    carries health evidence (symptom or health terms); without it the LLM's scope
+    check decides. Keeps per-tier counters for hit-rate reporting.
+    """
+    def __init__(self,
+                 journey_terms: Iterable[str],
+                 symptom_terms: Iterable[str] = SYMPTOM_TERMS,
+                 weak_symptom_terms: Iterable[str] = WEAK_SYMPTOM_TERMS,
+                 health_terms: Iterable[str] = HEALTH_TERMS,
+                 off_topic_terms: Iterable[str] = OFF_TOPIC_TERMS,
+                 threshold: float = 0.8):
+        self.threshold = threshold
+        self._journey = _compile_terms(journey_terms)
+        self._symptom = _compile_terms(symptom_terms)
+        self._weak_symptom = _compile_terms(weak_symptom_terms)
+        self._health = _compile_terms(health_terms)
+        self._off_topic = _compile_terms(off_topic_terms)
+        self._lock = threading.Lock()
+        self.counts = {TIER_LOCAL: 0, TIER_LLM: 0, "llm_fallback": 0}
+        self.intent_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _matches(pattern: Optional[re.Pattern], text: str) -> List[str]:
+        return pattern.findall(text) if pattern else []
+
+    def _weak_only(self, symptoms: List[str]) -> bool:
+        """True when the only symptom evidence is a single everyday word such as "tired" """
+        if len(symptoms) != 1 or not self._weak_symptom:
+            return False
+        return bool(self._weak_symptom.fullmatch(symptoms[0]))
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        Returns {"intent", "confidence", "evidence"} from local keyword evidence.
+        intent is None when there is no usable evidence.
+        """
+        lowered = (text or "").lower()
+        journey = self._matches(self._journey, lowered)
+        symptoms = self._matches(self._symptom, lowered)
+        health = self._matches(self._health, lowered)
+        off_topic = self._matches(self._off_topic, lowered)
+        evidence = {"journey": journey, "symptoms": symptoms, "health": health, "off_topic": off_topic}
+
+        if journey and not symptoms:
+            confidence = min(0.95, 0.8 + 0.05 * len(journey))
+            if off_topic:
+                confidence -= 0.3
+            if not health:
+                # "history", "past", "record" alone fit any topic ("world war history")
+                confidence = min(confidence, UNCONFIRMED_CONFIDENCE)
+            return {"intent": INTENT_PATIENT_JOURNEY, "confidence": confidence, "evidence": evidence}
+        if symptoms and not journey:
+            confidence = min(0.95, 0.8 + 0.05 * len(symptoms))
+            if off_topic:
+                confidence -= 0.3
+            if not health and self._weak_only(symptoms):
+                # "I am tired of my job" - leave the scope check to the LLM
+                confidence = min(confidence, UNCONFIRMED_CONFIDENCE)
+            return {"intent": INTENT_MEDICAL_DIAGNOSIS, "confidence": confidence, "evidence": evidence}
+        if symptoms and journey:
+            # Mixed evidence such as "fever for the past week" - let the LLM decide
+            intent = INTENT_MEDICAL_DIAGNOSIS if len(symptoms) > len(journey) else INTENT_PATIENT_JOURNEY
+            return {"intent": intent, "confidence": UNCONFIRMED_CONFIDENCE, "evidence": evidence}
+        if off_topic and not health:
+            confidence = min(0.95, 0.8 + 0.05 * len(off_topic))
+            return {"intent": INTENT_OUT_OF_SCOPE, "confidence": confidence, "evidence": evidence}
+        return {"intent": None, "confidence": 0.0, "evidence": evidence}
+
+    def route(self, text: str) -> Optional[Dict[str, Any]]:
+        """Returns the local decision when it clears the threshold, otherwise None"""
+        decision = self.classify(text)
+        if decision["intent"] and decision["confidence"] >= self.threshold:
+            self.record(TIER_LOCAL, decision["intent"])
+            logger.info(f"Intent routed locally: {decision['intent']} ({decision['confidence']:.2f})")
+            return decision
+        logger.info(f"Local router not confident ({decision['confidence']:.2f}), deferring to LLM")
+        return None
+
+    def record(self, tier: str, intent: Optional[str] = None) -> None:
+        with self._lock:
+            self.counts[tier] = self.counts.get(tier, 0) + 1
+            if intent:
+                self.intent_counts[intent] = self.intent_counts.get(intent, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.counts[TIER_LOCAL] + self.counts[TIER_LLM]
+        return {
+            "total": total,
+            "tiers": dict(self.counts),
+            "hit_rates": {
+                TIER_LOCAL: round(self.counts[TIER_LOCAL] / total, 4) if total else 0.0,
+                TIER_LLM: round(self.counts[TIER_LLM] / total, 4) if total else 0.0
+            },
+            "intents": dict(self.intent_counts),
+            "threshold": self.threshold
+        }
@@ -1,5 +1,7 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import os
+import asyncio
+import re
 import json
 from datetime import datetime
 from dotenv import load_dotenv
@@ -28,9 +30,72 @@ from langchain_google_vertexai import VertexAI
 from pydantic import BaseModel, Field
 import logging
 
+from common.llm_cache import LLMResponseCache
+from services.intent_router import (
+    IntentRouter, INTENT_PATIENT_JOURNEY, INTENT_MEDICAL_DIAGNOSIS, INTENT_OUT_OF_SCOPE, TIER_LLM
+)
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+LLM_MODEL_NAME = "gemini-2.5-pro"
+
+# Explicit patient_journey keywords
+JOURNEY_KEYWORDS = ['history', 'journey', 'timeline', 'past', 'appointment', 'treatment', 'medication', 'visit', 'result', 'record', 'medical history', 'health journey']
+
+# Prompt templates; the template text is part of the LLM cache key
+SYMPTOM_EXTRACTION_PROMPT = """Analyze this text for medical symptoms and related health information. Consider both explicit and implicit symptoms.
+
+Text: "{text}"
+
+Provide your analysis in this exact JSON format:
+{{
+    "explicit_symptoms": ["symptom1", "symptom2"],
+    "implicit_symptoms": ["inferred_symptom1"],
+    "duration_mentions": ["started 2 days ago", "occurs daily"],
+    "severity_indicators": ["mild", "severe", etc],
+    "contextual_health_info": ["relevant medical history", "medications", etc]
+}}
+
+Focus on medical accuracy and completeness."""
+
+COMBINED_CLASSIFICATION_PROMPT = """Medical chat query analysis - Be concise!
+
+Query: "{text}"
+
+1. Is this query about health/medical topics?
+2. Can we answer it by analyzing current symptoms (symptom_analyzer), predicting diseases from symptoms (disease_prediction) or retrieving the patient's past medical history/journey (patient_journey)?
+3. Is it asking about THEIR medical history/past events (patient_journey) or CURRENT symptoms (medical_diagnosis)?
+
+Respond with ONLY this JSON (no explanation):
+{{"is_health_related": true or false, "can_handle": true or false, "intent": "patient_journey" or "medical_diagnosis"}}"""
+
+SCOPE_CHECK_PROMPT = """Is this query about health/medical topics?
+
+Query: "{text}"
+
+Respond with ONLY this JSON (no explanation):
+{{"is_health_related": true or false}}"""
+
+ACTIONABILITY_PROMPT = """Can we answer this query by:
+1. Analyzing current symptoms (symptom_analyzer)
+2. Predicting diseases from symptoms (disease_prediction)  
+3. Retrieving patient's past medical history/journey (patient_journey)
+
+Query: "{text}"
+
+Does the query fit one of these three categories? Respond with ONLY:
+{{"can_handle": true or false, "reason": "brief reason"}}"""
+
+INTENT_PROMPT = """Medical chat query analysis - Be concise!
+
+User: "{text}"
+
+Is this asking about THEIR medical history/past events (patient_journey) or CURRENT symptoms (medical_diagnosis)?
+
+Respond with ONLY this JSON (no explanation):
+{{"intent": "patient_journey" or "medical_diagnosis"}}"""
+
 class MCPACLAction(BaseModel):
     agent: str
     action: str
@@ -49,6 +114,21 @@ class MCPACL(BaseModel):
 
 class LLMService:
     def __init__(self):
+        # Define patterns for different query types
+        self.journey_patterns = [
+            "medication history", "medical history",
+            "last visit", "next appointment",
+            "doctor visits", "hospital", "treatment",
+            "prescription", "diagnosis"
+        ]
+        # Local first tier for intent routing; only low-confidence prompts reach the LLM
+        self.intent_router = None
+        if os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true":
+            self.intent_router = IntentRouter(
+                JOURNEY_KEYWORDS + self.journey_patterns,
+                threshold=float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.8"))
+            )
+        self.llm_cache = LLMResponseCache()
         try:
             project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
             if not project_id:
@@ -56,42 +136,40 @@ class LLMService:
                 
             self.llm = VertexAI(
                 project=project_id,
-                model_name="gemini-2.5-pro"
+                model_name=LLM_MODEL_NAME
             )
-            # Define patterns for different query types
-            self.journey_patterns = [
-                "medication history", "medical history",
-                "last visit", "next appointment",
-                "doctor visits", "hospital", "treatment",
-                "prescription", "diagnosis"
-            ]
             logger.info("LLM service initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing LLM service: {str(e)}")
             self.llm = None
 
+    def _call_llm(self, template: str, text: str) -> str:
+        """Formats template with text and returns the completion, served from the LLM cache when possible"""
+        return self.llm_cache.call(
+            LLM_MODEL_NAME, template, text,
+            lambda: self.llm(template.format(text=text))
+        )
+
+    async def _acall_llm(self, template: str, text: str) -> str:
+        """
+        Async _call_llm on the model's native async API, so a task awaiting it can be
+        cancelled mid-request
+        """
+        cached = self.llm_cache.get(LLM_MODEL_NAME, template, text)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+        value = await self.llm.ainvoke(template.format(text=text))
+        self.llm_cache.set(LLM_MODEL_NAME, template, text, value)
+        return value
+
     def get_structured_symptoms(self, text: str) -> List[str]:
         """Extract structured symptoms from text using semantic understanding"""
         try:
             if not self.llm:
                 return []
 
-            prompt = f"""Analyze this text for medical symptoms and related health information. Consider both explicit and implicit symptoms.
-
-Text: "{text}"
-
-Provide your analysis in this exact JSON format:
-{{
-    "explicit_symptoms": ["symptom1", "symptom2"],
-    "implicit_symptoms": ["inferred_symptom1"],
-    "duration_mentions": ["started 2 days ago", "occurs daily"],
-    "severity_indicators": ["mild", "severe", etc],
-    "contextual_health_info": ["relevant medical history", "medications", etc]
-}}
-
-Focus on medical accuracy and completeness."""
-
-            response = self.llm(prompt)
+            response = self._call_llm(SYMPTOM_EXTRACTION_PROMPT, text)
             try:
                 # Extract JSON from response
                 start_idx = response.find('{')
@@ -115,6 +193,18 @@ Focus on medical accuracy and completeness."""
             logger.error(f"Error extracting symptoms: {str(e)}")
             return []
 
+    @staticmethod
+    def _parse_json(response: str, default: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract the JSON object from an LLM response, falling back to default"""
+        try:
+            start_idx = response.find('{')
+            end_idx = response.rfind('}') + 1
+            if start_idx != -1 and end_idx != -1:
+                return json.loads(response[start_idx:end_idx])
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error: {str(e)}")
+        return default
+
     def generate_mcp_acl(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate MCP/ACL structure based on semantic understanding"""
         try:
@@ -122,281 +212,347 @@ Focus on medical accuracy and completeness."""
             raw_text = enriched_data.get('raw_prompt', '')
             enriched_context = enriched_data.get('enriched_context', {})
             user_id = enriched_context.get('user_id')
-            
-            if not self.llm:
-                raise ValueError("LLM service not initialized")
 
-            # FIRST: Check if query is even about health topics (scope check)
-            logger.info("Performing scope check for health-related content")
-            scope_prompt = f"""Is this query about health/medical topics?
+            if self.intent_router:
+                intent, keyword_match = self._route_intent(raw_text)
+            else:
+                intent, keyword_match = self._classify_intent_sequential(raw_text)
+            return self._build_mcp_acl(intent, raw_text, user_id, keyword_match)
+        except Exception as e:
+            logger.error(f"Error generating MCP/ACL: {str(e)}")
+            raise
 
-Query: "{raw_text}"
+    async def generate_mcp_acl_async(self, enriched_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async variant of generate_mcp_acl for use inside FastAPI handlers.
+        Prompts the local router cannot settle get the scope, actionability and intent
+        calls concurrently on the model's async API, cancelled once one gate fails.
+        """
+        try:
+            raw_text = enriched_data.get('raw_prompt', '')
+            enriched_context = enriched_data.get('enriched_context', {})
+            user_id = enriched_context.get('user_id')
 
-Respond with ONLY this JSON (no explanation):
-{{"is_health_related": true or false}}"""
+            decision = self.intent_router.route(raw_text) if self.intent_router else None
+            if decision:
+                intent, keyword_match = decision["intent"], True
+            else:
+                intent, keyword_match = await self._classify_intent_concurrent(raw_text)
+                if self.intent_router:
+                    self.intent_router.record(TIER_LLM, intent)
+            return self._build_mcp_acl(intent, raw_text, user_id, keyword_match)
+        except Exception as e:
+            logger.error(f"Error generating MCP/ACL: {str(e)}")
+            raise
 
-            try:
-                scope_response = self.llm(scope_prompt)
-                logger.info(f"Scope check response: {scope_response[:200]}")
-                
-                try:
-                    start_idx = scope_response.find('{')
-                    end_idx = scope_response.rfind('}') + 1
-                    if start_idx != -1 and end_idx != -1:
-                        scope_analysis = json.loads(scope_response[start_idx:end_idx])
-                    else:
-                        scope_analysis = {"is_health_related": False}
-                except json.JSONDecodeError:
-                    scope_analysis = {"is_health_related": False}
-                
-                # If out of scope, return indicator
-                if not scope_analysis.get("is_health_related", False):
-                    logger.info("Query detected as OUT OF SCOPE")
-                    return {
-                        "scope": "out_of_scope",
-                        "out_of_scope": True,
-                        "agents": [],
-                        "workflow": "none",
-                        "actions": [],
-                        "data_flow": []
-                    }
-            except Exception as e:
-                logger.warning(f"Scope check LLM error: {str(e)}, continuing with analysis")
+    def _build_mcp_acl(self, intent: str, raw_text: str, user_id: str, keyword_match: bool) -> Dict[str, Any]:
+        """Create MCP/ACL structure based on intent"""
+        if intent == INTENT_OUT_OF_SCOPE:
+            logger.info("Query detected as OUT OF SCOPE")
+            return self._out_of_scope_mcp_acl()
+        if intent == INTENT_PATIENT_JOURNEY:
+            if keyword_match:
+                patient_id = self._extract_journey_patient_id(raw_text, user_id)
+            else:
+                patient_id = self._extract_patient_id(raw_text, user_id)
+            mcp = self._journey_mcp_acl(raw_text, patient_id)
+        else:
+            mcp = self._diagnosis_mcp_acl(raw_text)
 
-            # First, check for explicit patient_journey keywords without LLM call
-            journey_keywords = ['history', 'journey', 'timeline', 'past', 'appointment', 'treatment', 'medication', 'visit', 'result', 'record', 'medical history', 'health journey']
-            is_journey_query = any(keyword in raw_text.lower() for keyword in journey_keywords)
-            
-            # If clearly a journey query, skip LLM and go directly
-            if is_journey_query:
-                logger.info("Direct patient_journey detection (no LLM needed)")
-                # Extract patient_id from query
-                import re
-                patient_id = None
-                mentioned_patient = None  # Track if user mentioned any patient-like string
-                
-                patterns = [
-                    r'patient\s+(?:id:?\s*)?([a-z]{0,3}\d+)',  # "patient pat1" or "patient id: pat1"
-                    r'for\s+(?:patient\s+)?([a-z]{0,3}\d+)',   # "for pat1"
-                    r'id:\s*([a-z]{0,3}\d+)',                  # "id: pat1"
-                    r'([a-z]{0,3}\d+)(?:\s|$)',                # standalone "pat1" followed by space or end
-                    r'\b([a-z]{0,3}\d{1,})\b',                 # word boundary with at least 1 digit
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, raw_text.strip(), re.IGNORECASE)
-                    if match:
-                        extracted = match.group(1).lower()
-                        # Validate it looks like a patient ID (starts with letters, ends with digits, minimum 1 digit)
-                        if re.match(r'^[a-z]{0,3}\d{1,}$', extracted):
-                            patient_id = extracted
-                            logger.info(f"Extracted patient_id: {patient_id}")
-                            break
-                
-                # Also check if user mentioned patient-like strings (even incomplete)
-                # Look specifically for patterns that look like patient IDs: pat, p, pat without digits at end of query
-                if not patient_id:
-                    # Search from end of string backwards to find potential patient identifiers
-                    words = raw_text.strip().split()
-                    for word in reversed(words):  # Start from end
-                        word_lower = word.lower().strip('.,!?;:')
-                        # Check if word looks like patient ID prefix (1-3 letters, optional digits)
-                        if re.match(r'^[a-z]{1,3}\d*$', word_lower) and len(word_lower) <= 3:
-                            # If it's a common word, skip it
-                            if word_lower not in ['the', 'and', 'for', 'my', 'show', 'get', 'is', 'are', 'was', 'been', 'have', 'has', 'do', 'does', 'did', 'will', 'can', 'could', 'should', 'would', 'may', 'might', 'must', 'of', 'in', 'on', 'at', 'to', 'by', 'or', 'as', 'with', 'from', 'about', 'history', 'medical', 'patient', 'journey', 'timeline', 'past', 'appointment', 'treatment', 'medication', 'visit', 'result', 'record', 'me', 'you', 'he', 'she', 'we', 'it']:
-                                mentioned_patient = word_lower
-                                logger.info(f"User mentioned potential patient identifier from end: {mentioned_patient}")
-                                break
-                
-                # Use extracted patient_id, or use mentioned string if it looks like incomplete patient ID
-                if not patient_id:
-                    if mentioned_patient:
-                        # User explicitly mentioned something like "pat" or "pat3" - use it literally
-                        patient_id = mentioned_patient
-                        logger.info(f"Using mentioned patient identifier: {patient_id}")
-                    else:
-                        patient_id = user_id or 'pat1'
-                        logger.info(f"Using default patient_id: {patient_id}")
-                
-                mcp = MCPACL(
-                    agents=["patient_journey"],
-                    workflow="patient_journey_tracking",
-                    actions=[
-                        MCPACLAction(
-                            agent="patient_journey",
-                            action="get_journey",
-                            params={
-                                "patient_id": patient_id,
-                                "query_type": "general",
-                                "concepts": [],
-                                "original_query": raw_text
-                            }
-                        )
-                    ],
-                    data_flow=[]
-                )
-                
-                result = mcp.model_dump()
-                for flow in result["data_flow"]:
-                    if "fr" in flow:
-                        flow["from"] = flow.pop("fr")
-                return result
-            
-            # Use Gemini Pro for diagnosis queries (with timeout)
-            logger.info("Using LLM for intent analysis")
-            
-            # First, check if this query is asking for something we CAN handle
-            actionability_prompt = f"""Can we answer this query by:
-1. Analyzing current symptoms (symptom_analyzer)
-2. Predicting diseases from symptoms (disease_prediction)  
-3. Retrieving patient's past medical history/journey (patient_journey)
+        # Convert to dict and ensure "from" field is correct
+        result = mcp.model_dump()
+        for flow in result["data_flow"]:
+            # Fix the field name if needed
+            if "fr" in flow:
+                flow["from"] = flow.pop("fr")
+        
+        return result
 
-Query: "{raw_text}"
+    def _route_intent(self, raw_text: str) -> Tuple[str, bool]:
+        """
+        Tiered routing: the local classifier settles clear-cut prompts, the rest
+        go to Gemini as one combined scope/actionability/intent call.
+        Returns (intent, decided_from_keywords).
+        """
+        decision = self.intent_router.route(raw_text)
+        if decision:
+            return decision["intent"], True
 
-Does the query fit one of these three categories? Respond with ONLY:
-{{"can_handle": true or false, "reason": "brief reason"}}"""
+        if not self.llm:
+            raise ValueError("LLM service not initialized")
 
-            try:
-                actionability_response = self.llm(actionability_prompt)
-                logger.info(f"Actionability check: {actionability_response[:200]}")
-                
-                try:
-                    start_idx = actionability_response.find('{')
-                    end_idx = actionability_response.rfind('}') + 1
-                    if start_idx != -1 and end_idx != -1:
-                        actionability = json.loads(actionability_response[start_idx:end_idx])
-                    else:
-                        actionability = {"can_handle": False}
-                except json.JSONDecodeError:
-                    actionability = {"can_handle": False}
-                
-                # If we can't handle it, mark as out of scope
-                if not actionability.get("can_handle", False):
-                    logger.info(f"Query cannot be handled by available agents: {actionability.get('reason', 'unknown')}")
-                    return {
-                        "scope": "out_of_scope",
-                        "out_of_scope": True,
-                        "agents": [],
-                        "workflow": "none",
-                        "actions": [],
-                        "data_flow": []
-                    }
-            except Exception as e:
-                logger.warning(f"Actionability check error: {str(e)}, continuing with analysis")
+        logger.info("Using LLM for combined scope and intent analysis")
+        try:
+            response = self._call_llm(COMBINED_CLASSIFICATION_PROMPT, raw_text)
+            logger.info(f"LLM response: {response[:200]}")
+        except Exception as e:
+            logger.error(f"LLM call error: {str(e)}, defaulting to medical_diagnosis")
+            self.intent_router.record("llm_fallback", INTENT_MEDICAL_DIAGNOSIS)
+            return INTENT_MEDICAL_DIAGNOSIS, False
 
-            prompt = f"""Medical chat query analysis - Be concise!
+        analysis = self._parse_json(response, {"is_health_related": False})
+        if not analysis.get("is_health_related", False) or not analysis.get("can_handle", False):
+            intent = INTENT_OUT_OF_SCOPE
+        elif analysis.get("intent") == INTENT_PATIENT_JOURNEY:
+            intent = INTENT_PATIENT_JOURNEY
+        else:
+            intent = INTENT_MEDICAL_DIAGNOSIS
+        self.intent_router.record(TIER_LLM, intent)
+        return intent, False
 
-User: "{raw_text}"
+    @staticmethod
+    def _is_journey_keyword_query(raw_text: str) -> bool:
+        """Check for explicit patient_journey keywords without LLM call"""
+        return any(keyword in raw_text.lower() for keyword in JOURNEY_KEYWORDS)
 
-Is this asking about THEIR medical history/past events (patient_journey) or CURRENT symptoms (medical_diagnosis)?
+    def _scope_result(self, scope_response: str) -> bool:
+        logger.info(f"Scope check response: {scope_response[:200]}")
+        scope_analysis = self._parse_json(scope_response, {"is_health_related": False})
+        return bool(scope_analysis.get("is_health_related", False))
 
-Respond with ONLY this JSON (no explanation):
-{{"intent": "patient_journey" or "medical_diagnosis"}}"""
+    def _actionability_result(self, actionability_response: str) -> bool:
+        logger.info(f"Actionability check: {actionability_response[:200]}")
+        actionability = self._parse_json(actionability_response, {"can_handle": False})
+        if not actionability.get("can_handle", False):
+            logger.info(f"Query cannot be handled by available agents: {actionability.get('reason', 'unknown')}")
+            return False
+        return True
 
-            # Get semantic analysis from LLM with timeout
-            import signal
-            
-            try:
-                response = self.llm(prompt)
-                logger.info(f"LLM response: {response[:200]}")
-            except Exception as e:
-                logger.error(f"LLM call error: {str(e)}, defaulting to medical_diagnosis")
-                response = '{"intent": "medical_diagnosis"}'
-            
-            try:
-                # Extract JSON from response
-                start_idx = response.find('{')
-                end_idx = response.rfind('}') + 1
-                if start_idx != -1 and end_idx != -1:
-                    analysis = json.loads(response[start_idx:end_idx])
-                else:
-                    raise ValueError("No valid JSON found")
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parse error: {str(e)}")
-                analysis = {"intent": "medical_diagnosis"}
-            
-            # Create MCP/ACL structure based on intent
-            intent = analysis.get("intent", "medical_diagnosis")
-            
-            if intent == "patient_journey":
-                # Extract patient_id from query
-                import re
-                patient_id = None
-                patterns = [
-                    r'patient\s+(?:id:?\s*)?([a-z]{0,3}\d+)',  # "patient pat1"
-                    r'for\s+(?:patient\s+)?([a-z]{0,3}\d+)',   # "for pat1"
-                    r'id:\s*([a-z]{0,3}\d+)',                  # "id: pat1"
-                ]
-                
-                for pattern in patterns:
-                    match = re.search(pattern, raw_text, re.IGNORECASE)
-                    if match:
-                        patient_id = match.group(1)
-                        logger.info(f"Extracted patient_id: {patient_id}")
+    def _intent_result(self, response: str) -> str:
+        logger.info(f"LLM response: {response[:200]}")
+        analysis = self._parse_json(response, {"intent": INTENT_MEDICAL_DIAGNOSIS})
+        return analysis.get("intent", INTENT_MEDICAL_DIAGNOSIS)
+
+    def _check_scope(self, raw_text: str) -> bool:
+        """Scope check: is the query about health topics? LLM errors count as in scope"""
+        logger.info("Performing scope check for health-related content")
+        try:
+            return self._scope_result(self._call_llm(SCOPE_CHECK_PROMPT, raw_text))
+        except Exception as e:
+            logger.warning(f"Scope check LLM error: {str(e)}, continuing with analysis")
+            return True
+
+    def _check_actionability(self, raw_text: str) -> bool:
+        """Check if this query is asking for something we CAN handle"""
+        try:
+            return self._actionability_result(self._call_llm(ACTIONABILITY_PROMPT, raw_text))
+        except Exception as e:
+            logger.warning(f"Actionability check error: {str(e)}, continuing with analysis")
+            return True
+
+    def _classify_intent(self, raw_text: str) -> str:
+        """patient_journey vs medical_diagnosis, defaulting to medical_diagnosis"""
+        try:
+            return self._intent_result(self._call_llm(INTENT_PROMPT, raw_text))
+        except Exception as e:
+            logger.error(f"LLM call error: {str(e)}, defaulting to medical_diagnosis")
+            return INTENT_MEDICAL_DIAGNOSIS
+
+    async def _acheck_scope(self, raw_text: str) -> bool:
+        logger.info("Performing scope check for health-related content")
+        try:
+            return self._scope_result(await self._acall_llm(SCOPE_CHECK_PROMPT, raw_text))
+        except Exception as e:
+            logger.warning(f"Scope check LLM error: {str(e)}, continuing with analysis")
+            return True
+
+    async def _acheck_actionability(self, raw_text: str) -> bool:
+        try:
+            return self._actionability_result(await self._acall_llm(ACTIONABILITY_PROMPT, raw_text))
+        except Exception as e:
+            logger.warning(f"Actionability check error: {str(e)}, continuing with analysis")
+            return True
+
+    async def _aclassify_intent(self, raw_text: str) -> str:
+        try:
+            return self._intent_result(await self._acall_llm(INTENT_PROMPT, raw_text))
+        except Exception as e:
+            logger.error(f"LLM call error: {str(e)}, defaulting to medical_diagnosis")
+            return INTENT_MEDICAL_DIAGNOSIS
+
+    def _classify_intent_sequential(self, raw_text: str) -> Tuple[str, bool]:
+        """Original flow used when the router is disabled: scope, keywords, actionability, intent"""
+        if not self.llm:
+            raise ValueError("LLM service not initialized")
+
+        if not self._check_scope(raw_text):
+            return INTENT_OUT_OF_SCOPE, False
+        if self._is_journey_keyword_query(raw_text):
+            logger.info("Direct patient_journey detection (no LLM needed)")
+            return INTENT_PATIENT_JOURNEY, True
+
+        logger.info("Using LLM for intent analysis")
+        if not self._check_actionability(raw_text):
+            return INTENT_OUT_OF_SCOPE, False
+        return self._classify_intent(raw_text), False
+
+    async def _classify_intent_concurrent(self, raw_text: str) -> Tuple[str, bool]:
+        """
+        Same decisions as _classify_intent_sequential, but the scope, actionability
+        and intent calls are issued together on the model's async API. The first gate
+        to report out of scope wins and the outstanding calls are cancelled, which
+        aborts their requests.
+        """
+        if not self.llm:
+            raise ValueError("LLM service not initialized")
+
+        keyword_match = self._is_journey_keyword_query(raw_text)
+        gates = {asyncio.create_task(self._acheck_scope(raw_text)): "scope"}
+        intent_task = None
+        if keyword_match:
+            logger.info("Direct patient_journey detection (no LLM needed)")
+        else:
+            logger.info("Using LLM for intent analysis")
+            gates[asyncio.create_task(self._acheck_actionability(raw_text))] = "actionability"
+            intent_task = asyncio.create_task(self._aclassify_intent(raw_text))
+
+        pending = set(gates)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.result():
+                        logger.info(f"{gates[task]} check reported out of scope, cancelling outstanding LLM calls")
+                        return INTENT_OUT_OF_SCOPE, False
+            if keyword_match:
+                return INTENT_PATIENT_JOURNEY, True
+            return await intent_task, False
+        finally:
+            for task in [*gates, intent_task]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @staticmethod
+    def _out_of_scope_mcp_acl() -> Dict[str, Any]:
+        return {
+            "scope": "out_of_scope",
+            "out_of_scope": True,
+            "agents": [],
+            "workflow": "none",
+            "actions": [],
+            "data_flow": []
+        }
+
+    def _extract_journey_patient_id(self, raw_text: str, user_id: str) -> str:
+        """Lenient patient_id extraction for keyword-detected journey queries"""
+        patient_id = None
+        mentioned_patient = None  # Track if user mentioned any patient-like string
+        
+        patterns = [
+            r'patient\s+(?:id:?\s*)?([a-z]{0,3}\d+)',  # "patient pat1" or "patient id: pat1"
+            r'for\s+(?:patient\s+)?([a-z]{0,3}\d+)',   # "for pat1"
+            r'id:\s*([a-z]{0,3}\d+)',                  # "id: pat1"
+            r'([a-z]{0,3}\d+)(?:\s|$)',                # standalone "pat1" followed by space or end
+            r'\b([a-z]{0,3}\d{1,})\b',                 # word boundary with at least 1 digit
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, raw_text.strip(), re.IGNORECASE)
+            if match:
+                extracted = match.group(1).lower()
+                # Validate it looks like a patient ID (starts with letters, ends with digits, minimum 1 digit)
+                if re.match(r'^[a-z]{0,3}\d{1,}$', extracted):
+                    patient_id = extracted
+                    logger.info(f"Extracted patient_id: {patient_id}")
+                    break
+        
+        # Also check if user mentioned patient-like strings (even incomplete)
+        # Look specifically for patterns that look like patient IDs: pat, p, pat without digits at end of query
+        if not patient_id:
+            # Search from end of string backwards to find potential patient identifiers
+            words = raw_text.strip().split()
+            for word in reversed(words):  # Start from end
+                word_lower = word.lower().strip('.,!?;:')
+                # Check if word looks like patient ID prefix (1-3 letters, optional digits)
+                if re.match(r'^[a-z]{1,3}\d*$', word_lower) and len(word_lower) <= 3:
+                    # If it's a common word, skip it
+                    if word_lower not in ['the', 'and', 'for', 'my', 'show', 'get', 'is', 'are', 'was', 'been', 'have', 'has', 'do', 'does', 'did', 'will', 'can', 'could', 'should', 'would', 'may', 'might', 'must', 'of', 'in', 'on', 'at', 'to', 'by', 'or', 'as', 'with', 'from', 'about', 'history', 'medical', 'patient', 'journey', 'timeline', 'past', 'appointment', 'treatment', 'medication', 'visit', 'result', 'record', 'me', 'you', 'he', 'she', 'we', 'it']:
+                        mentioned_patient = word_lower
+                        logger.info(f"User mentioned potential patient identifier from end: {mentioned_patient}")
                         break
-                
-                # Default to authenticated user or 'pat1'
-                if not patient_id:
-                    patient_id = user_id or 'pat1'
-                    logger.info(f"Using default patient_id: {patient_id}")
-                
-                mcp = MCPACL(
-                    agents=["patient_journey"],
-                    workflow="patient_journey_tracking",
-                    actions=[
-                        MCPACLAction(
-                            agent="patient_journey",
-                            action="get_journey",
-                            params={
-                                "patient_id": patient_id,
-                                "query_type": "general",
-                                "concepts": [],
-                                "original_query": raw_text
-                            }
-                        )
-                    ],
-                    data_flow=[]
-                )
+        
+        # Use extracted patient_id, or use mentioned string if it looks like incomplete patient ID
+        if not patient_id:
+            if mentioned_patient:
+                # User explicitly mentioned something like "pat" or "pat3" - use it literally
+                patient_id = mentioned_patient
+                logger.info(f"Using mentioned patient identifier: {patient_id}")
             else:
-                mcp = MCPACL(
-                    agents=["symptom_analyzer", "disease_prediction"],
-                    workflow="medical_diagnosis",
-                    actions=[
-                        MCPACLAction(
-                            agent="symptom_analyzer",
-                            action="analyze_symptoms",
-                            params={
-                                "symptoms_text": raw_text,
-                                "concepts": analysis.get("identified_concepts", []),
-                                "intent": "medical_diagnosis"
-                            }
-                        ),
-                        MCPACLAction(
-                            agent="disease_prediction",
-                            action="predict_disease",
-                            params={"symptoms": []}  # Will be populated from symptom_analyzer's output
-                        )
-                    ],
-                data_flow=[
-                    {
-                        "from": "symptom_analyzer",
-                        "to": "disease_prediction",
-                        "data": "structured_symptoms"
+                patient_id = user_id or 'pat1'
+                logger.info(f"Using default patient_id: {patient_id}")
+        return patient_id
+
+    def _extract_patient_id(self, raw_text: str, user_id: str) -> str:
+        """Strict patient_id extraction for LLM-classified journey queries"""
+        patient_id = None
+        patterns = [
+            r'patient\s+(?:id:?\s*)?([a-z]{0,3}\d+)',  # "patient pat1"
+            r'for\s+(?:patient\s+)?([a-z]{0,3}\d+)',   # "for pat1"
+            r'id:\s*([a-z]{0,3}\d+)',                  # "id: pat1"
+        ]
+        
+        for pattern in patterns:
+            match = re.search(pattern, raw_text, re.IGNORECASE)
+            if match:
+                patient_id = match.group(1)
+                logger.info(f"Extracted patient_id: {patient_id}")
+                break
+        
+        # Default to authenticated user or 'pat1'
+        if not patient_id:
+            patient_id = user_id or 'pat1'
+            logger.info(f"Using default patient_id: {patient_id}")
+        return patient_id
+
+    @staticmethod
+    def _journey_mcp_acl(raw_text: str, patient_id: str) -> MCPACL:
+        return MCPACL(
+            agents=["patient_journey"],
+            workflow="patient_journey_tracking",
+            actions=[
+                MCPACLAction(
+                    agent="patient_journey",
+                    action="get_journey",
+                    params={
+                        "patient_id": patient_id,
+                        "query_type": "general",
+                        "concepts": [],
+                        "original_query": raw_text
                     }
-                ]
-            )
-            
-            # Convert to dict and ensure "from" field is correct
-            result = mcp.model_dump()
-            for flow in result["data_flow"]:
-                # Fix the field name if needed
-                if "fr" in flow:
-                    flow["from"] = flow.pop("fr")
-            
-            return result
-        except Exception as e:
-            logger.error(f"Error generating MCP/ACL: {str(e)}")
-            raise
+                )
+            ],
+            data_flow=[]
+        )
+
+    @staticmethod
+    def _diagnosis_mcp_acl(raw_text: str) -> MCPACL:
+        return MCPACL(
+            agents=["symptom_analyzer", "disease_prediction"],
+            workflow="medical_diagnosis",
+            actions=[
+                MCPACLAction(
+                    agent="symptom_analyzer",
+                    action="analyze_symptoms",
+                    params={
+                        "symptoms_text": raw_text,
+                        "concepts": [],
+                        "intent": "medical_diagnosis"
+                    }
+                ),
+                MCPACLAction(
+                    agent="disease_prediction",
+                    action="predict_disease",
+                    params={"symptoms": []}  # Will be populated from symptom_analyzer's output
+                )
+            ],
+            data_flow=[
+                {
+                    "from": "symptom_analyzer",
+                    "to": "disease_prediction",
+                    "data": "structured_symptoms"
+                }
+            ]
+        )
 
     def validate_mcp_acl_format(self, mcp_acl: Dict[str, Any]) -> bool:
         """Validate MCP/ACL format using Pydantic model"""
@@ -0,0 +1,82 @@
+from typing import Dict, Any
+import logging
+
+from services.enrichment_service import EnrichmentService
+from services.llm_service import LLMService
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class PromptProcessingError(Exception):
+    """Raised when a pipeline stage fails; carries the HTTP status to report"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class PromptPipeline:
+    """
+    Enrichment -> MCP/ACL generation -> format validation for one prompt.
+    Used by the prompt processor service and, in-process, by the orchestrator.
+    """
+    def __init__(self, enrichment_service: EnrichmentService, llm_service: LLMService):
+        self.enrichment_service = enrichment_service
+        self.llm_service = llm_service
+
+    def process(self, prompt: str, user_id: str, session_id: str, workflow: str) -> Dict[str, Any]:
+        enriched_data = self._enrich(prompt, user_id, session_id, workflow)
+
+        # Step 2: Generate MCP/ACL via LLM
+        try:
+            logger.info("Generating MCP/ACL structure...")
+            mcp_acl = self.llm_service.generate_mcp_acl(enriched_data)
+            logger.info("MCP/ACL generation successful")
+            logger.debug(f"Generated MCP/ACL: {mcp_acl}")
+        except Exception as llm_error:
+            logger.error(f"LLM service error: {str(llm_error)}", exc_info=True)
+            raise PromptProcessingError(500, f"LLM service error: {str(llm_error)}")
+
+        return self._validate(mcp_acl)
+
+    async def process_async(self, prompt: str, user_id: str, session_id: str, workflow: str) -> Dict[str, Any]:
+        """Same stages as process, with the LLM calls issued concurrently off the event loop"""
+        enriched_data = self._enrich(prompt, user_id, session_id, workflow)
+
+        # Step 2: Generate MCP/ACL via LLM
+        try:
+            logger.info("Generating MCP/ACL structure...")
+            mcp_acl = await self.llm_service.generate_mcp_acl_async(enriched_data)
+            logger.info("MCP/ACL generation successful")
+            logger.debug(f"Generated MCP/ACL: {mcp_acl}")
+        except Exception as llm_error:
+            logger.error(f"LLM service error: {str(llm_error)}", exc_info=True)
+            raise PromptProcessingError(500, f"LLM service error: {str(llm_error)}")
+
+        return self._validate(mcp_acl)
+
+    def _enrich(self, prompt: str, user_id: str, session_id: str, workflow: str) -> Dict[str, Any]:
+        # Step 1: Enrich data
+        try:
+            enriched_data = self.enrichment_service.enrich_prompt(
+                prompt=prompt,
+                user_id=user_id,
+                session_id=session_id,
+                workflow=workflow
+            )
+            logger.info("Data enrichment successful")
+            logger.debug(f"Enriched data: {enriched_data}")
+            return enriched_data
+        except Exception as enrich_error:
+            logger.error(f"Enrichment error: {str(enrich_error)}", exc_info=True)
+            raise PromptProcessingError(500, f"Data enrichment failed: {str(enrich_error)}")
+
+    def _validate(self, mcp_acl: Dict[str, Any]) -> Dict[str, Any]:
+        # Step 3: Validate LLM output format
+        logger.info("Validating MCP/ACL format...")
+        if not self.llm_service.validate_mcp_acl_format(mcp_acl):
+            error_msg = "LLM generated invalid MCP/ACL format"
+            logger.error(error_msg)
+            raise PromptProcessingError(400, error_msg)
+        logger.info("MCP/ACL validation successful")
+
+        return mcp_acl
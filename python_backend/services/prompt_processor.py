@@ -4,6 +4,7 @@ from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from services.enrichment_service import EnrichmentService
 from services.llm_service import LLMService
+from services.prompt_pipeline import PromptPipeline, PromptProcessingError
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +23,7 @@ async def health_check():
 # Initialize services
 enrichment_service = EnrichmentService()
 llm_service = LLMService()
+prompt_pipeline = PromptPipeline(enrichment_service, llm_service)
 
 class PromptInput(BaseModel):
     prompt: str
@@ -45,41 +47,15 @@ async def process_prompt(request: Request, input_data: PromptInput):
         logger.info(f"Processing prompt: {input_data.prompt}")
         logger.info(f"User ID: {input_data.user_id}, Session: {input_data.session_id}")
         
-        # Step 1: Enrich data
         try:
-            enriched_data = enrichment_service.enrich_prompt(
+            mcp_acl = await prompt_pipeline.process_async(
                 prompt=input_data.prompt,
                 user_id=input_data.user_id,
                 session_id=input_data.session_id,
                 workflow=input_data.workflow
             )
-            logger.info("Data enrichment successful")
-            logger.debug(f"Enriched data: {enriched_data}")
-        except Exception as enrich_error:
-            logger.error(f"Enrichment error: {str(enrich_error)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Data enrichment failed: {str(enrich_error)}")
-        
-        # Step 2: Generate MCP/ACL via LLM
-        try:
-            logger.info("Generating MCP/ACL structure...")
-            mcp_acl = llm_service.generate_mcp_acl(enriched_data)
-            logger.info("MCP/ACL generation successful")
-            logger.debug(f"Generated MCP/ACL: {mcp_acl}")
-        except Exception as llm_error:
-            logger.error(f"LLM service error: {str(llm_error)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"LLM service error: {str(llm_error)}")
-        
-        # Step 3: Validate LLM output format
-        try:
-            logger.info("Validating MCP/ACL format...")
-            if not llm_service.validate_mcp_acl_format(mcp_acl):
-                error_msg = "LLM generated invalid MCP/ACL format"
-                logger.error(error_msg)
-                raise HTTPException(status_code=400, detail=error_msg)
-            logger.info("MCP/ACL validation successful")
-        except Exception as validate_error:
-            logger.error(f"Validation error: {str(validate_error)}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"MCP/ACL validation failed: {str(validate_error)}")
+        except PromptProcessingError as pipeline_error:
+            raise HTTPException(status_code=pipeline_error.status_code, detail=pipeline_error.detail)
         
         logger.info("Request processing completed successfully")
         return {"mcp_acl": mcp_acl}
@@ -88,4 +64,12 @@ async def process_prompt(request: Request, input_data: PromptInput):
         raise
     except Exception as e:
         logger.error(f"Error in process_prompt: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics")
+async def metrics():
+    """Intent routing hit rates per tier and LLM cache statistics"""
+    return {
+        "intent_router": llm_service.intent_router.stats() if llm_service.intent_router else None,
+        "llm_cache": llm_service.llm_cache.stats()
+    }
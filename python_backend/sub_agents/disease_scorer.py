@@ -0,0 +1,182 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import logging
+
+from ontology.symptom_ontology import OntologySnapshot, SEVERITY_LEVELS, symptom_ontology
+
+# NumPy / SciPy imports
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Weight of a symptom reported without a severity score (same default as the analyzer's severity weights)
+DEFAULT_SYMPTOM_WEIGHT = 0.5
+
+SymptomInput = Union[Dict[str, float], Sequence[str]]
+
+class DiseaseScorer:
+    """
+    Scores symptom vectors against every condition with one sparse matrix product.
+    For each severity level the ontology rules give a condition x symptom association
+    matrix: a combination rule spreads weight 1 over its symptoms, a group rule weight 1
+    over its members. A patient's symptoms (canonical names, weighted by the analyzer's
+    severity scores) form a column vector and W @ x scores all conditions at once.
+    score is that severity-weighted sum: each rule adds up to its symptoms' weights, so
+    a condition reached through several rules can score above 1. confidence is the
+    share of a condition's total association weight whose symptoms are present,
+    counted on presence alone (W @ 1[x > 0]), so it lies in [0, 1] and a patient with
+    every symptom of a condition's rules gets 1 whatever the severity weights.
+    """
+    def __init__(self, ontology: OntologySnapshot):
+        if np is None or sparse is None:
+            raise ImportError("numpy and scipy are required for DiseaseScorer")
+        self.ontology = ontology
+        self.symptom_index: Dict[str, int] = {}
+        self.condition_index: Dict[str, int] = {}
+
+        associations: Dict[str, List[Tuple[int, int, float]]] = {level: [] for level in SEVERITY_LEVELS}
+        rules = [(combo, conditions) for combo, conditions in ontology.combinations]
+        rules += [(group["symptoms"], group["conditions"]) for group in ontology.groups.values()]
+        for symptoms, conditions in rules:
+            columns = sorted({self._column(s) for s in symptoms})
+            weight = 1.0 / len(columns)
+            for level in SEVERITY_LEVELS:
+                for condition in conditions[level]:
+                    row = self.condition_index.setdefault(condition, len(self.condition_index))
+                    associations[level].extend((row, column, weight) for column in columns)
+
+        self.symptoms = list(self.symptom_index)
+        # Input term -> column, covering the ontology's synonyms
+        self._lookup = dict(self.symptom_index)
+        for synonym, canonical in ontology.synonyms.items():
+            if canonical in self.symptom_index:
+                self._lookup.setdefault(synonym, self.symptom_index[canonical])
+        self.conditions = list(self.condition_index)
+        self.matrices: Dict[str, Any] = {}
+        self.row_totals: Dict[str, Any] = {}
+        shape = (len(self.conditions), len(self.symptoms))
+        for level, entries in associations.items():
+            rows, columns, weights = zip(*entries) if entries else ((), (), ())
+            # Duplicate (row, column) pairs are summed on conversion
+            matrix = sparse.coo_matrix((weights, (rows, columns)), shape=shape, dtype=np.float64).tocsr()
+            self.matrices[level] = matrix
+            self.row_totals[level] = np.asarray(matrix.sum(axis=1)).ravel()
+        logger.info(f"Built disease scoring matrices: {len(self.conditions)} conditions x {len(self.symptoms)} symptoms")
+
+    def _column(self, symptom: str) -> int:
+        canonical = self.ontology.canonical(symptom) or symptom.lower()
+        return self.symptom_index.setdefault(canonical, len(self.symptom_index))
+
+    def _vectorize(self, patients: Sequence[SymptomInput]):
+        """Symptom x patient sparse matrix; unknown symptoms are ignored"""
+        rows, columns, values = [], [], []
+        for column, symptoms in enumerate(patients):
+            weights = symptoms if isinstance(symptoms, dict) else dict.fromkeys(symptoms, 1.0)
+            merged: Dict[int, float] = {}
+            for symptom, weight in weights.items():
+                row = self._lookup.get(symptom)
+                if row is None:
+                    row = self._lookup.get(symptom.strip().lower())
+                if row is not None:
+                    merged[row] = max(merged.get(row, 0.0), weight if weight > 0 else DEFAULT_SYMPTOM_WEIGHT)
+            rows.extend(merged)
+            values.extend(merged.values())
+            columns.extend([column] * len(merged))
+        return sparse.csc_matrix((values, (rows, columns)), shape=(len(self.symptoms), len(patients)))
+
+    def _top_k(self, scores, matched, totals, top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k conditions per row of a sparse patient x condition score matrix, ranked by
+        score; matched holds the presence-only products the confidences come from
+        """
+        scores = scores.tocsr()
+        scores.eliminate_zeros()
+        patients = scores.shape[0]
+        patient_rows = np.repeat(np.arange(patients), np.diff(scores.indptr))
+        # Highest score first; ties go to the condition listed first in the ontology
+        order = np.lexsort((scores.indices, -scores.data, patient_rows))
+        patient_rows, condition_rows, values = patient_rows[order], scores.indices[order], scores.data[order]
+        # Rows stay grouped, so the rank within a patient is the offset from its first entry
+        keep = (np.arange(len(order)) - scores.indptr[patient_rows] < max(top_k, 0)) & (values > 0)
+        patient_rows, condition_rows, values = patient_rows[keep], condition_rows[keep], values[keep]
+        matched_values = np.asarray(matched.tocsr()[patient_rows, condition_rows]).ravel()
+        confidences = np.minimum(matched_values / totals[condition_rows], 1.0)
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(patient_rows, minlength=patients)))).tolist()
+
+        conditions = self.conditions
+        rows, values, confidences = condition_rows.tolist(), values.tolist(), confidences.tolist()
+        return [
+            [
+                {"condition": conditions[rows[i]], "score": round(values[i], 4), "confidence": round(confidences[i], 4)}
+                for i in range(bounds[p], bounds[p + 1])
+            ]
+            for p in range(patients)
+        ]
+
+    def score(self, symptoms: SymptomInput, severity_level: Optional[str] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k conditions for one patient"""
+        return self.score_batch([symptoms], severity_level, top_k)[0]
+
+    def score_batch(self, patients: Sequence[SymptomInput],
+                    severity_levels: Union[Optional[str], Sequence[Optional[str]]] = None,
+                    top_k: int = 5, chunk_size: int = 1024) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k conditions for many patients. Patients are grouped by severity level and
+        scored chunk_size at a time, one sparse product per chunk; the product stays
+        sparse, so ranking only touches the conditions a patient actually scored on.
+        """
+        if severity_levels is None or isinstance(severity_levels, str):
+            severity_levels = [severity_levels] * len(patients)
+        by_level: Dict[str, List[int]] = {}
+        for position, level in enumerate(severity_levels):
+            level = level or 'medium'
+            if level not in self.matrices:
+                raise ValueError(f"Unknown severity level: {level}")
+            by_level.setdefault(level, []).append(position)
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in patients]
+        for level, positions in by_level.items():
+            for start in range(0, len(positions), chunk_size):
+                chunk = positions[start:start + chunk_size]
+                weighted = self._vectorize([patients[p] for p in chunk])
+                present = weighted.copy()
+                present.data = np.ones_like(present.data)
+                scores = (self.matrices[level] @ weighted).T
+                matched = (self.matrices[level] @ present).T
+                ranked_chunk = self._top_k(scores, matched, self.row_totals[level], top_k)
+                for position, ranked in zip(chunk, ranked_chunk):
+                    results[position] = ranked
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "conditions": len(self.conditions),
+            "symptoms": len(self.symptoms),
+            "nonzero": {level: int(matrix.nnz) for level, matrix in self.matrices.items()}
+        }
+
+_compiled: Tuple[Optional[OntologySnapshot], Optional[DiseaseScorer]] = (None, None)
+_compile_lock = threading.Lock()
+
+def get_disease_scorer() -> Optional[DiseaseScorer]:
+    """
+    Scorer for the current ontology snapshot, rebuilt after a hot reload.
+    None when numpy/scipy are not installed.
+    """
+    global _compiled
+    if np is None or sparse is None:
+        return None
+    snapshot = symptom_ontology.snapshot()
+    compiled_for, scorer = _compiled
+    if compiled_for is snapshot:
+        return scorer
+    with _compile_lock:
+        if _compiled[0] is not snapshot:
+            _compiled = (snapshot, DiseaseScorer(snapshot))
+        return _compiled[1]
@@ -1,6 +1,8 @@
-
 import requests
 
+from sub_agents.rule_engine import get_rule_engine
+from sub_agents.disease_scorer import get_disease_scorer
+
 class DomainLogic:
     """Executes the core business logic (e.g., disease prediction, journey tracking)."""
     def extract_fhir_data_from_context(self, semantic_context):
@@ -36,99 +38,40 @@ class DomainLogic:
             print(f"Error extracting FHIR data from context: {str(e)}")
             return {'symptoms': [], 'severity_level': 'medium'}
 
-    def determine_conditions(self, symptoms, severity_level=None):
+    def determine_conditions(self, symptoms, severity_level=None, rule_engine=None):
         """Helper function to determine possible conditions based on symptoms and severity"""
         print(f"determine_conditions called with symptoms: {symptoms}, severity: {severity_level}")
-        conditions = []
-        confidence = 0.5
+        # Rules come from the shared ontology, compiled once per ontology version
+        conditions, confidence = (rule_engine or get_rule_engine()).evaluate(symptoms, severity_level)
+        return conditions, confidence  # Ranked, most supported first; confidence capped at 0.95
 
-        # Define specific symptom combinations
-        symptom_patterns = {
-            ('headache', 'nausea'): {
-                'low': ['Migraine', 'Tension Headache'],
-                'medium': ['Migraine with Aura'],
-                'high': ['Severe Migraine', 'Chronic Migraine']
-            },
-            ('headache', 'fever'): {
-                'low': ['Viral Infection'],
-                'medium': ['Flu', 'Sinus Infection'],
-                'high': ['Meningitis']
-            },
-            ('nausea', 'stomach pain'): {
-                'low': ['Gastritis'],
-                'medium': ['Food Poisoning'],
-                'high': ['Appendicitis']
-            }
-        }
+    def score_conditions(self, symptoms, severity_level=None, top_k=5):
+        """Top-k conditions with confidences from the vectorized scorer (symptoms: list or symptom -> severity weight)"""
+        return self.score_conditions_batch([symptoms], severity_level, top_k)[0]
 
-        # Common symptom groups and their associated conditions
-        symptom_groups = {
-            'headache_related': {
-                'symptoms': ['headache', 'head pain', 'migraine'],
-                'conditions': {
-                    'low': ['Tension Headache', 'Mild Migraine'],
-                    'medium': ['Migraine', 'Sinus Headache'],
-                    'high': ['Severe Migraine', 'Cluster Headache']
-                }
-            },
-            'respiratory': {
-                'symptoms': ['cough', 'sore throat', 'runny nose', 'congestion'],
-                'conditions': {
-                    'low': ['Common Cold'],
-                    'medium': ['Flu', 'Bronchitis'],
-                    'high': ['Pneumonia', 'COVID-19']
-                }
-            },
-            'gastrointestinal': {
-                'symptoms': ['nausea', 'vomiting', 'diarrhea', 'stomach pain'],
-                'conditions': {
-                    'low': ['Gastritis', 'Food Sensitivity'],
-                    'medium': ['Food Poisoning', 'Gastroenteritis'],
-                    'high': ['Appendicitis', 'Severe Food Poisoning']
-                }
-            },
-            'fever_related': {
-                'symptoms': ['fever', 'chills', 'sweating', 'fatigue'],
-                'conditions': {
-                    'low': ['Viral Infection', 'Common Cold'],
-                    'medium': ['Flu', 'Bacterial Infection'],
-                    'high': ['Severe Infection', 'COVID-19']
-                }
-            }
-        }
+    def score_conditions_batch(self, patients, severity_levels=None, top_k=5):
+        """Scores many patients' symptom vectors against all conditions at once"""
+        scorer = get_disease_scorer()
+        if scorer is None:
+            raise RuntimeError("Vectorized scoring requires numpy and scipy")
+        return scorer.score_batch(patients, severity_levels, top_k)
 
-        # Convert symptoms to lowercase for matching
-        symptoms_lower = set(s.lower() for s in symptoms)
-        
-        # First check for specific symptom combinations
-        for symptom_combo, severity_conditions in symptom_patterns.items():
-            if all(s in symptoms_lower for s in symptom_combo):
-                severity = severity_level or 'medium'
-                conditions.extend(severity_conditions[severity])
-                confidence = 0.8  # Higher confidence for known symptom patterns
-                if severity_level == 'high':
-                    confidence = 0.9
-        
-        # If no combination matches, check individual symptom groups
-        if not conditions:
-            matched_groups = []
-            for group_name, group_data in symptom_groups.items():
-                if any(s in symptoms_lower for s in group_data['symptoms']):
-                    matched_groups.append(group_name)
-                    # Add conditions based on severity
-                    severity = severity_level or 'medium'
-                    conditions.extend(group_data['conditions'][severity])
-            
-            # Adjust confidence based on matches
-            if matched_groups:
-                # More matched groups = higher confidence
-                confidence = 0.6 + (len(matched_groups) * 0.1)  # 0.7 for 1 group, 0.8 for 2, etc.
-                if severity_level == 'high':
-                    confidence += 0.1  # Higher confidence for severe cases
-        
-        return list(set(conditions)), min(confidence, 0.95)  # Cap confidence at 0.95
+    def predict_disease_batch(self, params_list):
+        """
+        Predicts for many requests against one compiled rule set (a reload mid-batch
+        does not mix rule versions). A failing item gets an 'error' entry instead of a result.
+        """
+        rule_engine = get_rule_engine()
+        results = []
+        for params in params_list:
+            try:
+                results.append(self.predict_disease(params, rule_engine))
+            except Exception as e:
+                print(f"Error predicting disease for batch item: {str(e)}")
+                results.append({'error': str(e)})
+        return results
 
-    def predict_disease(self, params):
+    def predict_disease(self, params, rule_engine=None):
         """Main prediction function that uses FHIR data from semantic context"""
         print(f"Domain Logic received params: {params}")
         
@@ -160,7 +103,7 @@ class DomainLogic:
             }
 
         # Get predictions using the helper function
-        predicted_diseases, confidence = self.determine_conditions(symptoms, severity_level)
+        predicted_diseases, confidence = self.determine_conditions(symptoms, severity_level, rule_engine)
         
         # If no predictions, return unknown
         if not predicted_diseases:
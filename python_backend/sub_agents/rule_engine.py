@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+from itertools import combinations as subsets
+from math import comb
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import logging
+
+from ontology.symptom_ontology import OntologySnapshot, symptom_ontology
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Optional precomputed (symptom set, severity) -> prediction table, rebuilt with the rules
+LOOKUP_TABLE_ENABLED = os.getenv("RULE_LOOKUP_TABLE_ENABLED", "false").lower() == "true"
+LOOKUP_MAX_SYMPTOMS = int(os.getenv("RULE_LOOKUP_MAX_SYMPTOMS", "4"))
+LOOKUP_MAX_ENTRIES = int(os.getenv("RULE_LOOKUP_MAX_ENTRIES", "200000"))
+LOOKUP_SEVERITIES = ("low", "medium", "high")
+
+LookupKey = Tuple[FrozenSet[str], str]
+
+class CompiledRule:
+    """A combination or group rule with its symptoms as a bitmask"""
+    __slots__ = ("name", "kind", "mask", "size", "conditions", "order")
+
+    def __init__(self, name: str, kind: str, mask: int, size: int, conditions: Dict[str, List[str]], order: int):
+        self.name = name
+        self.kind = kind
+        self.mask = mask
+        self.size = size
+        self.conditions = conditions
+        self.order = order
+
+class RuleEngine:
+    """
+    Condition rules from the symptom ontology, compiled once per ontology version.
+    Every symptom named by a rule gets a bit; a combination rule fires when all of its
+    bits are set in the input mask, a group rule when any of them is. An inverted index
+    from symptom to rules means only rules sharing a symptom with the input are tested,
+    so the cost of a prediction follows the input size, not the size of the knowledge base.
+    """
+    def __init__(self, ontology: OntologySnapshot):
+        self.ontology = ontology
+        self.symptom_bits: Dict[str, int] = {}
+        self.combinations: List[CompiledRule] = []
+        self.groups: List[CompiledRule] = []
+        self._combination_index: Dict[str, List[CompiledRule]] = {}
+        self._group_index: Dict[str, List[CompiledRule]] = {}
+        self.lookup: Optional[MappingProxyType] = None
+        self.lookup_build_ms = 0.0
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+
+        for order, (combo, conditions) in enumerate(ontology.combinations):
+            rule = self._compile(" + ".join(combo), "combination", combo, conditions, order)
+            self.combinations.append(rule)
+            for symptom in set(combo):
+                self._combination_index.setdefault(symptom, []).append(rule)
+        for order, (name, group) in enumerate(ontology.groups.items()):
+            rule = self._compile(name, "group", group["symptoms"], group["conditions"], order)
+            self.groups.append(rule)
+            for symptom in set(group["symptoms"]):
+                self._group_index.setdefault(symptom, []).append(rule)
+        logger.info(f"Compiled rule engine: {len(self.combinations)} combinations, "
+                    f"{len(self.groups)} groups over {len(self.symptom_bits)} symptoms")
+
+    def _compile(self, name: str, kind: str, symptoms: Iterable[str],
+                 conditions: Dict[str, List[str]], order: int) -> CompiledRule:
+        mask = 0
+        for symptom in symptoms:
+            mask |= 1 << self.symptom_bits.setdefault(symptom, len(self.symptom_bits))
+        return CompiledRule(name, kind, mask, bin(mask).count("1"), conditions, order)
+
+    def normalize(self, symptoms: Iterable[str]) -> set:
+        """Lowercased symptoms plus the canonical names of known synonyms"""
+        symptoms_lower = {s.lower() for s in symptoms}
+        return symptoms_lower | ({self.ontology.canonical(s) for s in symptoms_lower} - {None})
+
+    def terms(self, symptoms: Iterable[str]) -> FrozenSet[str]:
+        """The input symptoms the rules know about; predictions depend on nothing else"""
+        return frozenset(s for s in self.normalize(symptoms) if s in self.symptom_bits)
+
+    def match(self, symptoms: Iterable[str]) -> Tuple[List[CompiledRule], List[CompiledRule]]:
+        """Fired combination rules, and the group rules that apply, each in knowledge-base order"""
+        return self._match_terms(self.terms(symptoms))
+
+    def _match_terms(self, terms: FrozenSet[str]) -> Tuple[List[CompiledRule], List[CompiledRule]]:
+        mask = 0
+        for symptom in terms:
+            mask |= 1 << self.symptom_bits[symptom]
+
+        combinations = {id(rule): rule for s in terms for rule in self._combination_index.get(s, [])
+                        if rule.mask & mask == rule.mask}
+        groups = {id(rule): rule for s in terms for rule in self._group_index.get(s, [])}
+        return (sorted(combinations.values(), key=lambda rule: rule.order),
+                sorted(groups.values(), key=lambda rule: rule.order))
+
+    def evaluate(self, symptoms: Iterable[str], severity_level: Optional[str] = None) -> Tuple[List[str], float]:
+        """
+        Ranked conditions and confidence for a symptom set. Combination rules take
+        precedence; group rules are only used when no combination fires. Conditions
+        backed by more (and more specific) rules rank first, ties keep rule order.
+        """
+        terms = self.terms(symptoms)
+        if self.lookup is not None:
+            # None and 'medium' evaluate identically
+            cached = self.lookup.get((terms, severity_level or 'medium'))
+            if cached is not None:
+                self.lookup_hits += 1
+                return list(cached[0]), cached[1]
+            self.lookup_misses += 1
+        conditions, confidence = self._evaluate_terms(terms, severity_level)
+        return list(conditions), confidence
+
+    def _evaluate_terms(self, terms: FrozenSet[str], severity_level: Optional[str]) -> Tuple[Tuple[str, ...], float]:
+        severity = severity_level or 'medium'
+        combinations, groups = self._match_terms(terms)
+        confidence = 0.5
+        if combinations:
+            fired = combinations
+            confidence = 0.9 if severity_level == 'high' else 0.8
+        else:
+            fired = groups
+            if groups:
+                # More matched groups = higher confidence
+                confidence = 0.6 + (len(groups) * 0.1)
+                if severity_level == 'high':
+                    confidence += 0.1
+
+        scores: Dict[str, List[int]] = {}
+        for rule in fired:
+            for condition in rule.conditions[severity]:
+                score = scores.setdefault(condition, [0, len(scores)])
+                score[0] += rule.size if rule.kind == "combination" else 1
+        ranked = sorted(scores, key=lambda condition: (-scores[condition][0], scores[condition][1]))
+        return tuple(ranked), min(confidence, 0.95)
+
+    def reachable_term_sets(self, max_symptoms: int) -> Iterable[FrozenSet[str]]:
+        """
+        Every symptom set of up to max_symptoms rule symptoms that an input can produce.
+        normalize() always adds the canonical name of a synonym, so a set holding a
+        synonym without its canonical symptom can never occur and is skipped.
+        """
+        vocabulary = sorted(self.symptom_bits)
+        closure = {s: self.ontology.canonical(s) for s in vocabulary}
+        for size in range(max_symptoms + 1):
+            for combo in subsets(vocabulary, size):
+                terms = frozenset(combo)
+                if all(closure[s] is None or closure[s] not in self.symptom_bits or closure[s] in terms for s in terms):
+                    yield terms
+
+    def build_lookup_table(self, max_symptoms: int = LOOKUP_MAX_SYMPTOMS,
+                           max_entries: int = LOOKUP_MAX_ENTRIES) -> int:
+        """
+        Precomputes predictions for every reachable (symptom set, severity) key, lowering
+        max_symptoms until the table fits in max_entries. Inputs with more rule symptoms
+        than that fall back to live evaluation. Returns the number of entries.
+        """
+        started = time.perf_counter()
+        vocabulary = len(self.symptom_bits)
+        while max_symptoms > 0 and len(LOOKUP_SEVERITIES) * sum(
+                comb(vocabulary, size) for size in range(max_symptoms + 1)) > max_entries:
+            max_symptoms -= 1
+        table: Dict[LookupKey, Tuple[Tuple[str, ...], float]] = {}
+        for terms in self.reachable_term_sets(max_symptoms):
+            for severity in LOOKUP_SEVERITIES:
+                table[(terms, severity)] = self._evaluate_terms(terms, severity)
+        self.lookup = MappingProxyType(table)
+        self.lookup_build_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Built prediction lookup table: {len(table)} keys (up to {max_symptoms} symptoms) "
+                    f"in {self.lookup_build_ms:.1f} ms")
+        return len(table)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "combinations": len(self.combinations),
+            "groups": len(self.groups),
+            "symptoms": len(self.symptom_bits),
+            "lookup_entries": len(self.lookup) if self.lookup is not None else None,
+            "lookup_build_ms": round(self.lookup_build_ms, 1),
+            "lookup_hits": self.lookup_hits,
+            "lookup_misses": self.lookup_misses
+        }
+
+_compiled: Tuple[Optional[OntologySnapshot], Optional[RuleEngine]] = (None, None)
+_compile_lock = threading.Lock()
+
+def get_rule_engine() -> RuleEngine:
+    """
+    Rule engine for the current ontology snapshot, recompiled (lookup table included)
+    after a hot reload
+    """
+    global _compiled
+    snapshot = symptom_ontology.snapshot()
+    compiled_for, engine = _compiled
+    if compiled_for is snapshot:
+        return engine
+    with _compile_lock:
+        if _compiled[0] is not snapshot:
+            engine = RuleEngine(snapshot)
+            if LOOKUP_TABLE_ENABLED:
+                engine.build_lookup_table()
+            _compiled = (snapshot, engine)
+        return _compiled[1]
@@ -0,0 +1,130 @@
+import pytest
+
+from common import sqlite_store, ttl_cache
+from common.sqlite_store import SQLiteKVStore
+from common.ttl_cache import TTLCache
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    cache = TTLCache(default_ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("default", 2)
+    cache.set("also_default", 3, ttl=None)
+
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get_entry("default") == (2, 5)
+
+    clock.now += 10
+    assert cache.purge_expired() == 2
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 3
+
+def test_ttl_cache_without_default_ttl_keeps_entries(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    cache = TTLCache()
+    cache.set("a", 1)
+    clock.now += 10 ** 6
+    assert cache.get("a") == 1
+
+def test_ttl_cache_evicts_by_size_but_keeps_the_newest_entry():
+    cache = TTLCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 8
+
+    cache.set("big", "x" * 50)
+    assert len(cache) == 1 and cache.get("big") == "x" * 50
+
+def test_ttl_cache_resize_after_in_place_change():
+    cache = TTLCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", ["x"])
+    cache.set("b", ["y"])
+    cache.get("b").extend(["y"] * 9)
+    assert cache.resize("b")
+    assert "a" not in cache
+    assert cache.resize("missing") is False
+
+def test_ttl_cache_hit_ratio():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    assert "a" in cache  # membership checks are not counted
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+def test_sqlite_store_round_trip_and_expiry(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sqlite_store.time, "time", clock)
+    store = SQLiteKVStore(str(tmp_path / "kv.db"))
+    try:
+        store.set("a", {"symptoms": ["fever"]}, ttl=10)
+        store.set("b", [1, 2])
+        assert store.get("a") == {"symptoms": ["fever"]}
+
+        clock.now += 11
+        assert store.get("a") is None
+        assert store.get("b") == [1, 2]
+        assert store.purge_expired() == 1
+        assert store.delete("b") and not store.delete("b")
+        assert store.stats()["entries"] == 0
+    finally:
+        store.close()
+
+def test_sqlite_store_trims_oldest_writes(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sqlite_store.time, "time", clock)
+    store = SQLiteKVStore(str(tmp_path / "kv.db"), max_entries=2)
+    try:
+        for key in ("a", "b", "c"):
+            clock.now += 1
+            store.set(key, key)
+        assert store.get("a") is None
+        assert store.get("b") == "b" and store.get("c") == "c"
+        assert store.stats()["evictions"] == 1
+
+        # Expired rows are dropped before anything live is evicted
+        clock.now += 1
+        store.set("short", 1, ttl=1)
+        clock.now += 2
+        store.set("d", "d")
+        assert store.get("c") == "c" and store.get("d") == "d"
+    finally:
+        store.close()
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "kv.db")
+    writer, reader = SQLiteKVStore(path), SQLiteKVStore(path)
+    try:
+        writer.set("key", "value")
+        assert reader.get("key") == "value"
+    finally:
+        writer.close()
+        reader.close()
+
+def test_sqlite_store_rejects_bad_table_name(tmp_path):
+    with pytest.raises(ValueError):
+        SQLiteKVStore(str(tmp_path / "kv.db"), table="kv; DROP TABLE x")
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from agents.symptom_analyzer.fhir_bundle_stream import BundleStreamReader
+
+BUNDLE = {
+    "resourceType": "Bundle",
+    "type": "searchset",
+    "total": 1234,
+    "entry": [
+        {"resource": {"resourceType": "Observation", "id": str(i),
+                      "code": {"text": "maux de tête – céphalée 头痛"}, "valueQuantity": {"value": 38.5 + i}}}
+        for i in range(5)
+    ],
+    "link": [{"relation": "self", "url": "/Patient/p1/Observation"},
+             {"relation": "next", "url": "/Patient/p1/Observation?page=2"}]
+}
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def read_all(chunks):
+    reader = BundleStreamReader(chunks)
+    return reader, list(reader.entries())
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10 ** 6])
+def test_any_chunking_gives_the_same_bundle(size):
+    data = json.dumps(BUNDLE, ensure_ascii=False).encode("utf-8")
+    reader, entries = read_all(chunked(data, size))
+    assert entries == BUNDLE["entry"]
+    assert reader.entry_count == 5
+    assert reader.fields == {k: v for k, v in BUNDLE.items() if k != "entry"}
+    assert reader.next_link() == "/Patient/p1/Observation?page=2"
+
+def test_str_chunks_and_whitespace():
+    text = json.dumps(BUNDLE, indent=2)
+    _, entries = read_all(chunked(text, 5))
+    assert entries == BUNDLE["entry"]
+
+def test_number_split_across_chunks_is_not_cut_short():
+    reader, entries = read_all([b'{"total": 12', b'34, "entry": []}'])
+    assert entries == []
+    assert reader.fields["total"] == 1234
+
+@pytest.mark.parametrize("data", [b"{}", b'{"entry": []}', b'  {"resourceType": "Bundle"}  '])
+def test_bundles_without_entries(data):
+    reader, entries = read_all([data])
+    assert entries == []
+    assert reader.next_link() is None
+
+def test_entries_are_yielded_before_the_stream_ends():
+    def chunks():
+        yield b'{"entry": [{"resource": {"id": "1"}}, '
+        raise AssertionError("read past the first entry")
+
+    assert next(BundleStreamReader(chunks()).entries()) == {"resource": {"id": "1"}}
+
+@pytest.mark.parametrize("data", [
+    b'{"entry": [{"resource": {"id": "1"}}',    # truncated
+    b'{"entry": [{"resource": {"id": "1"}} {}]}',  # missing comma
+    b'[{"resource": {}}]',                     # not an object
+    b'{"entry": [{"resource": ',
+])
+def test_malformed_streams_raise_value_error(data):
+    with pytest.raises(ValueError):
+        read_all(chunked(data, 4))
@@ -0,0 +1,157 @@
+import json
+import time
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from agents.symptom_analyzer.fhir_connector import FHIRConnector, FHIRLookupError
+
+def observation(resource_id, symptom, last_updated, **extra):
+    resource = {"resourceType": "Observation", "code": {"text": symptom},
+                "effectiveDateTime": last_updated[:10], "meta": {"lastUpdated": last_updated}, **extra}
+    if resource_id:
+        resource["id"] = resource_id
+    return resource
+
+class FakeResponse:
+    def __init__(self, status_code, resources=(), headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = "" if status_code == 200 else f"status {status_code}"
+        self._body = json.dumps({"resourceType": "Bundle", "type": "searchset",
+                                 "entry": [{"resource": r} for r in resources]}).encode("utf-8")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._body), 16):
+            yield self._body[i:i + 16]
+
+    def close(self):
+        pass
+
+class FakeSession:
+    """Answers GETs from a queue of responses (or exceptions) and records each request"""
+    def __init__(self):
+        self.queue = []
+        self.requests = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.requests.append({"url": url, "headers": headers or {}, "params": params or {}})
+        response = self.queue.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+@pytest.fixture
+def connector():
+    connector = FHIRConnector("http://fhir", cache_ttl=0)
+    connector.session = FakeSession()
+    return connector
+
+FIRST = [observation("1", "headache", "2025-11-01T10:00:00Z"),
+         observation("2", "fever", "2025-11-02T10:00:00Z")]
+
+def load_first(connector):
+    connector.session.queue.append(
+        FakeResponse(200, FIRST, {"ETag": 'W/"1"', "Last-Modified": "Sun, 02 Nov 2025 10:00:00 GMT"}))
+    return connector._load_history("p1")
+
+def test_first_load_is_a_full_fetch_with_validators(connector):
+    local = load_first(connector)
+    assert connector.session.requests[0]["headers"] == {}
+    assert local["cursor"] == "2025-11-02T10:00:00Z"
+    assert local["etag"] == 'W/"1"'
+    assert sorted(local["resources"]) == ["Observation/1", "Observation/2"]
+    assert connector.counters["fetched"] == 1
+
+def test_fresh_copy_is_served_without_a_request(connector):
+    connector.cache_ttl = 60
+    first = load_first(connector)
+    assert connector._load_history("p1") is first
+    assert len(connector.session.requests) == 1
+    assert connector.counters["fresh_hits"] == 1
+
+def test_stale_copy_is_refreshed_with_a_delta_and_merged(connector):
+    first = load_first(connector)
+    first_index = first["index"]
+    changed = observation("2", "fever", "2025-11-03T09:00:00Z", interpretation=[{"text": "severe"}])
+    added = observation("3", "cough", "2025-11-03T10:00:00Z")
+    connector.session.queue.append(FakeResponse(200, [changed, added]))
+
+    local = connector._load_history("p1")
+    assert connector.session.requests[1]["params"] == {"_lastUpdated": "ge2025-11-02T10:00:00Z"}
+    assert local["resources"]["Observation/2"] == changed
+    assert sorted(local["resources"]) == ["Observation/1", "Observation/2", "Observation/3"]
+    assert local["cursor"] == "2025-11-03T10:00:00Z"
+    assert local["index"] is not first_index and local["index"].resource_count == 3
+    # The previous version is not modified in place
+    assert len(first["resources"]) == 2
+    assert connector.counters["delta_synced"] == 1 and connector.counters["delta_resources"] == 2
+
+def test_empty_or_repeated_delta_keeps_the_index(connector):
+    first = load_first(connector)
+    # ge cursor returns the resource at the cursor again, unchanged
+    connector.session.queue.append(FakeResponse(200, [FIRST[1]]))
+    local = connector._load_history("p1")
+    assert local["resources"] == first["resources"]
+    assert local["index"] is first["index"]
+    assert connector.counters["revalidated"] == 1 and connector.counters["delta_synced"] == 0
+
+def test_resources_without_id_are_not_duplicated_by_deltas(connector):
+    anonymous = observation(None, "nausea", "2025-11-02T10:00:00Z")
+    connector.session.queue.append(FakeResponse(200, [anonymous]))
+    connector._load_history("p1")
+    connector.session.queue.append(FakeResponse(200, [anonymous]))
+    assert len(connector._load_history("p1")["resources"]) == 1
+
+def test_full_sync_sends_conditional_headers_and_304_keeps_the_copy(connector):
+    first = load_first(connector)
+    connector.full_sync_interval = 0
+    connector.session.queue.append(FakeResponse(304))
+    before = time.time()
+
+    local = connector._load_history("p1")
+    assert connector.session.requests[1]["headers"] == {
+        "If-None-Match": 'W/"1"', "If-Modified-Since": "Sun, 02 Nov 2025 10:00:00 GMT"}
+    assert "_lastUpdated" not in connector.session.requests[1]["params"]
+    assert local["resources"] == first["resources"] and local["index"] is first["index"]
+    assert local["full_synced_at"] >= before
+    assert connector.counters["revalidated"] == 1
+
+def test_full_sync_200_drops_deleted_resources(connector):
+    load_first(connector)
+    connector.full_sync_interval = 0
+    connector.session.queue.append(FakeResponse(200, FIRST[:1], {"ETag": 'W/"2"'}))
+    local = connector._load_history("p1")
+    assert sorted(local["resources"]) == ["Observation/1"]
+    assert local["etag"] == 'W/"2"'
+
+def test_server_error_serves_the_cached_copy(connector):
+    first = load_first(connector)
+    connector.session.queue.append(FakeResponse(503))
+    assert connector._load_history("p1")["resources"] == first["resources"]
+    connector.session.queue.append(requests.ConnectionError("down"))
+    assert connector._load_history("p1")["resources"] == first["resources"]
+    assert connector.counters["stale_served"] == 2 and connector.counters["errors"] == 2
+
+def test_not_found_drops_the_cached_copy(connector):
+    load_first(connector)
+    connector.session.queue.append(FakeResponse(404))
+    assert connector._load_history("p1") is None
+    assert "p1" not in connector.history_cache
+    assert connector.counters["not_found"] == 1
+
+@pytest.mark.parametrize("failure", [FakeResponse(500), requests.ConnectionError("down")])
+def test_failure_without_cached_copy_is_reported(connector, failure):
+    connector.session.queue.append(failure)
+    with pytest.raises(FHIRLookupError):
+        connector._load_history("p1")
+    connector.session.queue.append(failure)
+    assert connector.get_patient_history("p1") == {}
+
+def test_history_indexes_tell_failures_from_missing_history(connector):
+    connector.session.queue.append(FakeResponse(404))
+    connector.session.queue.append(FakeResponse(500))
+    # One worker, so the responses are consumed in patient order
+    indexes = connector.get_history_indexes(["missing", "failing"], max_workers=1)
+    assert indexes == {"missing": {}, "failing": None}
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from agents.patient_journey.journey_cache import JourneyCache
+
+class GatedLoader:
+    """Journey loader whose calls block until released, numbering the journeys it returns"""
+    def __init__(self, patient_id="pat1"):
+        self.patient_id = patient_id
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.fail = False
+
+    async def __call__(self, requested):
+        self.calls.append(requested)
+        version = len(self.calls)
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("neo4j unavailable")
+        return {"patient_id": self.patient_id, "version": version}
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def run(scenario):
+    asyncio.run(scenario())
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch):
+    monkeypatch.setenv("JOURNEY_CACHE_ENABLED", "true")
+
+def test_concurrent_requests_share_one_load():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader()
+        waiting = [asyncio.ensure_future(cache.get(pid, loader)) for pid in ("pat1", " PAT1", "pat1")]
+        await settle()
+        loader.gate.set()
+        assert [j["version"] for j in await asyncio.gather(*waiting)] == [1, 1, 1]
+        assert loader.calls == ["pat1"]
+        assert (await cache.get("pat1", loader))["version"] == 1
+        assert cache.counters["coalesced"] == 2 and cache.counters["fresh_hits"] == 1
+    run(scenario)
+
+def test_invalidation_during_a_load_is_not_lost():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader()
+        early = asyncio.ensure_future(cache.get("pat1", loader))
+        await settle()
+        cache.invalidate(["pat1"])
+        # A request after the invalidation does not join the load that started before it
+        late = asyncio.ensure_future(cache.get("pat1", loader))
+        await settle()
+        assert loader.calls == ["pat1", "pat1"]
+
+        loader.gate.set()
+        # The early request's load finished after the invalidation, so it takes the
+        # journey loaded since then instead of its own
+        assert (await early)["version"] == 2
+        assert (await late)["version"] == 2
+        assert (await cache.get("pat1", loader))["version"] == 2
+        assert loader.calls == ["pat1", "pat1"]
+    run(scenario)
+
+def test_invalidating_by_id_reloads_a_journey_requested_by_name():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader(patient_id="pat1")
+        loader.gate.set()
+        assert (await cache.get("John Doe", loader))["version"] == 1
+
+        cache.invalidate(["pat1"])
+        assert (await cache.get("john doe", loader))["version"] == 2
+        assert cache.counters["invalidated_hits"] == 1
+    run(scenario)
+
+def test_invalidation_by_id_while_a_name_lookup_runs():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader(patient_id="pat1")
+        request = asyncio.ensure_future(cache.get("John Doe", loader))
+        await settle()
+        cache.invalidate(["pat1"])
+        loader.gate.set()
+        assert (await request)["version"] == 2
+        assert loader.calls == ["John Doe", "John Doe"]
+    run(scenario)
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=0, stale_ttl=300), GatedLoader()
+        loader.gate.set()
+        assert (await cache.get("pat1", loader))["version"] == 1
+
+        loader.gate.clear()
+        stale = await asyncio.gather(cache.get("pat1", loader), cache.get("pat1", loader))
+        assert [j["version"] for j in stale] == [1, 1]
+        assert loader.calls == ["pat1", "pat1"]  # one background refresh
+
+        loader.gate.set()
+        await settle()
+        assert cache.cache.get("pat1")["journey"]["version"] == 2
+        assert cache.counters["refreshes"] == 1
+    run(scenario)
+
+def test_failed_refresh_keeps_the_stale_entry():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=0, stale_ttl=300), GatedLoader()
+        loader.gate.set()
+        await cache.get("pat1", loader)
+        loader.fail = True
+        assert (await cache.get("pat1", loader))["version"] == 1
+        await settle()
+        assert cache.counters["refresh_errors"] == 1
+        assert (await cache.get("pat1", loader))["version"] == 1
+    run(scenario)
+
+def test_cancelled_request_does_not_cancel_the_shared_load():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader()
+        leaving = asyncio.ensure_future(cache.get("pat1", loader))
+        staying = asyncio.ensure_future(cache.get("pat1", loader))
+        await settle()
+        leaving.cancel()
+        loader.gate.set()
+        assert (await staying)["version"] == 1
+        assert loader.calls == ["pat1"]
+    run(scenario)
+
+def test_lookup_errors_are_not_cached():
+    async def scenario():
+        cache = JourneyCache(ttl=300, stale_ttl=0)
+        calls = []
+
+        async def missing(patient_id):
+            calls.append(patient_id)
+            return {"error": f"Patient {patient_id} not found"}
+
+        await cache.get("pat9", missing)
+        await cache.get("pat9", missing)
+        assert calls == ["pat9", "pat9"]
+    run(scenario)
+
+def test_invalidate_all_during_a_load():
+    async def scenario():
+        cache, loader = JourneyCache(ttl=300, stale_ttl=0), GatedLoader()
+        request = asyncio.ensure_future(cache.get("pat1", loader))
+        await settle()
+        assert cache.invalidate_all() == 0
+        loader.gate.set()
+        assert (await request)["version"] == 2
+        assert len(cache.cache) == 1
+    run(scenario)
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_google_vertexai")
+
+from common.llm_cache import LLMResponseCache
+from services import llm_service as llm_module
+from services.intent_router import INTENT_MEDICAL_DIAGNOSIS, INTENT_OUT_OF_SCOPE
+
+class FakeLLM:
+    """Answers each classification prompt after a delay and records cancelled calls"""
+    def __init__(self, text, scope_ok=True, actionable=True, intent=INTENT_MEDICAL_DIAGNOSIS):
+        self.answers = {
+            llm_module.SCOPE_CHECK_PROMPT.format(text=text): (0.01, f'{{"is_health_related": {str(scope_ok).lower()}}}'),
+            llm_module.ACTIONABILITY_PROMPT.format(text=text): (0.5, f'{{"can_handle": {str(actionable).lower()}}}'),
+            llm_module.INTENT_PROMPT.format(text=text): (0.5, f'{{"intent": "{intent}"}}'),
+        }
+        self.calls = 0
+        self.cancelled = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        delay, answer = self.answers[prompt]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return answer
+
+def make_service(llm):
+    service = llm_module.LLMService()
+    service.llm = llm
+    service.llm_cache = LLMResponseCache(enabled=False)
+    return service
+
+def test_out_of_scope_cancels_outstanding_calls():
+    text = "what is the capital of peru"
+    llm = FakeLLM(text, scope_ok=False)
+    service = make_service(llm)
+
+    intent, keyword_match = asyncio.run(service._classify_intent_concurrent(text))
+
+    assert (intent, keyword_match) == (INTENT_OUT_OF_SCOPE, False)
+    assert llm.calls == 3
+    assert llm.cancelled == 2
+
+def test_in_scope_matches_sequential_decision():
+    text = "I have had a sharp pain in my side since yesterday"
+    llm = FakeLLM(text)
+    service = make_service(llm)
+
+    assert asyncio.run(service._classify_intent_concurrent(text)) == (INTENT_MEDICAL_DIAGNOSIS, False)
+    assert llm.cancelled == 0
+
+def test_not_actionable_is_out_of_scope():
+    text = "please prescribe me antibiotics for my sore throat"
+    service = make_service(FakeLLM(text, actionable=False))
+
+    assert asyncio.run(service._classify_intent_concurrent(text)) == (INTENT_OUT_OF_SCOPE, False)
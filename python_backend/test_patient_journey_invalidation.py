@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+from agents.patient_journey import main as journey_main
+
+def make_loader(calls):
+    async def loader(patient_id):
+        calls.append(patient_id)
+        return {"patient_id": patient_id, "patient_name": "John Doe",
+                "journey_steps": [f"load {len(calls)}"]}
+    return loader
+
+def test_invalidate_endpoint_makes_next_request_reload(monkeypatch):
+    calls = []
+    monkeypatch.setattr(journey_main, "load_patient_journey", make_loader(calls))
+    monkeypatch.setattr(journey_main, "journey_cache", journey_main.JourneyCache(ttl=300, stale_ttl=0))
+    client = TestClient(journey_main.app)
+
+    first = client.post("/patient_journey", json={"patient_id": "pat1"}).json()
+    cached = client.post("/patient_journey", json={"patient_id": "PAT1 "}).json()
+    assert calls == ["pat1"]
+    assert cached == first
+
+    response = client.post("/patient_journey/invalidate", json={"patient_ids": ["pat1"]})
+    assert response.status_code == 200
+    assert response.json() == {"invalidated": 1}
+
+    reloaded = client.post("/patient_journey", json={"patient_id": "pat1"}).json()
+    assert calls == ["pat1", "pat1"]
+    assert reloaded["result"]["journey_steps"] == ["load 2"]
+
+def test_invalidate_all_endpoint(monkeypatch):
+    calls = []
+    monkeypatch.setattr(journey_main, "load_patient_journey", make_loader(calls))
+    monkeypatch.setattr(journey_main, "journey_cache", journey_main.JourneyCache(ttl=300, stale_ttl=0))
+    client = TestClient(journey_main.app)
+
+    client.post("/patient_journey", json={"patient_id": "pat1"})
+    client.post("/patient_journey", json={"patient_id": "pat2"})
+    assert client.post("/patient_journey/invalidate", json={"invalidate_all": True}).json() == {"invalidated": 2}
+
+    client.post("/patient_journey", json={"patient_id": "pat2"})
+    assert calls == ["pat1", "pat2", "pat2"]
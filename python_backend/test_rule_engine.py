@@ -0,0 +1,85 @@
+import random
+from types import MappingProxyType
+
+import pytest
+
+from ontology.symptom_ontology import symptom_ontology
+from sub_agents.rule_engine import RuleEngine, LOOKUP_SEVERITIES
+
+def direct_evaluation(ontology, symptoms, severity_level=None):
+    """Rule scans as determine_conditions did them before the engine (set of conditions, confidence)"""
+    conditions, confidence = [], 0.5
+    severity = severity_level or 'medium'
+    for combo, severity_conditions in ontology.combinations:
+        if all(s in symptoms for s in combo):
+            conditions.extend(severity_conditions[severity])
+            confidence = 0.9 if severity_level == 'high' else 0.8
+    if not conditions:
+        matched = [g for g in ontology.groups.values() if any(s in symptoms for s in g['symptoms'])]
+        for group in matched:
+            conditions.extend(group['conditions'][severity])
+        if matched:
+            confidence = 0.6 + len(matched) * 0.1 + (0.1 if severity_level == 'high' else 0)
+    return set(conditions), min(confidence, 0.95)
+
+def random_inputs(engine, count, seed=5):
+    rng = random.Random(seed)
+    vocabulary = sorted(set(engine.symptom_bits) | set(engine.ontology.synonyms)) + ["fatigue", "insomnia"]
+    return [
+        ([s.upper() if rng.random() < 0.2 else s for s in rng.sample(vocabulary, rng.randint(0, 7))],
+         rng.choice([None, 'low', 'medium', 'high']))
+        for _ in range(count)
+    ]
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return symptom_ontology.snapshot()
+
+def test_engine_matches_direct_rule_scans(snapshot):
+    engine = RuleEngine(snapshot)
+    for symptoms, severity in random_inputs(engine, 1000):
+        conditions, confidence = engine.evaluate(symptoms, severity)
+        assert len(conditions) == len(set(conditions))
+        expected = direct_evaluation(snapshot, engine.normalize(symptoms), severity)
+        assert (set(conditions), pytest.approx(confidence)) == expected, (symptoms, severity)
+
+def test_lookup_table_agrees_with_live_evaluation(snapshot):
+    live = RuleEngine(snapshot)
+    table = RuleEngine(snapshot)
+    table.build_lookup_table(max_symptoms=3)
+    for symptoms, severity in random_inputs(live, 1000, seed=9):
+        assert table.evaluate(symptoms, severity) == live.evaluate(symptoms, severity), (symptoms, severity)
+    stats = table.stats()
+    assert stats["lookup_hits"] > 0 and stats["lookup_misses"] > 0  # larger sets fall back
+    assert live.stats()["lookup_entries"] is None
+
+def test_lookup_table_is_read_only_and_callers_get_their_own_list(snapshot):
+    engine = RuleEngine(snapshot)
+    engine.build_lookup_table(max_symptoms=2)
+    assert isinstance(engine.lookup, MappingProxyType)
+    with pytest.raises(TypeError):
+        engine.lookup[(frozenset(), 'low')] = ((), 0.5)
+
+    conditions, _ = engine.evaluate(['headache', 'nausea'], 'low')
+    conditions.append('tampered')
+    assert 'tampered' not in engine.evaluate(['headache', 'nausea'], 'low')[0]
+
+def test_lookup_table_respects_max_entries(snapshot):
+    engine = RuleEngine(snapshot)
+    entries = engine.build_lookup_table(max_symptoms=6, max_entries=100)
+    assert 0 < entries <= 100
+    assert all(severity in LOOKUP_SEVERITIES for _, severity in engine.lookup)
+
+def test_unreachable_synonym_sets_are_skipped(snapshot):
+    engine = RuleEngine(snapshot)
+    for terms in engine.reachable_term_sets(2):
+        for symptom in terms:
+            canonical = snapshot.canonical(symptom)
+            if canonical in engine.symptom_bits:
+                assert canonical in terms
+    # Every key an input can produce is in the table
+    engine.build_lookup_table(max_symptoms=2)
+    for symptoms, severity in random_inputs(engine, 300, seed=13):
+        terms = engine.terms(symptoms)
+        if len(terms) <= 2 and severity:
+            assert (terms, severity) in engine.lookup
@@ -0,0 +1,128 @@
+import asyncio
+
+from orchestration.single_flight import SingleFlight, normalize_prompt
+
+def test_normalize_prompt():
+    assert normalize_prompt("  I have a   Fever ") == "i have a fever"
+    assert normalize_prompt(None) == ""
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def work(emit):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(3)))
+        assert results == ["result"] * 3
+        assert calls == [1]
+        assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 2}
+
+    asyncio.run(scenario())
+
+def test_late_caller_gets_earlier_events_replayed():
+    async def scenario():
+        flight = SingleFlight()
+        first_events, late_events = [], []
+        halfway = asyncio.Event()
+        proceed = asyncio.Event()
+
+        async def work(emit):
+            emit("step", 1)
+            halfway.set()
+            await proceed.wait()
+            emit("step", 2)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", work, lambda *e: first_events.append(e)))
+        await halfway.wait()
+        late = asyncio.ensure_future(flight.do("key", work, lambda *e: late_events.append(e)))
+        await asyncio.sleep(0)
+        proceed.set()
+
+        assert await asyncio.gather(first, late) == ["done", "done"]
+        assert first_events == [("step", 1), ("step", 2)]
+        assert late_events == [("step", 1), ("step", 2)]
+
+    asyncio.run(scenario())
+
+def test_failing_listener_does_not_fail_the_call():
+    async def scenario():
+        flight = SingleFlight()
+
+        def broken(*event):
+            raise RuntimeError("listener bug")
+
+        async def work(emit):
+            emit("step", 1)
+            return "done"
+
+        assert await flight.do("key", work, broken) == "done"
+
+    asyncio.run(scenario())
+
+def test_cancelling_one_of_two_callers_keeps_the_call_running():
+    async def scenario():
+        flight = SingleFlight()
+        proceed = asyncio.Event()
+
+        async def work(emit):
+            await proceed.wait()
+            return "done"
+
+        leaving = asyncio.ensure_future(flight.do("key", work))
+        staying = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        proceed.set()
+
+        assert await staying == "done"
+        assert leaving.cancelled()
+
+    asyncio.run(scenario())
+
+def test_last_caller_leaving_cancels_the_call_and_next_caller_starts_afresh():
+    async def scenario():
+        flight = SingleFlight()
+        cancelled = []
+
+        async def slow(emit):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        caller = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [True]
+        assert flight.stats()["in_flight"] == 0
+
+        async def quick(emit):
+            return "fresh"
+
+        assert await flight.do("key", quick) == "fresh"
+        assert flight.stats()["executed"] == 2
+
+    asyncio.run(scenario())
+
+def test_exception_reaches_every_caller():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing(emit):
+            await asyncio.sleep(0.01)
+            raise ValueError("agent down")
+
+        results = await asyncio.gather(flight.do("key", failing), flight.do("key", failing),
+                                       return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
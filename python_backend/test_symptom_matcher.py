@@ -0,0 +1,74 @@
+import random
+
+from agents.symptom_analyzer.symptom_matcher import AhoCorasick, SymptomMatcher, get_symptom_matcher, PHRASE_ROLES
+
+def substring_match(symptom_map, text):
+    """The per-keyword substring scans the matcher replaced"""
+    result = {}
+    for symptom, info in symptom_map.items():
+        if any(keyword in text for keyword in info.get("keywords", [])):
+            result[symptom] = {role: [p for p in info.get(role, []) if p in text] for role in PHRASE_ROLES}
+    return result
+
+def without_offsets(matches):
+    return {symptom: {role: entry[role] for role in PHRASE_ROLES} for symptom, entry in matches.items()}
+
+def random_texts(symptom_map, count, seed=7):
+    rng = random.Random(seed)
+    phrases = sorted({p for info in symptom_map.values() for role in PHRASE_ROLES for p in info.get(role, [])})
+    filler = ["i", "have", "a", "and", "my", "the", "since", "for", "days", "really", "x"]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(phrases) if rng.random() < 0.3 else rng.choice(filler)
+                 for _ in range(rng.randint(0, 12))]
+        # Glue some words together so phrases also occur inside longer tokens
+        texts.append("".join(w + rng.choice([" ", " ", ""]) for w in words))
+    return texts
+
+def test_aho_corasick_finds_overlapping_matches():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(automaton.iter_matches("ushers")) == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+    assert list(AhoCorasick(["abc"]).iter_matches("")) == []
+
+def test_aho_corasick_agrees_with_str_find():
+    rng = random.Random(3)
+    patterns = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 4))) for _ in range(20)]
+    automaton = AhoCorasick(patterns)
+    for _ in range(200):
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 30)))
+        expected = sorted(
+            (i, i + len(p), p) for p in set(patterns) for i in range(len(text)) if text.startswith(p, i)
+        )
+        assert sorted(automaton.iter_matches(text)) == expected
+
+def test_pattern_added_after_build_is_matched():
+    automaton = AhoCorasick(["fever"]).build()
+    automaton.add("cough")
+    assert [m[2] for m in automaton.iter_matches("fever and cough")] == ["fever", "cough"]
+
+def test_matcher_agrees_with_substring_scans():
+    matcher = get_symptom_matcher()
+    for text in random_texts(matcher.symptom_map, 500):
+        assert without_offsets(matcher.match(text)) == substring_match(matcher.symptom_map, text), text
+
+def test_match_keeps_vocabulary_order_and_reports_offsets():
+    symptom_map = {
+        "fever": {"keywords": ["fever", "hot"], "severity_indicators": ["high"], "temporal_patterns": []},
+        "cough": {"keywords": ["cough"], "severity_indicators": ["dry", "high"], "temporal_patterns": ["at night"]},
+    }
+    matches = SymptomMatcher(symptom_map).match("dry cough at night and a high fever")
+    assert list(matches) == ["fever", "cough"]
+    assert matches["cough"]["severity_indicators"] == ["dry", "high"]
+    assert matches["cough"]["offsets"] == [
+        (0, 3, "dry", "severity_indicators"),
+        (4, 9, "cough", "keywords"),
+        (10, 18, "at night", "temporal_patterns"),
+        (25, 29, "high", "severity_indicators"),
+    ]
+    # Severity phrases alone do not make a symptom match
+    assert SymptomMatcher(symptom_map).match("high") == {}
+
+def test_match_many_matches_each_text_separately():
+    matcher = get_symptom_matcher()
+    texts = random_texts(matcher.symptom_map, 50, seed=11) + ["", "headache"]
+    assert matcher.match_many(texts) == [matcher.match(text) for text in texts]
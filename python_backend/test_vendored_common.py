@@ -0,0 +1,20 @@
+import filecmp
+import os
+
+# agentic-llm-service ships its own copy of these modules (it is deployed without
+# python_backend); this check keeps the copies from drifting apart.
+VENDORED_MODULES = ["llm_cache.py", "ttl_cache.py", "sqlite_store.py"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(HERE, "common")
+VENDORED_DIR = os.path.join(HERE, "..", "spring_backend", "agentic-llm-service", "common")
+
+def test_vendored_common_modules_match():
+    _, mismatch, errors = filecmp.cmpfiles(SOURCE_DIR, VENDORED_DIR, VENDORED_MODULES, shallow=False)
+    assert not mismatch and not errors, (
+        f"agentic-llm-service/common is out of sync with python_backend/common: {mismatch + errors}"
+    )
+
+if __name__ == "__main__":
+    test_vendored_common_modules_match()
+    print("Vendored common modules are in sync")
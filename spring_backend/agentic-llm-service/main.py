@@ -5,15 +5,25 @@ from neo4j import GraphDatabase
 from typing import Optional
 import re
 
+# Vendored copy of python_backend/common; python_backend/test_vendored_common.py
+# checks the two match. Cache keys are the same, so both services can share one
+# LLM_CACHE_PATH.
+from common.llm_cache import LLMResponseCache
+
 app = FastAPI()
 
+LLM_MODEL_NAME = "gemini-2.5-pro"  # latest Gemini model
+ASK_PROMPT_TEMPLATE = "{journey_context}\nUser asks: {prompt}"
+
 llm = ChatVertexAI(
-    model="gemini-2.5-pro",  # latest Gemini model
+    model=LLM_MODEL_NAME,
     temperature=0.2,
     max_output_tokens=512,
     location="us-central1"
 )
 
+llm_cache = LLMResponseCache()
+
 # Neo4j connection setup (use environment variables for security)
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
@@ -75,6 +85,10 @@ async def ask(prompt: str = Body(..., embed=True)):
     journey_context = ""
     if patient_name:
         journey_context = get_patient_journey(patient_name)
-    full_prompt = f"{journey_context}\nUser asks: {prompt}" if journey_context else prompt
-    response = llm.invoke(full_prompt)
-    return {"response": response.content, "context": journey_context}
+    full_prompt = ASK_PROMPT_TEMPLATE.format(journey_context=journey_context, prompt=prompt) if journey_context else prompt
+    content = llm_cache.call(LLM_MODEL_NAME, ASK_PROMPT_TEMPLATE, full_prompt, lambda: llm.invoke(full_prompt).content)
+    return {"response": content, "context": journey_context}
+
+@app.get("/metrics")
+async def metrics():
+    return {"llm_cache": llm_cache.stats()}
@@ -3,16 +3,26 @@ package com.agentic.agentic_backend;
 import org.springframework.boot.CommandLineRunner;
 import org.springframework.stereotype.Component;
 import org.springframework.beans.factory.annotation.Autowired;
+import org.springframework.beans.factory.annotation.Value;
 import org.neo4j.driver.Session;
 import org.neo4j.driver.Driver;
 import org.slf4j.Logger;
 import org.slf4j.LoggerFactory;
 
+import java.net.URI;
+import java.net.http.HttpClient;
+import java.net.http.HttpRequest;
+import java.net.http.HttpResponse;
+import java.time.Duration;
+
 @Component
 public class DataInitializer implements CommandLineRunner {
     private static final Logger logger = LoggerFactory.getLogger(DataInitializer.class);
     @Autowired
     private Driver driver;
+    // Patient journey agent, whose cached journeys go stale when the graph is reseeded
+    @Value("${PATIENT_JOURNEY_URL:http://localhost:8005}")
+    private String patientJourneyUrl;
 
     @Override
     public void run(String... args) throws Exception {
@@ -51,7 +61,7 @@ public class DataInitializer implements CommandLineRunner {
 
                 // Create 9th entity - Patient
                 session.run(
-                        "CREATE (p:Patient {patientId:'pat1', name:'John Doe', dob:'1980-05-10', gender:'Male', contactNumber:'077-1234567', address:'123 Main St, Colombo', bloodGroup:'A+', insuranceProvider:'Ceylinco', currentStatus:'Active'})");
+                        "CREATE (p:Patient {patientId:'pat1', patientIdKey:'pat1', name:'John Doe', nameKey:'john doe', dob:'1980-05-10', gender:'Male', contactNumber:'077-1234567', address:'123 Main St, Colombo', bloodGroup:'A+', insuranceProvider:'Ceylinco', currentStatus:'Active'})");
                 logger.info("✓ Created Patient node");
 
                 // Create relationships
@@ -98,10 +108,29 @@ public class DataInitializer implements CommandLineRunner {
 
                 logger.info("✓ Ontology initialization complete: All 9 entities and relationships created in Neo4j!");
             }
+            invalidatePatientJourneys();
         } catch (Exception e) {
             logger.warn("Could not initialize Neo4j ontology at startup (data may already exist or connection unavailable). Application will continue.", e.getMessage());
             logger.debug("Full exception: ", e);
             // Don't throw the exception - allow the application to start anyway
         }
     }
+
+    /**
+     * Tells the patient journey agent to drop every cached journey after the graph was
+     * rewritten. If the agent is not running its cache expires on its own TTL.
+     */
+    private void invalidatePatientJourneys() {
+        try {
+            HttpRequest request = HttpRequest.newBuilder(URI.create(patientJourneyUrl + "/patient_journey/invalidate"))
+                    .timeout(Duration.ofSeconds(5))
+                    .header("Content-Type", "application/json")
+                    .POST(HttpRequest.BodyPublishers.ofString("{\"invalidate_all\": true}"))
+                    .build();
+            HttpResponse<String> response = HttpClient.newHttpClient().send(request, HttpResponse.BodyHandlers.ofString());
+            logger.info("✓ Invalidated cached patient journeys: {}", response.body());
+        } catch (Exception e) {
+            logger.warn("Could not invalidate cached patient journeys: {}", e.getMessage());
+        }
+    }
 }
@@ -5,6 +5,7 @@ import org.springframework.data.neo4j.core.schema.Id;
 import org.springframework.data.neo4j.core.schema.Node;
 import org.springframework.data.neo4j.core.schema.Relationship;
 import java.util.List;
+import java.util.Locale;
 
 /**
  * # Ontology Entities and Microservices Architecture Documentation
@@ -95,6 +96,10 @@ public class Patient {
     private String bloodGroup;
     private String insuranceProvider;
     private String currentStatus;
+    // Normalized lookup keys for the patient journey agent's indexed lookup,
+    // kept in step with patientId/name by their setters (toLower(trim(...)) in Cypher)
+    private String patientIdKey;
+    private String nameKey;
 
     @Relationship(type = "HAS_DIAGNOSIS")
     private List<HasDiagnosis> hasDiagnoses;
@@ -124,6 +129,7 @@ public class Patient {
 
     public void setPatientId(String patientId) {
         this.patientId = patientId;
+        this.patientIdKey = lookupKey(patientId);
     }
 
     public String getName() {
@@ -132,6 +138,19 @@ public class Patient {
 
     public void setName(String name) {
         this.name = name;
+        this.nameKey = lookupKey(name);
+    }
+
+    public String getPatientIdKey() {
+        return patientIdKey;
+    }
+
+    public String getNameKey() {
+        return nameKey;
+    }
+
+    private static String lookupKey(String value) {
+        return value == null ? null : value.trim().toLowerCase(Locale.ROOT);
     }
 
     public String getDob() {